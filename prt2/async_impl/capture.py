@@ -0,0 +1,97 @@
+import asyncio
+import itertools
+import struct
+import threading
+import time
+from collections import namedtuple
+from typing import BinaryIO, Iterator, Optional
+
+MAGIC = b"TCAP"
+VERSION = 1
+HEADER = struct.Struct("<4sBd")        # magic, version, wall-clock start time
+RECORD = struct.Struct("<IBdI")        # session id, direction, monotonic offset, payload length
+
+DIR_IN = 0      # client -> server frame
+DIR_OUT = 1     # server -> client frame
+DIR_OPEN = 2    # session accepted
+DIR_CLOSE = 3   # session closed
+
+CaptureRecord = namedtuple("CaptureRecord", ["session_id", "direction", "offset", "data"])
+
+
+class CaptureRecorder:
+    """Appends per-session frames to a compact binary capture file.
+
+    Each record stores the session id, direction, seconds since the capture
+    started (monotonic clock) and the raw bytes.
+    """
+
+    def __init__(self, filename: str, record_outbound: bool = True):
+        self.filename = filename
+        self.record_outbound = record_outbound
+        self._file: Optional[BinaryIO] = open(filename, 'wb')
+        self._file.write(HEADER.pack(MAGIC, VERSION, time.time()))
+        self._start = time.monotonic()
+        self._session_ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.records_written = 0
+
+    def open_session(self) -> int:
+        session_id = next(self._session_ids)
+        self.record(session_id, DIR_OPEN, b'')
+        return session_id
+
+    def close_session(self, session_id: int):
+        self.record(session_id, DIR_CLOSE, b'')
+
+    def record(self, session_id: int, direction: int, data: bytes):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(RECORD.pack(session_id, direction, time.monotonic() - self._start, len(data)))
+            if data:
+                self._file.write(data)
+            self.records_written += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class RecordingStreamWriter:
+    """Wraps an asyncio.StreamWriter and records everything written to it."""
+
+    def __init__(self, writer: asyncio.StreamWriter, recorder: CaptureRecorder, session_id: int):
+        self._writer = writer
+        self._recorder = recorder
+        self.session_id = session_id
+
+    def write(self, data: bytes):
+        if self._recorder.record_outbound:
+            self._recorder.record(self.session_id, DIR_OUT, bytes(data))
+        self._writer.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._writer, name)
+
+
+def read_capture(filename: str) -> Iterator[CaptureRecord]:
+    """Yield the records of a capture file in the order they were written."""
+    with open(filename, 'rb') as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError(f"'{filename}' is not a capture file (truncated header)")
+        magic, version, _ = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"'{filename}' is not a version {VERSION} capture file")
+        while True:
+            raw = f.read(RECORD.size)
+            if len(raw) < RECORD.size:
+                return
+            session_id, direction, offset, length = RECORD.unpack(raw)
+            data = f.read(length) if length else b''
+            if len(data) < length:
+                return
+            yield CaptureRecord(session_id, direction, offset, data)
@@ -0,0 +1,228 @@
+import asyncio
+import os
+import sys
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_impl.client_async as client_async
+from async_impl.protocol import (ChatClosed, ChatOpened, Error, EventParser, GroupList, GroupUpdated,
+                                 UserConnected, UserDisconnected, UserList)
+
+EVENT_QUEUE_SIZE = 1000
+_CLOSED = object()
+
+
+class ChatError(Exception):
+    """The server answered a ChatClient request with an ERROR line."""
+
+
+class ChatClient:
+    """High-level chat client on top of a pipelined (optionally resumable) connection.
+
+    Every server line is parsed once into an event from `async_impl.protocol`.
+    Events are delivered to callbacks registered with on() and to every
+    iterator returned by events(), and they keep a local cache of the
+    connected users, the groups and their members, and the open chat.
+    Commands are sent with correlation ids, so the methods below return their
+    own reply and can be awaited concurrently.
+
+        async with ChatClient() as client:
+            await client.connect("alice")
+            client.on(DirectMessage, lambda e: print(e.sender, e.text))
+            await client.open_chat("bob")
+            await client.send("hi")
+    """
+
+    def __init__(self, host: str = None, port: int = None, resumable: bool = True, max_in_flight: int = 64,
+                 on_state_change: Optional[Callable[[str], None]] = None):
+        self.host = host if host is not None else client_async.HOST
+        self.port = port if port is not None else client_async.PORT
+        self.name: Optional[str] = None
+        self.users: Set[str] = set()
+        self.groups: Dict[str, Set[str]] = {}
+        self.chat_partner: Optional[str] = None
+        self._parser = EventParser(groups=self.groups)
+        self._handlers: Dict[Optional[type], List[Callable]] = {}
+        self._subscribers: List[tuple] = []
+        self._tasks: Set[asyncio.Future] = set()
+        if resumable:
+            self.connection = client_async.ResumableConnection(
+                self.host, self.port, on_unsolicited=self._on_line, max_in_flight=max_in_flight,
+                on_state_change=on_state_change)
+        else:
+            self.connection = client_async.PipelinedConnection(
+                self.host, self.port, on_unsolicited=self._on_line, max_in_flight=max_in_flight)
+
+    @property
+    def my_groups(self) -> Set[str]:
+        return {group for group, members in self.groups.items() if self.name in members}
+
+    @property
+    def connected(self) -> bool:
+        return self.connection.connected
+
+    async def connect(self, name: str) -> str:
+        """Register `name`, then load the user and group lists into the cache."""
+        self.name = name
+        self._parser.own_name = name
+        ack = await self.connection.connect(name)
+        await asyncio.gather(self.list_users(), self.list_groups())
+        return ack
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await self.connection.close()
+        for _, queue in self._subscribers:
+            queue.put_nowait(_CLOSED)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    # Events
+
+    def on(self, event_type: Optional[type], callback: Callable = None):
+        """Call `callback(event)` for every event of `event_type` (None: every event).
+
+        Can be used as a decorator: @client.on(GroupMessage)
+        """
+        if callback is None:
+            return lambda func: self.on(event_type, func)
+        self._handlers.setdefault(event_type, []).append(callback)
+        return callback
+
+    def off(self, event_type: Optional[type], callback: Callable):
+        handlers = self._handlers.get(event_type, [])
+        if callback in handlers:
+            handlers.remove(callback)
+
+    async def events(self, *event_types: type) -> AsyncIterator:
+        """Iterate over incoming events, optionally only those of `event_types`.
+
+        Each iterator has its own bounded queue; when a slow consumer lets it
+        fill up, the oldest events are dropped. Iteration ends when the client closes.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        subscriber = (event_types, queue)
+        self._subscribers.append(subscriber)
+        try:
+            while True:
+                event = await queue.get()
+                if event is _CLOSED:
+                    return
+                yield event
+        finally:
+            self._subscribers.remove(subscriber)
+
+    def _on_line(self, line: str):
+        event = self._parser.feed(line)
+        if event is not None:
+            self._emit(event)
+
+    def _emit(self, event):
+        self._update_state(event)
+        for handler in self._handlers.get(type(event), []) + self._handlers.get(None, []):
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Error in {type(event).__name__} handler: {e}")
+        for event_types, queue in self._subscribers:
+            if event_types and not isinstance(event, event_types):
+                continue
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def _refresh(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _update_state(self, event):
+        if isinstance(event, UserList):
+            self.users = {name for name in event.names if name != self.name}
+        elif isinstance(event, UserConnected):
+            self.users.add(event.name)
+        elif isinstance(event, UserDisconnected):
+            self.users.discard(event.name)
+            for members in self.groups.values():
+                members.discard(event.name)
+            if self.chat_partner == event.name:
+                self.chat_partner = None
+        elif isinstance(event, GroupList):
+            # Update in place: the parser holds a reference to this dict
+            self.groups.clear()
+            self.groups.update((group, set(members)) for group, members in event.groups.items())
+        elif isinstance(event, GroupUpdated):
+            members = self.groups.setdefault(event.group, set())
+            if event.action == 'left':
+                members.discard(event.user)
+                if not members:
+                    del self.groups[event.group]
+            elif event.user:
+                members.add(event.user)
+                if event.user == self.name and event.action == 'added' and len(members) == 1:
+                    # Being added by someone else says nothing about the other members
+                    self._refresh(self.list_groups())
+        elif isinstance(event, ChatOpened):
+            self.chat_partner = event.name
+        elif isinstance(event, ChatClosed):
+            if event.name is None or event.name == self.chat_partner:
+                self.chat_partner = None
+
+    # Commands
+
+    async def request(self, command: str, timeout: float = None) -> str:
+        """Send any command and return its reply.
+
+        The reply's events are emitted like unsolicited ones, so the cache stays current.
+
+        Raises:
+            ChatError: The reply is an ERROR line
+        """
+        response = await self.connection.request(command, timeout or client_async.READ_TIMEOUT)
+        error = None
+        for event in EventParser(self.name, self.groups).parse_all(response):
+            self._emit(event)
+            if isinstance(event, Error):
+                error = event
+        if error is not None:
+            raise ChatError(error.text)
+        return response
+
+    async def list_users(self) -> Set[str]:
+        await self.request("LIST_USERS")
+        return self.users
+
+    async def list_groups(self) -> Dict[str, Set[str]]:
+        await self.request("LIST_GROUPS")
+        return self.groups
+
+    async def create_group(self, group: str) -> str:
+        return await self.request(f"CREATE_GROUP:{group}")
+
+    async def join_group(self, group: str) -> str:
+        return await self.request(f"JOIN_GROUP:{group}")
+
+    async def leave_group(self, group: str) -> str:
+        return await self.request(f"LEAVE_GROUP:{group}")
+
+    async def invite(self, group: str, user: str) -> str:
+        return await self.request(f"INVITE_TO_GROUP:{group}:{user}")
+
+    async def open_chat(self, user: str) -> str:
+        return await self.request(f"CONNECT:{user}")
+
+    async def close_chat(self) -> str:
+        return await self.request("DISCONNECT_CHAT")
+
+    async def send(self, text: str) -> str:
+        """Send `text` to the open chat (or to the server when no chat is open)."""
+        return await self.request(text)
+
+    async def send_group(self, group: str, text: str) -> str:
+        return await self.request(f"GROUP:{group}:{text}")
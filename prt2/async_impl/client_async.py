@@ -1,13 +1,26 @@
+import argparse
 import asyncio
-import csv
+import atexit
+import heapq
+import itertools
 import json
+import re
 import sys
 import os
+import random
+import time
+import weakref
+import zlib
+from collections import deque, namedtuple
 from datetime import datetime
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import config
+from utils.metrics import LatencyHistogram, ThroughputCounter
+from utils.csv_source import CsvSource
+from async_impl.scheduler import ReplayScheduler, parse_offset
+from async_impl.protocol import LineFramer
 
 config.load_config()
 
@@ -16,13 +29,69 @@ PORT = config.get_client_port()
 CSV_FILE = "../prt1/group68_http_input.csv"
 MAX_MESSAGE_SIZE = config.get_max_message_size()
 READ_TIMEOUT = config.get_read_timeout()
+READ_CHUNK_SIZE = 65536
+MAX_MESSAGE_LOG = config.get_max_message_log()
 
-message_log: List[Dict] = []
+message_log: deque = deque(maxlen=MAX_MESSAGE_LOG)  # most recent entries only
+message_counts: Dict[str, int] = {'sent': 0, 'received': 0, 'error': 0}
+# Send-to-response latency of every request, in constant memory
+latency_histogram = LatencyHistogram()
+response_throughput = ThroughputCounter()
+THROUGHPUT_WINDOWS = (1, 10, 60)
+
+# send_single_message keeps one registered connection per event loop
+_single_connections: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, PipelinedConnection]' = weakref.WeakKeyDictionary()
+_single_connection_locks: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+# One task per shared connection that ends its session when the loop finishes
+_single_connection_keepers: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]' = weakref.WeakKeyDictionary()
+# Default names are unique per connection, so a new loop never collides with one the server still holds
+_single_connection_ids = itertools.count(1)
+
+# Reply lines to a correlated request: "#<id>+line" (more follows) or "#<id>|line" (last)
+REPLY_PREFIX = re.compile(r'#([A-Za-z0-9_-]{1,32})([|+])(.*)$')
+
+# Reported by the CSV replays after every row: counts so far (failed includes
+# the rate-limited replies), the row total when the CSV cache knows it (else
+# None) and the RTT of the latest reply
+CsvProgress = namedtuple("CsvProgress", ["sent", "acked", "failed", "rate_limited", "total", "elapsed", "rtt_ms"])
+
+RATE_LIMIT_REPLY = "ERROR: Rate limit exceeded"
+
+
+def _log_message(log_entry: dict, log: Optional[deque] = None):
+    (message_log if log is None else log).append(log_entry)
+    message_counts[log_entry['direction']] = message_counts.get(log_entry['direction'], 0) + 1
+
+
+def _reply_failure(response: str) -> Optional[str]:
+    """'rate_limited' or 'error' when the server refused the message, None when it accepted it."""
+    if response.startswith(RATE_LIMIT_REPLY):
+        return 'rate_limited'
+    if response.startswith("ERROR"):
+        return 'error'
+    return None
+
+
+def _record_latency(rtt: float):
+    latency_histogram.record(rtt)
+    response_throughput.record(time.monotonic())
+
+
+async def _read_response(reader: asyncio.StreamReader) -> bytes:
+    """Read until the buffered data ends on a line boundary, so a reply split across segments is read whole."""
+    data = await reader.read(MAX_MESSAGE_SIZE)
+    while data and not data.endswith(b'\n'):
+        chunk = await reader.read(MAX_MESSAGE_SIZE)
+        if not chunk:
+            break
+        data += chunk
+    return data
 
 
 async def send_message(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, 
                       message: str, msg_id: int = None):
     try:
+        started = time.perf_counter()
         message_with_newline = message + '\n'
         writer.write(message_with_newline.encode('utf-8'))
         await writer.drain()
@@ -34,23 +103,26 @@ async def send_message(reader: asyncio.StreamReader, writer: asyncio.StreamWrite
             'direction': 'sent',
             'message': message
         }
-        message_log.append(log_entry)
+        _log_message(log_entry)
         
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Sent (ID: {msg_id}): {message}")
         
         try:
-            response_data = await asyncio.wait_for(reader.read(MAX_MESSAGE_SIZE), timeout=READ_TIMEOUT)
+            response_data = await asyncio.wait_for(_read_response(reader), timeout=READ_TIMEOUT)
         except asyncio.TimeoutError:
             raise Exception("Timeout waiting for server response")
+        rtt = time.perf_counter() - started
+        _record_latency(rtt)
         response = response_data.decode('utf-8').strip()
         
         log_entry = {
             'timestamp': datetime.now().isoformat(),
             'msg_id': msg_id,
             'direction': 'received',
-            'message': response
+            'message': response,
+            'rtt_ms': round(rtt * 1000, 3)
         }
-        message_log.append(log_entry)
+        _log_message(log_entry)
         
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Received (ID: {msg_id}): {response}")
         
@@ -63,92 +135,985 @@ async def send_message(reader: asyncio.StreamReader, writer: asyncio.StreamWrite
             'direction': 'error',
             'message': str(e)
         }
-        message_log.append(error_entry)
+        _log_message(error_entry)
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Error (ID: {msg_id}): {e}")
         raise
 
 
-async def send_messages_from_csv(csv_file: str = CSV_FILE, delay: float = 0.1):
+async def send_messages_from_csv(csv_file: str = CSV_FILE, delay: float = 0.1, window: int = 1,
+                                 name: str = None, on_progress: Callable[[CsvProgress], None] = None) -> dict:
+    """Replay the CSV messages to the server.
+    
+    Args:
+        csv_file: CSV file to read
+        delay: Pause between messages (stop-and-wait mode only)
+        window: Messages allowed in flight at once. 1 keeps the original
+            stop-and-wait behaviour; larger values pipeline over one connection
+        name: Client name to register in windowed mode
+        on_progress: Called on the event loop with a CsvProgress after every
+            row is sent and after every reply or failure
+    
+    Returns:
+        The summary (messages_sent, messages_failed, duration_seconds,
+        throughput_msgs_per_sec, rtt_ms), or {'error': reason} when the
+        replay could not start. Cancelling the task stops the replay after
+        closing the connection.
+    """
+    if window > 1:
+        return await _send_messages_windowed(csv_file, window, name or f"csv_replay_{os.getpid()}", on_progress)
     try:
         reader, writer = await asyncio.open_connection(HOST, PORT)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connected to server at: {HOST}:{PORT}")
-        
+    except ConnectionRefusedError:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: Server is not responding.")
+        return {'error': "Server is not responding"}
+    except OSError as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: {e}")
+        return {'error': str(e)}
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Connected to server at: {HOST}:{PORT}")
+    
+    try:
         try:
             welcome_data = await asyncio.wait_for(reader.read(MAX_MESSAGE_SIZE), timeout=READ_TIMEOUT)
         except asyncio.TimeoutError:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Timeout waiting for welcome message")
-            writer.close()
-            await writer.wait_closed()
-            return
+            return {'error': "Timeout waiting for welcome message"}
         welcome = welcome_data.decode('utf-8')
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Server says: {welcome}")
         
         messages_sent = 0
         messages_failed = 0
+        rate_limited = 0
+        rtts = LatencyHistogram()
         
+        started = time.perf_counter()
         try:
-            with open(csv_file, 'r', encoding='utf-8') as file:
-                reader_csv = csv.DictReader(file)
-                for row in reader_csv:
-                    if row['src_app'] == 'client_browser' and row['dst_app'] == 'web_server':
-                        message = row['message']
-                        msg_id = int(row['msg_id'])
-                        
-                        try:
-                            await send_message(reader, writer, message, msg_id)
-                            messages_sent += 1
-                            
-                            if delay > 0:
-                                await asyncio.sleep(delay)
-                                
-                        except Exception as e:
-                            messages_failed += 1
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send message {msg_id}: {e}")
-                            continue
-                            
+            source = CsvSource(csv_file)
+            total = source.cached_count()
+            for msg_id, message, _, _ in source:
+                rtt_ms = None
+                sent_at = time.perf_counter()
+                try:
+                    failure = _reply_failure(await send_message(reader, writer, message, msg_id))
+                    if failure is None:
+                        messages_sent += 1
+                        rtt = time.perf_counter() - sent_at
+                        rtts.record(rtt)
+                        rtt_ms = round(rtt * 1000, 3)
+                    else:
+                        messages_failed += 1
+                        rate_limited += failure == 'rate_limited'
+                except Exception as e:
+                    messages_failed += 1
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send message {msg_id}: {e}")
+                if on_progress is not None:
+                    on_progress(CsvProgress(messages_sent + messages_failed, messages_sent, messages_failed,
+                                            rate_limited, total, time.perf_counter() - started, rtt_ms))
+                if delay > 0:
+                    await asyncio.sleep(delay)
         except FileNotFoundError:
             print(f"Error: CSV file '{csv_file}' not found.")
-            return
+            return {'error': f"CSV file '{csv_file}' not found"}
         
+        elapsed = time.perf_counter() - started
+        summary = {
+            'window': 1,
+            'messages_sent': messages_sent,
+            'messages_failed': messages_failed,
+            'messages_rate_limited': rate_limited,
+            'duration_seconds': round(elapsed, 3),
+            'throughput_msgs_per_sec': round(messages_sent / elapsed, 2) if elapsed > 0 else 0.0,
+            'rtt_ms': rtts.summary(),
+        }
         print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Summary:")
         print(f"  Messages sent successfully: {messages_sent}")
-        print(f"  Messages failed: {messages_failed}")
+        print(f"  Messages failed: {messages_failed} ({rate_limited} rate limited by the server)")
         print(f"  Total messages in log: {len(message_log)}")
-        
+        if elapsed > 0:
+            print(f"  Throughput: {messages_sent / elapsed:.1f} msg/s")
+        return summary
+    finally:
         writer.close()
-        await writer.wait_closed()
+        try:
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection closed.")
+
+class PipelinedConnection:
+    """A registered server connection with many requests in flight at once.
+    
+    Every request is sent as "#<id>|command". The server tags each reply line
+    with the same id ("#<id>+..." for continuation lines, "#<id>|..." for the
+    last one), and a background reader resolves the future waiting on that id.
+    Untagged lines (chat messages, USER_CONNECTED:, GROUP_UPDATED: ...) are
+    passed to `on_unsolicited`.
+    """
+    
+    def __init__(self, host: str = HOST, port: int = PORT,
+                 on_unsolicited: Optional[Callable[[str], None]] = None, max_in_flight: int = 64,
+                 log: Optional[deque] = None):
+        self.host = host
+        self.port = port
+        self.on_unsolicited = on_unsolicited
+        self.log = message_log if log is None else log
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self._ids = itertools.count(1)
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._commands: Dict[str, str] = {}  # request id -> command, while unanswered
+        self._partial: Dict[str, List[str]] = {}
+        self._window = asyncio.Semaphore(max_in_flight)
+        self._read_task: Optional[asyncio.Task] = None
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._pending)
+    
+    @property
+    def connected(self) -> bool:
+        return self._read_task is not None and not self._read_task.done()
+    
+    async def connect(self, name: str) -> str:
+        """Open the connection and register `name`.
+        
+        Returns:
+            The server's name acknowledgement
+        """
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connected to server at: {self.host}:{self.port}")
+        
+        while True:
+            line = await self._read_line()
+            if line.startswith("Please send your name"):
+                break
+        self.writer.write(f"{name}\n".encode('utf-8'))
+        await self.writer.drain()
         
+        while True:
+            line = await self._read_line()
+            if line.startswith("ERROR"):
+                await self.close()
+                raise Exception(line)
+            if line.startswith("Name registered"):
+                ack = line
+                await self._read_line()  # command summary
+                break
+            self._dispatch_unsolicited(line)
+        
+        self._read_task = asyncio.create_task(self._read_loop())
+        return ack
+    
+    async def _read_line(self) -> str:
+        try:
+            data = await asyncio.wait_for(self.reader.readline(), timeout=READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Exception("Timeout waiting for server response")
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        return data.decode('utf-8').rstrip('\r\n')
+    
+    def _dispatch_unsolicited(self, line: str):
+        if self.on_unsolicited:
+            self.on_unsolicited(line)
+    
+    def _dispatch_line(self, line: str):
+        match = REPLY_PREFIX.match(line)
+        if match is None:
+            self._dispatch_unsolicited(line)
+            return
+        request_id, marker, text = match.groups()
+        self._partial.setdefault(request_id, []).append(text)
+        if marker == '|':
+            lines = self._partial.pop(request_id)
+            future = self._finish_request(request_id)
+            if future is not None and not future.done():
+                future.set_result("\n".join(lines))
+    
+    def _finish_request(self, request_id: str) -> Optional[asyncio.Future]:
+        """Drop the bookkeeping of an answered or abandoned request and return its future."""
+        self._commands.pop(request_id, None)
+        self._partial.pop(request_id, None)
+        return self._pending.pop(request_id, None)
+    
+    async def _read_loop(self):
+        error: Exception = ConnectionError("Server closed the connection")
+        cancelled = False
+        try:
+            framer = LineFramer()
+            while True:
+                # One read can complete many lines when replies arrive back to back
+                data = await self.reader.read(READ_CHUNK_SIZE)
+                if not data:
+                    break
+                for line in framer.feed(data):
+                    self._dispatch_line(line)
+        except asyncio.CancelledError:
+            cancelled = True
+            error = ConnectionError("Connection closed")
+            raise
+        except (ConnectionError, OSError) as e:
+            error = e
+        finally:
+            self._partial.clear()
+            if cancelled:
+                # Shutting down (e.g. asyncio.run() cancelling leftover tasks): nothing to recover
+                self._fail_pending(error)
+            else:
+                self._connection_lost(error)
+    
+    def _connection_lost(self, error: Exception):
+        """Called by the reader when the connection is gone."""
+        self._fail_pending(error)
+    
+    def _fail_pending(self, error: Exception):
+        """Fail every unanswered request."""
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        self._commands.clear()
+    
+    async def _send_request(self, request_id: str, command: str):
+        self.writer.write(f"#{request_id}|{command}\n".encode('utf-8'))
+        await self.writer.drain()
+    
+    async def request(self, command: str, timeout: float = READ_TIMEOUT, msg_id: int = None) -> str:
+        """Send one command and wait for its own reply.
+        
+        Many calls can be awaited concurrently; up to `max_in_flight` are on the wire at once.
+        
+        Args:
+            command: Command or message text (single line)
+            timeout: Seconds to wait for the reply
+            msg_id: Optional id recorded in the message log
+        
+        Returns:
+            The reply text (multi-line replies joined with newlines)
+        """
+        response, _ = await self.request_timed(command, timeout, msg_id)
+        return response
+    
+    async def request_timed(self, command: str, timeout: float = READ_TIMEOUT, msg_id: int = None) -> Tuple[str, float]:
+        """Like request(), but also return the round-trip time in seconds.
+        
+        The RTT is measured from the write to the final reply line, so time spent
+        waiting for a free slot in the window is not counted.
+        """
+        if not self.connected:
+            raise ConnectionError("Not connected")
+        async with self._window:
+            request_id = str(next(self._ids))
+            future = asyncio.get_running_loop().create_future()
+            self._pending[request_id] = future
+            self._commands[request_id] = command
+            
+            started = time.perf_counter()
+            await self._send_request(request_id, command)
+            _log_message({
+                'timestamp': datetime.now().isoformat(),
+                'msg_id': msg_id,
+                'direction': 'sent',
+                'message': command
+            }, self.log)
+            
+            try:
+                response = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                self._finish_request(request_id)
+                _log_message({
+                    'timestamp': datetime.now().isoformat(),
+                    'msg_id': msg_id,
+                    'direction': 'error',
+                    'message': "Timeout waiting for server response"
+                }, self.log)
+                raise Exception("Timeout waiting for server response")
+            rtt = time.perf_counter() - started
+        _record_latency(rtt)
+        
+        _log_message({
+            'timestamp': datetime.now().isoformat(),
+            'msg_id': msg_id,
+            'direction': 'received',
+            'message': response,
+            'rtt_ms': round(rtt * 1000, 3)
+        }, self.log)
+        return response, rtt
+    
+    async def close(self):
+        if self.writer and not self.writer.is_closing():
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+        if self._read_task:
+            # wait() raises neither the reader's error nor its cancellation, only a cancellation of close()
+            await asyncio.wait([self._read_task])
+            if not self._read_task.cancelled():
+                self._read_task.exception()     # Mark it retrieved; the reader already failed every request
+
+
+class ResumeError(Exception):
+    """The server no longer holds the session a resume token refers to."""
+
+
+def backoff_delay(attempt: int, base_delay: float = None, max_delay: float = None) -> float:
+    """Full-jitter exponential backoff: a random delay in [0, min(max_delay, base_delay * 2**attempt)]."""
+    default_base, default_max, _ = config.get_reconnect_settings()
+    base_delay = default_base if base_delay is None else base_delay
+    max_delay = default_max if max_delay is None else max_delay
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def open_session(host: str, port: int, name: str = None, token: str = None,
+                       on_line: Optional[Callable[[str], None]] = None):
+    """Open a connection and either register `name` as a resumable session or resume `token`.
+    
+    Lines that arrive during the handshake but are not part of it are passed to `on_line`.
+    
+    Returns:
+        (reader, writer, name, token)
+    
+    Raises:
+        ResumeError: The token is unknown or its grace period has passed
+        Exception: The server rejected the name
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    
+    async def read_line() -> str:
+        try:
+            data = await asyncio.wait_for(reader.readline(), timeout=READ_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise Exception("Timeout waiting for server response")
+        if not data:
+            raise ConnectionError("Server closed the connection")
+        return data.decode('utf-8').rstrip('\r\n')
+    
+    try:
+        while not (await read_line()).startswith("Please send your name"):
+            pass
+        writer.write((f"RESUME:{token}\n" if token else f"SESSION:{name}\n").encode('utf-8'))
+        await writer.drain()
+        
+        while True:
+            line = await read_line()
+            if line.startswith("ERROR"):
+                raise ResumeError(line) if token else Exception(line)
+            if token and line.startswith("Session resumed: "):
+                return reader, writer, line[len("Session resumed: "):], token
+            if not token and line.startswith("RESUME_TOKEN:"):
+                return reader, writer, name, line[len("RESUME_TOKEN:"):]
+            if not token and (line.startswith("Name registered") or line.startswith("Commands:")):
+                continue
+            if on_line:
+                on_line(line)
+    except BaseException:
+        writer.close()
+        raise
+
+
+class ResumableConnection(PipelinedConnection):
+    """A PipelinedConnection that survives network drops.
+    
+    It registers a resumable session and keeps its resume token. When the
+    connection is lost it reconnects with jittered exponential backoff,
+    resumes the session (collecting the lines the server held for it) and
+    resends every request that was still unanswered. The server answers a
+    resent request from its reply cache if it already ran it.
+    `on_state_change` is called with 'reconnecting', 'resumed',
+    'reregistered' or 'failed'.
+    """
+    
+    def __init__(self, host: str = HOST, port: int = PORT,
+                 on_unsolicited: Optional[Callable[[str], None]] = None, max_in_flight: int = 64,
+                 log: Optional[deque] = None, on_state_change: Optional[Callable[[str], None]] = None):
+        super().__init__(host, port, on_unsolicited, max_in_flight, log)
+        self.on_state_change = on_state_change
+        self.name: Optional[str] = None
+        self.token: Optional[str] = None
+        self._online = asyncio.Event()
+        self._closing = False
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._written: set = set()  # ids of pending requests already put on the wire
+    
+    @property
+    def connected(self) -> bool:
+        if self._closing:
+            return False
+        return super().connected or (self._reconnect_task is not None and not self._reconnect_task.done())
+    
+    async def connect(self, name: str) -> str:
+        self.name = name
+        self.reader, self.writer, _, self.token = await open_session(
+            self.host, self.port, name=name, on_line=self._dispatch_unsolicited)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connected to server at: {self.host}:{self.port}")
+        self._online.set()
+        self._read_task = asyncio.create_task(self._read_loop())
+        return f"Name registered: {name}"
+    
+    def _notify_state(self, state: str):
+        if self.on_state_change:
+            self.on_state_change(state)
+    
+    def _connection_lost(self, error: Exception):
+        self._online.clear()
+        if self._closing or self.token is None:
+            super()._connection_lost(error)
+            return
+        self._reconnect_task = asyncio.create_task(self._reconnect(error))
+    
+    def _finish_request(self, request_id: str) -> Optional[asyncio.Future]:
+        self._written.discard(request_id)
+        return super()._finish_request(request_id)
+    
+    def _fail_pending(self, error: Exception):
+        super()._fail_pending(error)
+        self._written.clear()
+    
+    async def _send_request(self, request_id: str, command: str):
+        await self._online.wait()
+        if request_id in self._written or request_id not in self._pending:
+            return  # already resent by the reconnect (and possibly answered)
+        self._written.add(request_id)
+        try:
+            await super()._send_request(request_id, command)
+        except (ConnectionError, OSError):
+            # The reconnect resends everything still pending, including this request
+            pass
+    
+    async def _reconnect(self, error: Exception):
+        _, _, max_attempts = config.get_reconnect_settings()
+        self._notify_state('reconnecting')
+        for attempt in range(max_attempts):
+            await asyncio.sleep(backoff_delay(attempt))
+            if self._closing:
+                break
+            try:
+                try:
+                    self.reader, self.writer, _, self.token = await open_session(
+                        self.host, self.port, token=self.token, on_line=self._dispatch_unsolicited)
+                    state = 'resumed'
+                except ResumeError:
+                    # The grace period passed; start a new session under the same name
+                    self.reader, self.writer, _, self.token = await open_session(
+                        self.host, self.port, name=self.name, on_line=self._dispatch_unsolicited)
+                    state = 'reregistered'
+            except Exception as e:
+                error = e
+                log_msg = f"Reconnect attempt {attempt + 1}/{max_attempts} failed: {e}"
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
+                continue
+            
+            self._read_task = asyncio.create_task(self._read_loop())
+            self._written = set(self._pending)
+            for request_id in sorted(self._pending, key=int):
+                self.writer.write(f"#{request_id}|{self._commands[request_id]}\n".encode('utf-8'))
+            await self.writer.drain()
+            self._online.set()
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Session {state}; resent {len(self._pending)} pending request(s)")
+            self._notify_state(state)
+            return
+        
+        self._notify_state('failed')
+        super()._connection_lost(error)
+    
+    async def close(self):
+        """End the session on the server and close the connection."""
+        self._closing = True
+        if self._reconnect_task and not self._reconnect_task.done():
+            self._reconnect_task.cancel()
+        if self.writer and not self.writer.is_closing():
+            try:
+                self.writer.write(b"END_SESSION\n")
+                await self.writer.drain()
+            except (ConnectionError, OSError):
+                pass
+        self._online.set()
+        await super().close()
+
+
+async def _send_messages_windowed(csv_file: str, window: int, name: str,
+                                  on_progress: Callable[[CsvProgress], None] = None) -> dict:
+    """Pipeline the CSV messages with up to `window` outstanding on one connection.
+    
+    Replies are matched to their msg_id through correlation IDs, so the RTT
+    percentiles and the achieved throughput can be reported. Per-message
+    replies are kept only in the bounded message log.
+    """
+    conn = PipelinedConnection(HOST, PORT, max_in_flight=window)
+    try:
+        await conn.connect(name)
+    except ConnectionRefusedError:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: Server is not responding.")
+        return {'error': "Server is not responding"}
+    
+    rtts = LatencyHistogram()
+    slots = asyncio.Semaphore(window)
+    tasks = set()
+    counts = {'sent': 0, 'acked': 0, 'failed': 0, 'rate_limited': 0}
+    total = None
+    started = time.perf_counter()
+    
+    def report(rtt_ms: Optional[float] = None):
+        if on_progress is not None:
+            on_progress(CsvProgress(counts['sent'], counts['acked'], counts['failed'], counts['rate_limited'],
+                                    total, time.perf_counter() - started, rtt_ms))
+    
+    async def send_one(msg_id: int, message: str):
+        try:
+            response, rtt = await conn.request_timed(message, msg_id=msg_id)
+            failure = _reply_failure(response)
+            if failure is None:
+                rtts.record(rtt)
+                counts['acked'] += 1
+                report(round(rtt * 1000, 3))
+            else:
+                counts['failed'] += 1
+                counts['rate_limited'] += failure == 'rate_limited'
+                report()
+        except Exception as e:
+            counts['failed'] += 1
+            report()
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send message {msg_id}: {e}")
+        finally:
+            slots.release()
+    
+    try:
+        source = CsvSource(csv_file)
+        total = source.cached_count()
+        for msg_id, message, _, _ in source:
+            await slots.acquire()
+            task = asyncio.create_task(send_one(msg_id, message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            counts['sent'] += 1
+            report()
+        if tasks:
+            await asyncio.gather(*tasks)
+    except FileNotFoundError:
+        print(f"Error: CSV file '{csv_file}' not found.")
+        return {'error': f"CSV file '{csv_file}' not found"}
+    finally:
+        # Cancelled or failed: stop the requests still in flight along with the connection
+        for task in list(tasks):
+            task.cancel()
+        await conn.close()
+    elapsed = time.perf_counter() - started
+    
+    messages_sent, messages_failed = counts['acked'], counts['failed']
+    summary = {
+        'window': window,
+        'messages_sent': messages_sent,
+        'messages_failed': messages_failed,
+        'messages_rate_limited': counts['rate_limited'],
+        'duration_seconds': round(elapsed, 3),
+        'throughput_msgs_per_sec': round(messages_sent / elapsed, 2) if elapsed > 0 else 0.0,
+        'rtt_ms': rtts.summary(),
+    }
+    
+    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Summary (window={window}):")
+    print(f"  Messages sent successfully: {messages_sent}")
+    print(f"  Messages failed: {messages_failed} ({counts['rate_limited']} rate limited by the server)")
+    print(f"  Throughput: {summary['throughput_msgs_per_sec']} msg/s over {summary['duration_seconds']}s")
+    rtt = summary['rtt_ms']
+    print(f"  RTT ms: p50 {rtt['p50']}  p90 {rtt['p90']}  p99 {rtt['p99']}  max {rtt['max']}")
+    return summary
+
+
+async def send_messages_timed(csv_file: str = CSV_FILE, speed: float = 1.0, name: str = None,
+                              timestamp_column: str = None, max_in_flight: int = 1024) -> dict:
+    """Replay the CSV at the pace recorded in its timestamp column.
+    
+    Each row is dispatched at its recorded offset divided by `speed`, without
+    waiting for earlier replies, so bursts in the capture stay bursts on the wire.
+    
+    Args:
+        csv_file: CSV file to read
+        speed: 1 = recorded pace, 10 = ten times faster, 0 = as fast as possible
+        name: Client name to register
+        timestamp_column: Column holding seconds since start or ISO datetimes (default: from config)
+        max_in_flight: Upper bound on unanswered messages
+    
+    Returns:
+        The summary, or {'error': reason} when the replay could not start
+    """
+    conn = PipelinedConnection(HOST, PORT, max_in_flight=max_in_flight)
+    try:
+        await conn.connect(name or f"csv_timed_{os.getpid()}")
+    except ConnectionRefusedError:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: Server is not responding.")
+        return {'error': "Server is not responding"}
+    except Exception as e:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: {e}")
+        await conn.close()
+        return {'error': str(e)}
+    
+    scheduler = ReplayScheduler(speed)
+    rtts = LatencyHistogram()
+    failed = rate_limited = 0
+    tasks = set()
+    
+    async def send_one(msg_id: int, message: str):
+        nonlocal failed, rate_limited
+        try:
+            response, rtt = await conn.request_timed(message, msg_id=msg_id)
+            failure = _reply_failure(response)
+            if failure is None:
+                rtts.record(rtt)
+            else:
+                failed += 1
+                rate_limited += failure == 'rate_limited'
+        except Exception as e:
+            failed += 1
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send message {msg_id}: {e}")
+    
+    started = time.perf_counter()
+    first = None
+    try:
+        columns = {'timestamp': timestamp_column} if timestamp_column else None
+        for item in CsvSource(csv_file, columns=columns):
+            offset, first = parse_offset(item.timestamp, first)
+            await scheduler.wait_until(offset)
+            task = asyncio.create_task(send_one(item.msg_id, item.message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    except FileNotFoundError:
+        print(f"Error: CSV file '{csv_file}' not found.")
+        return {'error': f"CSV file '{csv_file}' not found"}
+    finally:
+        for task in list(tasks):
+            task.cancel()
+        await conn.close()
+    elapsed = time.perf_counter() - started
+    
+    summary = {
+        'speed': speed,
+        'messages_sent': rtts.count,
+        'messages_failed': failed,
+        'messages_rate_limited': rate_limited,
+        'duration_seconds': round(elapsed, 3),
+        'throughput_msgs_per_sec': round(rtts.count / elapsed, 2) if elapsed > 0 else 0.0,
+        'schedule_lag_ms': scheduler.lag_summary(),
+        'rtt_ms': rtts.summary(),
+    }
+    lag = summary['schedule_lag_ms']
+    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Summary (timed replay, speed={speed}):")
+    print(f"  Messages sent successfully: {rtts.count}")
+    print(f"  Messages failed: {failed} ({rate_limited} rate limited by the server)")
+    print(f"  Throughput: {summary['throughput_msgs_per_sec']} msg/s over {summary['duration_seconds']}s")
+    print(f"  Schedule lag ms: p50 {lag['p50']}  p99 {lag['p99']}  max {lag['max']}")
+    if lag['p99'] > 10:
+        print("  Note: dispatches ran late; the client is limiting this replay, not the server")
+    return summary
+
+
+class ConnectionPool:
+    """A fixed set of registered PipelinedConnections to the same server.
+    
+    Keys are mapped to connections with a stable hash, so every message with
+    the same key goes over the same connection and keeps its order.
+    """
+    
+    def __init__(self, size: int, host: str = None, port: int = None, name_prefix: str = None,
+                 max_in_flight: int = 1):
+        self.size = max(1, size)
+        self.host = host or HOST
+        self.port = port or PORT
+        self.name_prefix = name_prefix or f"pool_{os.getpid()}"
+        self.max_in_flight = max_in_flight
+        self.connections: List[PipelinedConnection] = []
+        self.logs: List[deque] = []
+    
+    async def open(self):
+        for i in range(self.size):
+            log_entries: deque = deque(maxlen=MAX_MESSAGE_LOG)
+            conn = PipelinedConnection(self.host, self.port, max_in_flight=self.max_in_flight, log=log_entries)
+            try:
+                await conn.connect(f"{self.name_prefix}_{i}")
+            except BaseException:
+                await conn.close()
+                raise
+            self.connections.append(conn)
+            self.logs.append(log_entries)
+    
+    def index_for(self, key) -> int:
+        return zlib.crc32(str(key).encode('utf-8')) % self.size
+    
+    def connection_for(self, key) -> PipelinedConnection:
+        return self.connections[self.index_for(key)]
+    
+    def merged_log(self) -> List[Dict]:
+        """Merge the per-connection logs into one timeline ordered by timestamp."""
+        tagged = ([dict(entry, connection=i) for entry in entries] for i, entries in enumerate(self.logs))
+        return list(heapq.merge(*tagged, key=lambda entry: entry['timestamp']))
+    
+    async def close(self):
+        await asyncio.gather(*(conn.close() for conn in self.connections))
+    
+    async def __aenter__(self):
+        await self.open()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+
+async def send_messages_sharded(csv_file: str = CSV_FILE, connections: int = 4, key_column: str = 'msg_id',
+                                window: int = 1, name_prefix: str = None) -> dict:
+    """Replay the CSV over a pool of connections, partitioned by `key_column`.
+    
+    Rows with the same key always use the same connection and are sent in file
+    order. Each shard keeps up to `window` messages in flight.
+    
+    Args:
+        csv_file: CSV file to read
+        connections: Number of pooled connections (shards)
+        key_column: CSV column used to pick the shard, e.g. msg_id or app_protocol
+        window: Messages in flight per connection
+        name_prefix: Prefix for the registered client names
+    
+    Returns:
+        The summary, or {'error': reason} when the replay could not start
+    """
+    pool = ConnectionPool(connections, name_prefix=name_prefix, max_in_flight=window)
+    try:
+        await pool.open()
     except ConnectionRefusedError:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: Server is not responding.")
+        await pool.close()
+        return {'error': "Server is not responding"}
     except Exception as e:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] An error occurred: {e}")
+        # e.g. a pooled name already in use; the connections opened so far are closed
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: {e}")
+        await pool.close()
+        return {'error': str(e)}
+    
+    queues = [asyncio.Queue(maxsize=window * 4) for _ in range(pool.size)]
+    rtts = LatencyHistogram()
+    per_connection = [{'sent': 0, 'failed': 0, 'rate_limited': 0} for _ in range(pool.size)]
+    
+    async def shard_worker(index: int):
+        conn = pool.connections[index]
+        slots = asyncio.Semaphore(window)
+        tasks = set()
+        
+        async def send_one(msg_id: int, message: str):
+            try:
+                response, rtt = await conn.request_timed(message, msg_id=msg_id)
+                failure = _reply_failure(response)
+                if failure is None:
+                    rtts.record(rtt)
+                    per_connection[index]['sent'] += 1
+                else:
+                    per_connection[index]['failed'] += 1
+                    per_connection[index]['rate_limited'] += failure == 'rate_limited'
+            except Exception as e:
+                per_connection[index]['failed'] += 1
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Failed to send message {msg_id}: {e}")
+            finally:
+                slots.release()
+        
+        while True:
+            item = await queues[index].get()
+            if item is None:
+                break
+            await slots.acquire()
+            # Requests are written in task start order, which keeps per-key order on the wire
+            task = asyncio.create_task(send_one(*item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if tasks:
+            await asyncio.gather(*tasks)
+    
+    started = time.perf_counter()
+    workers = [asyncio.create_task(shard_worker(i)) for i in range(pool.size)]
+    try:
+        for item in CsvSource(csv_file, key_column=key_column):
+            await queues[pool.index_for(item.key)].put((item.msg_id, item.message))
+    except FileNotFoundError:
+        print(f"Error: CSV file '{csv_file}' not found.")
+        return {'error': f"CSV file '{csv_file}' not found"}
+    finally:
+        for queue in queues:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+        await pool.close()
+    elapsed = time.perf_counter() - started
+    
+    timeline = pool.merged_log()
+    message_log.extend(timeline)
+    messages_sent = sum(c['sent'] for c in per_connection)
+    messages_failed = sum(c['failed'] for c in per_connection)
+    rate_limited = sum(c['rate_limited'] for c in per_connection)
+    summary = {
+        'connections': pool.size,
+        'key_column': key_column,
+        'window': window,
+        'messages_sent': messages_sent,
+        'messages_failed': messages_failed,
+        'messages_rate_limited': rate_limited,
+        'duration_seconds': round(elapsed, 3),
+        'throughput_msgs_per_sec': round(messages_sent / elapsed, 2) if elapsed > 0 else 0.0,
+        'rtt_ms': rtts.summary(),
+        'per_connection': per_connection,
+        'timeline': timeline,
+    }
+    
+    print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Summary ({pool.size} connections by {key_column}, window={window}):")
+    print(f"  Messages sent successfully: {messages_sent}")
+    print(f"  Messages failed: {messages_failed} ({rate_limited} rate limited by the server)")
+    print(f"  Throughput: {summary['throughput_msgs_per_sec']} msg/s over {summary['duration_seconds']}s")
+    for i, counts in enumerate(per_connection):
+        print(f"  Connection {i}: {counts['sent']} sent, {counts['failed']} failed ({counts['rate_limited']} rate limited)")
+    return summary
 
 
 def get_statistics():
-    sent = sum(1 for msg in message_log if msg['direction'] == 'sent')
-    received = sum(1 for msg in message_log if msg['direction'] == 'received')
-    errors = sum(1 for msg in message_log if msg['direction'] == 'error')
+    """Message counts, request latency percentiles and recent throughput.
     
+    Returns:
+        Dict with the message counters, 'latency_ms' (count/mean/p50/p90/p99/max)
+        and 'throughput_per_sec' (responses per second over the last 1/10/60 seconds)
+    """
+    now = time.monotonic()
     return {
         'total_messages': len(message_log),
-        'messages_sent': sent,
-        'messages_received': received,
-        'errors': errors
+        'messages_sent': message_counts.get('sent', 0),
+        'messages_received': message_counts.get('received', 0),
+        'errors': message_counts.get('error', 0),
+        'latency_ms': latency_histogram.summary(),
+        'throughput_per_sec': {f"{w}s": round(response_throughput.rate(now, w), 2) for w in THROUGHPUT_WINDOWS},
     }
 
 
-def export_logs(filename: str = None):
+def export_logs(filename: str = None, include_histogram: bool = False):
+    """Write the message log to JSON.
+    
+    Args:
+        filename: Output file (default: client_logs_<timestamp>.json)
+        include_histogram: Write {'messages', 'statistics', 'latency_histogram'}
+            instead of the bare message list
+    """
     if filename is None:
         filename = f"client_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
+    data = list(message_log)
+    if include_histogram:
+        data = {
+            'messages': data,
+            'statistics': get_statistics(),
+            'latency_histogram': latency_histogram.to_dict(),
+        }
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(message_log, f, indent=2, ensure_ascii=False)
+        json.dump(data, f, indent=2, ensure_ascii=False)
     
     return filename
 
 
-async def send_single_message(message: str):
+def _close_single_message_connections():
+    """atexit hook: close the connections kept by send_single_message."""
+    for loop, conn in list(_single_connections.items()):
+        try:
+            if not loop.is_closed() and not loop.is_running():
+                loop.run_until_complete(conn.close())
+            elif conn.writer is not None:
+                conn.writer.close()
+        except Exception:
+            pass
+    _single_connections.clear()
+
+
+atexit.register(_close_single_message_connections)
+
+
+async def _end_single_session(conn: PipelinedConnection):
+    """Log the shared connection out, so the server frees its name at once."""
+    if conn.writer is not None and not conn.writer.is_closing():
+        try:
+            conn.writer.write(b"END_SESSION\n")
+            await conn.writer.drain()
+        except (ConnectionError, OSError):
+            pass
+    try:
+        await conn.close()
+    except asyncio.CancelledError:
+        pass  # its read task was cancelled along with this one
+
+
+async def _keep_single_connection(loop: asyncio.AbstractEventLoop, conn: PipelinedConnection):
+    """Hold the loop's shared connection open until the loop finishes.
+    
+    asyncio.run() cancels the tasks still pending before it closes its loop;
+    that cancellation is the signal to end the session.
+    """
+    try:
+        await loop.create_future()
+    finally:
+        if _single_connections.get(loop) is conn:
+            del _single_connections[loop]
+        await _end_single_session(conn)
+
+
+async def _get_single_message_connection(name: Optional[str]) -> PipelinedConnection:
+    """Return this event loop's shared connection, opening it on first use or after a failure."""
+    loop = asyncio.get_running_loop()
+    lock = _single_connection_locks.get(loop)
+    if lock is None:
+        lock = _single_connection_locks[loop] = asyncio.Lock()
+    async with lock:
+        conn = _single_connections.get(loop)
+        if conn is not None and conn.connected and (conn.host, conn.port) == (HOST, PORT):
+            return conn
+        keeper = _single_connection_keepers.pop(loop, None)
+        if keeper is not None:
+            keeper.cancel()
+        if conn is not None:
+            del _single_connections[loop]
+            await conn.close()
+        conn = PipelinedConnection(HOST, PORT)
+        await conn.connect(name or f"single_{os.getpid()}_{next(_single_connection_ids)}")
+        _single_connections[loop] = conn
+        _single_connection_keepers[loop] = loop.create_task(_keep_single_connection(loop, conn))
+        return conn
+
+
+async def send_single_message(message: str, pooled: bool = True, name: str = None):
+    """Send one message and return the server's reply.
+    
+    By default the message goes over a long-lived connection that is opened
+    (and registered as `name`) on the first call in an event loop, reused by
+    later calls in that loop, reopened if it breaks, and logged out with
+    END_SESSION when the loop finishes (e.g. when asyncio.run() returns). A
+    message whose connection fails mid-request is retried once on a fresh
+    connection.
+    
+    The server rate-limits every connection (limits.rate_limit_messages_per_second
+    per limits.rate_limit_window_seconds in config.json), so one shared connection
+    carries at most that many calls per window; callers that need more must
+    spread them over several names or connections.
+    
+    Args:
+        message: Message text
+        pooled: False opens a new connection for this call only
+        name: Client name for the shared connection (default: single_<pid>_<n>,
+            unique per connection)
+    """
+    if pooled:
+        for attempt in range(2):
+            conn = await _get_single_message_connection(name)
+            try:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Sent: {message}")
+                response = await conn.request(message)
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Received: {response}")
+                return response
+            except (ConnectionError, OSError) as e:
+                if attempt:
+                    print(f"Error sending message: {e}")
+                    raise
+                await conn.close()
+    
     reader = None
     writer = None
     try:
@@ -180,14 +1145,35 @@ async def send_single_message(message: str):
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Send the CSV messages to the server")
+    parser.add_argument("--csv", default=CSV_FILE, help="CSV file to replay")
+    parser.add_argument("--window", type=int, default=1,
+                        help="Messages in flight at once (1 = stop-and-wait)")
+    parser.add_argument("--delay", type=float, default=0.1, help="Pause between messages in stop-and-wait mode")
+    parser.add_argument("--name", help="Client name to register in windowed mode")
+    parser.add_argument("--connections", type=int, default=1,
+                        help="Shard the replay over this many pooled connections")
+    parser.add_argument("--key-column", default="msg_id", help="CSV column used to pick the connection")
+    parser.add_argument("--speed", type=float,
+                        help="Replay at the CSV timestamps: 1 = recorded pace, 10 = 10x faster, 0 = max speed")
+    parser.add_argument("--histogram", action="store_true",
+                        help="Include statistics and the latency histogram in the exported log")
+    args = parser.parse_args()
     try:
-        asyncio.run(send_messages_from_csv())
+        if args.speed is not None:
+            asyncio.run(send_messages_timed(args.csv, args.speed, args.name))
+        elif args.connections > 1:
+            asyncio.run(send_messages_sharded(args.csv, args.connections, args.key_column, args.window, args.name))
+        else:
+            asyncio.run(send_messages_from_csv(args.csv, args.delay, args.window, args.name))
+        latency = get_statistics()['latency_ms']
+        print(f"Latency ms: p50 {latency['p50']}  p90 {latency['p90']}  p99 {latency['p99']}  max {latency['max']}")
         if message_log:
-            export_logs()
+            export_logs(include_histogram=args.histogram)
             print(f"Logs exported to client_logs_*.json")
     except KeyboardInterrupt:
         print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Interrupted by user")
         if message_log:
-            export_logs()
+            export_logs(include_histogram=args.histogram)
             print(f"Logs exported to client_logs_*.json")
 
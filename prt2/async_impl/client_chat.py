@@ -1,114 +1,255 @@
+import argparse
 import asyncio
+import os
 import sys
+import time
 from datetime import datetime
+from typing import AsyncIterator
 
-HOST = "192.168.0.106"
-PORT = 10000
-MAX_MESSAGE_SIZE = 4096
-READ_TIMEOUT = 30.0
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config
+import async_impl.client_async as client_async
+from async_impl.chat_client import ChatClient, ChatError
+from async_impl.scheduler import ReplayScheduler
+from async_impl.protocol import (ChatClosed, ChatOpened, DirectMessage, Error, GroupList, GroupMessage,
+                                 GroupUpdated, LineFramer, Notice, UserConnected, UserDisconnected, UserList)
 
+config.load_config()
 
-async def chat_client(client_name: str):
+HOST = config.get_client_host()
+PORT = config.get_client_port()
+MAX_MESSAGE_SIZE = config.get_max_message_size()
+READ_TIMEOUT = config.get_read_timeout()
+STDIN_CHUNK_SIZE = 65536
+SCRIPT_MAX_IN_FLIGHT = 256
+
+
+def format_event(event) -> str:
+    if isinstance(event, DirectMessage):
+        return f"[{event.sender}]: {event.text}"
+    if isinstance(event, GroupMessage):
+        return f"[{event.group}] {event.sender}: {event.text}"
+    if isinstance(event, UserList):
+        return f"Connected users ({len(event.names)}): {', '.join(event.names)}"
+    if isinstance(event, GroupList):
+        if not event.groups:
+            return "No groups available"
+        return "Groups: " + "; ".join(f"{group} ({', '.join(members)})" for group, members in event.groups.items())
+    if isinstance(event, UserConnected):
+        return f"{event.name} connected"
+    if isinstance(event, UserDisconnected):
+        return f"{event.name} disconnected"
+    if isinstance(event, GroupUpdated):
+        return f"Group '{event.group}' {event.action}" + (f" ({event.user})" if event.user else "")
+    if isinstance(event, ChatOpened):
+        return f"Chat with {event.name} opened. You can now send messages directly."
+    if isinstance(event, ChatClosed):
+        if event.reason == 'disconnected':
+            return f"Chat closed: {event.name} disconnected"
+        return "Chat closed" + (f" by {event.name}" if event.name else "")
+    if isinstance(event, (Error, Notice)):
+        return event.text
+    return str(event)
+
+
+async def stdin_lines() -> AsyncIterator[str]:
+    """Yield lines typed (or piped) on stdin without blocking the event loop.
+    
+    Terminals and pipes are registered with the event loop and framed with
+    LineFramer. Where that is not supported (regular files redirected to
+    stdin, Windows consoles) lines are read in a worker thread instead.
+    """
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader()
     try:
-        reader, writer = await asyncio.open_connection(HOST, PORT)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Connected to server at {HOST}:{PORT}")
-        
-        try:
-            welcome_data = await asyncio.wait_for(reader.read(MAX_MESSAGE_SIZE), timeout=READ_TIMEOUT)
-        except asyncio.TimeoutError:
-            print("Timeout: Server did not respond")
-            writer.close()
-            await writer.wait_closed()
-            return
-        welcome = welcome_data.decode('utf-8').strip()
-        print(f"Server: {welcome}")
-        
-        writer.write(f"{client_name}\n".encode('utf-8'))
-        await writer.drain()
-        
-        try:
-            name_response = await asyncio.wait_for(reader.read(MAX_MESSAGE_SIZE), timeout=READ_TIMEOUT)
-        except asyncio.TimeoutError:
-            print("Timeout: Server did not respond to name")
-            writer.close()
-            await writer.wait_closed()
-            return
-        name_resp = name_response.decode('utf-8').strip()
-        print(f"Server: {name_resp}")
-        
-        if "ERROR" in name_resp:
-            print("Failed to register name. Exiting.")
-            writer.close()
-            await writer.wait_closed()
-            return
-        
-        async def read_messages():
-            try:
-                while True:
-                    try:
-                        data = await reader.read(MAX_MESSAGE_SIZE)
-                    except Exception as e:
-                        print(f"\nError reading messages: {e}")
-                        break
-                    if not data:
-                        break
-                    message = data.decode('utf-8').strip()
-                    if message:
-                        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {message}")
-            except Exception as e:
-                print(f"Error reading messages: {e}")
-        
-        read_task = asyncio.create_task(read_messages())
-        
-        print("\nCommands:")
-        print("  CONNECT:name - Connect to another client")
-        print("  Type message and press Enter to send")
-        print("  Type 'quit' to exit\n")
-        
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader), sys.stdin)
+    except (NotImplementedError, OSError, ValueError):
+        while True:
+            line = await asyncio.to_thread(sys.stdin.readline)
+            if not line:
+                return
+            yield line.rstrip('\r\n')
+    
+    framer = LineFramer(MAX_MESSAGE_SIZE)
+    try:
+        while True:
+            data = await reader.read(STDIN_CHUNK_SIZE)
+            if not data:
+                break
+            for line in framer.feed(data):
+                yield line
+        tail = framer.flush()
+        if tail:
+            yield tail
+    finally:
+        transport.close()
+        # The pipe transport switched the shared fd to non-blocking mode
         try:
-            while True:
-                user_input = await asyncio.to_thread(input, f"[{client_name}]> ")
-                
-                if user_input.lower() == 'quit':
-                    break
-                
-                if user_input.strip():
-                    message_with_newline = user_input + '\n'
-                    writer.write(message_with_newline.encode('utf-8'))
-                    await writer.drain()
-        
-        except KeyboardInterrupt:
-            print("\nInterrupted by user")
-        except EOFError:
+            os.set_blocking(sys.stdin.fileno(), True)
+        except (OSError, ValueError):
             pass
-        
-        read_task.cancel()
+
+
+def _fits(line: str) -> bool:
+    if len(line.encode('utf-8')) > MAX_MESSAGE_SIZE:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Skipped a line longer than {MAX_MESSAGE_SIZE} bytes")
+        return False
+    return True
+
+
+async def run_script(client: ChatClient, script: str, rate: float = 0.0,
+                     max_in_flight: int = SCRIPT_MAX_IN_FLIGHT) -> dict:
+    """Send every non-empty line of `script` as a command, paced at `rate` lines per second.
+    
+    Commands are pipelined: up to `max_in_flight` replies can be outstanding,
+    so a slow reply does not hold back the schedule.
+    
+    Args:
+        client: A connected ChatClient
+        script: File with one command or message per line
+        rate: Target lines per second (0 = as fast as the window allows)
+        max_in_flight: Unanswered commands allowed at once
+    
+    Returns:
+        Counts, achieved rate, schedule lag and reply latency
+    """
+    scheduler = ReplayScheduler(speed=1.0 if rate > 0 else 0)
+    slots = asyncio.Semaphore(max_in_flight)
+    pending = set()
+    counts = {'sent': 0, 'errors': 0, 'failed': 0}
+    
+    async def send(line: str):
         try:
-            await read_task
-        except asyncio.CancelledError:
-            pass
-        
-        writer.close()
-        await writer.wait_closed()
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Disconnected from server")
-        
+            await client.request(line)
+        except ChatError:
+            counts['errors'] += 1
+        except Exception:
+            counts['failed'] += 1
+        finally:
+            slots.release()
+    
+    started = time.perf_counter()
+    with open(script, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line.strip() or not _fits(line):
+                continue
+            if rate > 0:
+                await scheduler.wait_until(counts['sent'] / rate)
+            await slots.acquire()
+            task = asyncio.create_task(send(line))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+            counts['sent'] += 1
+    if pending:
+        await asyncio.wait(pending)
+    elapsed = time.perf_counter() - started
+    
+    return {
+        **counts,
+        'seconds': round(elapsed, 3),
+        'lines_per_sec': round(counts['sent'] / elapsed, 1) if elapsed > 0 else 0.0,
+        'schedule_lag_ms': scheduler.lag_summary(),
+        'latency_ms': client_async.latency_histogram.summary(),
+    }
+
+
+async def chat_client(client_name: str, host: str = None, port: int = None, script: str = None,
+                      rate: float = 0.0, quiet: bool = False):
+    def print_event(event):
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] {format_event(event)}")
+    
+    def on_state_change(state: str):
+        if state == 'reconnecting':
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Connection lost, reconnecting...")
+        elif state in ('resumed', 'reregistered'):
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Reconnected ({state})")
+        elif state == 'failed':
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Could not reconnect. Type 'quit' to exit.")
+    
+    client = ChatClient(host or HOST, port or PORT, on_state_change=on_state_change)
+    if not quiet:
+        client.on(None, print_event)
+    try:
+        ack = await client.connect(client_name)
+        print(f"Server: {ack}")
     except ConnectionRefusedError:
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Connection failed: Server is not responding.")
+        return
     except Exception as e:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] An error occurred: {e}")
+        print(f"Server: {e}")
+        print("Failed to register name. Exiting.")
+        return
+    
+    if script:
+        try:
+            summary = await run_script(client, script, rate)
+        finally:
+            await client.close()
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Script done: {summary['sent']} lines in "
+              f"{summary['seconds']}s ({summary['lines_per_sec']} lines/s), {summary['errors']} error replies, "
+              f"{summary['failed']} failed")
+        print(f"  latency p50 {summary['latency_ms']['p50']} ms, p99 {summary['latency_ms']['p99']} ms; "
+              f"schedule lag p99 {summary['schedule_lag_ms']['p99']} ms")
+        return summary
+    
+    async def send(line: str):
+        # Replies arrive as events and are printed by print_event
+        try:
+            await client.request(line)
+        except ChatError:
+            pass
+        except Exception as e:
+            print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Error: {e}")
+    
+    print("\nCommands:")
+    print("  CONNECT:name - Connect to another client")
+    print("  Type message and press Enter to send")
+    print("  Type 'quit' to exit\n")
+    
+    prompt = f"[{client_name}]> "
+    pending = set()
+    print(prompt, end="", flush=True)
+    try:
+        async for user_input in stdin_lines():
+            if user_input.lower() == 'quit':
+                break
+            
+            if user_input.strip() and _fits(user_input):
+                # Replies are matched by correlation id, so the prompt does not wait for them
+                task = asyncio.create_task(send(user_input))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            print(prompt, end="", flush=True)
+    
+    except KeyboardInterrupt:
+        print("\nInterrupted by user")
+    
+    if pending:
+        await asyncio.wait(pending, timeout=READ_TIMEOUT)
+    await client.close()
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Disconnected from server")
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        name = sys.argv[1]
-    else:
+    parser = argparse.ArgumentParser(description="Console chat client")
+    parser.add_argument("name", nargs="?", help="Client name (asked for when omitted)")
+    parser.add_argument("--host", help=f"Server host (default from config.json: {HOST})")
+    parser.add_argument("--port", type=int, help=f"Server port (default from config.json: {PORT})")
+    parser.add_argument("--script", help="Send the lines of this file instead of reading the keyboard")
+    parser.add_argument("--rate", type=float, default=0.0,
+                        help="Script lines per second (0 = as fast as possible)")
+    parser.add_argument("--quiet", action="store_true", help="Do not print incoming events")
+    args = parser.parse_args()
+    
+    name = args.name
+    if not name:
         name = input("Enter your name: ").strip()
         if not name:
             print("Name cannot be empty!")
             sys.exit(1)
     
     try:
-        asyncio.run(chat_client(name))
+        asyncio.run(chat_client(name, args.host, args.port, args.script, args.rate, args.quiet))
     except KeyboardInterrupt:
         print("\nExiting...")
-
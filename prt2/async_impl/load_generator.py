@@ -0,0 +1,316 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_impl.chat_client import ChatClient, ChatError
+from utils import config
+from utils.metrics import LatencyHistogram
+
+config.load_config()
+
+HOST = config.get_client_host()
+PORT = config.get_client_port()
+READ_TIMEOUT = config.get_read_timeout()
+
+DEFAULT_MIX = "chat=40,group=25,join=10,list_users=15,list_groups=10"
+OPERATIONS = ("chat", "group", "join", "list_users", "list_groups")
+
+
+class LoadStats:
+    """Aggregated counters and latency histograms for one load run.
+
+    Latencies go into fixed-size histograms (one per operation, plus one for
+    every operation but the handshake), so memory stays constant however long
+    the run and however many clients it drives.
+    """
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.sessions_started = 0
+        self.sessions_completed = 0
+        self.sessions_failed = 0
+        self.requests = Counter()
+        self.errors = Counter()
+        self.latencies: Dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+        self.request_latency = LatencyHistogram()
+
+    def record(self, op: str, latency: float):
+        self.requests[op] += 1
+        self.latencies[op].record(latency)
+        if op != 'handshake':
+            self.request_latency.record(latency)
+
+    def error(self, kind: str):
+        self.errors[kind] += 1
+
+    def report(self, settings: dict) -> dict:
+        elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        total_requests = sum(self.requests.values())
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'settings': settings,
+            'duration_seconds': round(elapsed, 3),
+            'sessions': {
+                'started': self.sessions_started,
+                'completed': self.sessions_completed,
+                'failed': self.sessions_failed,
+            },
+            'requests': dict(self.requests),
+            'total_requests': total_requests,
+            'throughput_rps': round(total_requests / elapsed, 2) if elapsed > 0 else 0.0,
+            'errors': dict(self.errors),
+            'total_errors': sum(self.errors.values()),
+            'latency_ms': self.request_latency.summary(),
+            'latency_ms_by_op': {op: histogram.summary() for op, histogram in sorted(self.latencies.items())},
+        }
+
+
+class SimulatedClient:
+    """One simulated chat user driving a weighted mix of commands through a ChatClient."""
+
+    def __init__(self, name: str, host: str, port: int, stats: LoadStats, roster: set,
+                 group_names: List[str], think_time: float, timeout: float):
+        self.name = name
+        self.stats = stats
+        self.roster = roster
+        self.group_names = group_names
+        self.think_time = think_time
+        self.timeout = timeout
+        # Replies are matched by correlation id, so pushed lines never need to be told apart
+        self.client = ChatClient(host, port, resumable=False)
+
+    async def connect(self):
+        start = time.monotonic()
+        await self.client.connect(self.name)
+        self.stats.record('handshake', time.monotonic() - start)
+        self.roster.add(self.name)
+
+    async def _timed(self, op: str, command: str) -> Optional[str]:
+        """Send `command` and record its latency under `op`.
+
+        Returns:
+            The ERROR reply, or None when the command succeeded
+        """
+        start = time.monotonic()
+        try:
+            await self.client.request(command, self.timeout)
+        except ChatError as e:
+            return str(e)
+        self.stats.record(op, time.monotonic() - start)
+        return None
+
+    async def run_operation(self, op: str):
+        my_groups = self.client.my_groups
+        if op == "list_users":
+            error = await self._timed(op, "LIST_USERS")
+        elif op == "list_groups":
+            error = await self._timed(op, "LIST_GROUPS")
+        elif op == "join" or (op == "group" and not my_groups):
+            group_name = random.choice(self.group_names)
+            if group_name in my_groups:
+                error = await self._timed('leave', f"LEAVE_GROUP:{group_name}")
+            else:
+                error = await self._timed('join', f"JOIN_GROUP:{group_name}")
+                if error and "does not exist" in error:
+                    error = await self._create_group(group_name)
+                elif error and "already a member" in error:
+                    error = None
+        elif op == "group":
+            group_name = random.choice(sorted(my_groups))
+            error = await self._timed(op, f"GROUP:{group_name}:load message from {self.name}")
+        else:
+            error = await self._chat()
+        if error:
+            self.stats.error(_classify_error(error))
+
+    async def _create_group(self, group_name: str) -> Optional[str]:
+        error = await self._timed('create_group', f"CREATE_GROUP:{group_name}")
+        # Another simulated client created it first
+        return None if error and "already exists" in error else error
+
+    async def _chat(self) -> Optional[str]:
+        peers = [name for name in self.roster if name != self.name]
+        if not peers:
+            self.stats.error('no_chat_peer')
+            return None
+        target = random.choice(peers)
+        if target != self.client.chat_partner:
+            error = await self._timed('connect', f"CONNECT:{target}")
+            if error and "already connected" not in error:
+                return error
+        return await self._timed('chat', f"load chat from {self.name}")
+
+    async def close(self):
+        self.roster.discard(self.name)
+        await self.client.close()
+
+
+def _classify_error(reply: str) -> str:
+    text = reply.lower()
+    if "rate limit" in text:
+        return 'rate_limited'
+    if "not found" in text or "no longer connected" in text:
+        return 'peer_missing'
+    if "not a member" in text:
+        return 'not_member'
+    return 'server_error'
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """Parse a "op=weight,op=weight" traffic mix string."""
+    weights = {}
+    for part in mix.split(","):
+        if not part.strip():
+            continue
+        op, _, weight = part.partition("=")
+        op = op.strip()
+        if op not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{op}' in mix. Valid operations: {', '.join(OPERATIONS)}")
+        weights[op] = float(weight or 1)
+    if not weights or sum(weights.values()) <= 0:
+        raise ValueError("Traffic mix must contain at least one operation with a positive weight")
+    return weights
+
+
+class LoadGenerator:
+    """Drives many SimulatedClients in closed-loop or open-loop mode."""
+
+    def __init__(self, host: str = None, port: int = None, mix: str = DEFAULT_MIX, groups: int = 10,
+                 think_time: float = 0.2, timeout: float = None, name_prefix: str = "load"):
+        self.host = host if host is not None else HOST
+        self.port = port if port is not None else PORT
+        self.mix = parse_mix(mix)
+        self.group_names = [f"{name_prefix}_group_{i}" for i in range(max(1, groups))]
+        self.think_time = think_time
+        self.timeout = timeout if timeout is not None else READ_TIMEOUT
+        self.name_prefix = name_prefix
+        self.stats = LoadStats()
+        self.roster = set()
+        self._next_id = 0
+
+    def _new_client(self) -> SimulatedClient:
+        self._next_id += 1
+        name = f"{self.name_prefix}_{os.getpid()}_{self._next_id}"
+        return SimulatedClient(name, self.host, self.port, self.stats, self.roster,
+                               self.group_names, self.think_time, self.timeout)
+
+    def _pick_operation(self) -> str:
+        ops = list(self.mix.keys())
+        return random.choices(ops, weights=[self.mix[op] for op in ops])[0]
+
+    async def _session(self, deadline: float, max_requests: Optional[int]):
+        client = self._new_client()
+        self.stats.sessions_started += 1
+        try:
+            await client.connect()
+            issued = 0
+            while time.monotonic() < deadline and (max_requests is None or issued < max_requests):
+                await client.run_operation(self._pick_operation())
+                issued += 1
+                if self.think_time > 0:
+                    await asyncio.sleep(random.expovariate(1.0 / self.think_time))
+            self.stats.sessions_completed += 1
+        except asyncio.TimeoutError:
+            self.stats.sessions_failed += 1
+            self.stats.error('timeout')
+        except (ConnectionRefusedError, ConnectionResetError, BrokenPipeError, OSError) as e:
+            self.stats.sessions_failed += 1
+            self.stats.error(f'connection_{type(e).__name__}')
+        except Exception as e:
+            self.stats.sessions_failed += 1
+            # The connection layer reports reply timeouts and rejected names as plain exceptions
+            if str(e).startswith("Timeout"):
+                self.stats.error('timeout')
+            else:
+                self.stats.error(_classify_error(str(e)) if str(e).startswith("ERROR") else type(e).__name__)
+        finally:
+            await client.close()
+
+    async def run_closed_loop(self, concurrency: int, duration: float, ramp_up: float = 1.0) -> dict:
+        """Keep `concurrency` clients busy back-to-back for `duration` seconds."""
+        deadline = time.monotonic() + duration
+        tasks = []
+        for i in range(concurrency):
+            tasks.append(asyncio.create_task(self._session(deadline, None)))
+            if ramp_up > 0:
+                await asyncio.sleep(ramp_up / concurrency)
+        await asyncio.gather(*tasks)
+        self.stats.finished_at = time.monotonic()
+        return self.stats.report({'mode': 'closed', 'concurrency': concurrency, 'duration': duration,
+                                  **self._settings()})
+
+    async def run_open_loop(self, rate: float, duration: float, requests_per_session: int) -> dict:
+        """Start sessions as a Poisson process of `rate` arrivals per second."""
+        deadline = time.monotonic() + duration
+        tasks = set()
+        while time.monotonic() < deadline:
+            task = asyncio.create_task(self._session(float('inf'), requests_per_session))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            await asyncio.sleep(random.expovariate(rate))
+        if tasks:
+            await asyncio.gather(*tasks)
+        self.stats.finished_at = time.monotonic()
+        return self.stats.report({'mode': 'open', 'rate': rate, 'duration': duration,
+                                  'requests_per_session': requests_per_session, **self._settings()})
+
+    def _settings(self) -> dict:
+        return {'host': self.host, 'port': self.port, 'mix': self.mix,
+                'groups': len(self.group_names), 'think_time': self.think_time}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the async chat server")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--mode", choices=("closed", "open"), default="closed",
+                        help="closed: fixed concurrency; open: Poisson session arrivals")
+    parser.add_argument("--clients", type=int, default=100, help="Concurrent clients (closed loop)")
+    parser.add_argument("--rate", type=float, default=50.0, help="Session arrivals per second (open loop)")
+    parser.add_argument("--requests-per-session", type=int, default=20, help="Requests per session (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0, help="Run time in seconds")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="Seconds to spread closed-loop connects over")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Traffic mix (default: {DEFAULT_MIX})")
+    parser.add_argument("--groups", type=int, default=10, help="Number of groups to spread traffic over")
+    parser.add_argument("--think-time", type=float, default=0.2,
+                        help="Mean seconds between requests per client (exponential)")
+    parser.add_argument("--timeout", type=float, default=READ_TIMEOUT)
+    parser.add_argument("--name-prefix", default="load")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args(argv)
+
+    generator = LoadGenerator(args.host, args.port, args.mix, args.groups, args.think_time,
+                              args.timeout, args.name_prefix)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Starting {args.mode}-loop load against "
+          f"{args.host}:{args.port} for {args.duration}s", file=sys.stderr)
+    # The client library logs every connection to stdout, which is reserved for the report
+    with contextlib.redirect_stdout(sys.stderr):
+        if args.mode == "closed":
+            report = asyncio.run(generator.run_closed_loop(args.clients, args.duration, args.ramp_up))
+        else:
+            report = asyncio.run(generator.run_open_loop(args.rate, args.duration, args.requests_per_session))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    return report
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Interrupted by user", file=sys.stderr)
@@ -0,0 +1,236 @@
+import codecs
+import re
+from collections import namedtuple
+from typing import Callable, Container, Dict, List, Optional
+
+# Events a client sees on its connection. Names are the server's display names.
+UserConnected = namedtuple("UserConnected", ["name"])
+UserDisconnected = namedtuple("UserDisconnected", ["name"])
+UserList = namedtuple("UserList", ["names"])
+GroupList = namedtuple("GroupList", ["groups"])                       # {group: [members]}
+GroupUpdated = namedtuple("GroupUpdated", ["group", "user", "action"])  # action: created/joined/added/left
+ChatOpened = namedtuple("ChatOpened", ["name", "incoming"], defaults=(False,))  # incoming: the peer connected
+ChatClosed = namedtuple("ChatClosed", ["name", "reason"])               # reason: closed/ended/disconnected
+DirectMessage = namedtuple("DirectMessage", ["sender", "text"])
+GroupMessage = namedtuple("GroupMessage", ["group", "sender", "text"])
+Error = namedtuple("Error", ["text"])
+Notice = namedtuple("Notice", ["text"])                                # anything else, e.g. acknowledgements
+
+EVENT_TYPES = (UserConnected, UserDisconnected, UserList, GroupList, GroupUpdated, ChatOpened, ChatClosed,
+               DirectMessage, GroupMessage, Error, Notice)
+
+GROUP_LIST_HEADER = re.compile(r"Available groups \((\d+)\):$")
+GROUP_LIST_ENTRY = re.compile(r"(.*) \(\d+ members: (.*)\)$")
+USER_LIST = re.compile(r"Connected users \(\d+\): ?(.*)$")
+
+
+class LineFramer:
+    """Splits a byte stream into text lines.
+
+    Bytes are decoded incrementally, so a UTF-8 character split across two
+    reads is not mangled. A line longer than `max_line` is cut at that length
+    instead of growing the buffer without bound.
+    """
+
+    def __init__(self, max_line: int = 65536):
+        self.max_line = max_line
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._buffer = ""
+
+    def feed(self, data: bytes) -> List[str]:
+        """Add received bytes and return every line they complete, without line endings."""
+        text = self._buffer + self._decoder.decode(data)
+        lines = text.split('\n')
+        self._buffer = lines.pop()
+        while len(self._buffer) > self.max_line:
+            lines.append(self._buffer[:self.max_line])
+            self._buffer = self._buffer[self.max_line:]
+        return [line[:-1] if line.endswith('\r') else line for line in lines]
+
+    def flush(self) -> Optional[str]:
+        """Return the unterminated tail left when the stream ends, if any."""
+        tail = self._buffer + self._decoder.decode(b'', final=True)
+        self._buffer = ""
+        return tail or None
+
+
+def _quoted(rest: str) -> str:
+    # `rest` starts right after the opening quote: "name'" or "name' (more text)"
+    return rest[:-1] if rest.endswith("'") else rest.rpartition("' ")[0]
+
+
+class EventParser:
+    """Turns server lines into event objects.
+
+    Each line is classified by its first character and one prefix or regex
+    check, instead of a chain of substring scans. The parser is stateful only
+    for the multi-line group list, whose header says how many lines follow.
+    `own_name` fills in the user for replies such as "Joined group 'x'", and
+    `groups` (any container of known group names) tells a group called
+    "System" apart from server notices.
+    """
+
+    def __init__(self, own_name: str = "", groups: Container[str] = ()):
+        self.own_name = own_name
+        self.groups = groups
+        self._group_lines = 0
+        self._group_list: Dict[str, List[str]] = {}
+
+    def parse_all(self, text: str) -> list:
+        """Parse a (possibly multi-line) reply and return its events."""
+        events = []
+        for line in text.split('\n'):
+            event = self.feed(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def feed(self, line: str):
+        """Parse one line.
+
+        Returns:
+            An event, or None while the line is part of an unfinished group list
+        """
+        line = line.strip()
+        if self._group_lines:
+            match = GROUP_LIST_ENTRY.match(line)
+            if match:
+                self._group_list[match.group(1)] = [m for m in match.group(2).split(', ') if m]
+            self._group_lines -= 1
+            return self._finish_group_list() if not self._group_lines else None
+        if not line:
+            return None
+        handler = self._by_first_char.get(line[0])
+        if handler is not None:
+            event = handler(self, line)
+            if event is not None or self._group_lines:
+                return event
+        return self._parse_notice(line)
+
+    def _finish_group_list(self) -> GroupList:
+        groups, self._group_list = self._group_list, {}
+        return GroupList(groups)
+
+    def _parse_bracket(self, line: str):
+        end = line.find(']')
+        if end < 0:
+            return None
+        source = line[1:end]
+        if line.startswith(': ', end + 1):
+            return DirectMessage(source, line[end + 3:])
+        if source == "System" and source not in self.groups:
+            return self._parse_system(line[end + 1:].strip())
+        colon = line.find(': ', end + 1)
+        if colon > 0:
+            return GroupMessage(source, line[end + 1:colon].strip(), line[colon + 2:])
+        return None
+
+    def _parse_system(self, text: str):
+        index = text.find(" has disconnected")
+        if index > 0:
+            # Sent to the chat partner; everyone else gets USER_DISCONNECTED
+            return ChatClosed(text[:index], 'disconnected')
+        index = text.find(" ended the chat")
+        if index > 0:
+            return ChatClosed(text[:index], 'ended')
+        return Notice(text)
+
+    def _parse_error(self, line: str):
+        return Error(line) if line.startswith("ERROR") else None
+
+    def _parse_u(self, line: str):
+        if line.startswith("USER_CONNECTED:"):
+            return UserConnected(line[len("USER_CONNECTED:"):])
+        if line.startswith("USER_DISCONNECTED:"):
+            return UserDisconnected(line[len("USER_DISCONNECTED:"):])
+        if line.startswith("User '") and " was added to group '" in line:
+            user, _, group = line[len("User '"):].partition("' was added to group '")
+            return GroupUpdated(_quoted(group), user, 'added')
+        return None
+
+    def _parse_g(self, line: str):
+        if line.startswith("GROUP_UPDATED: "):
+            text = line[len("GROUP_UPDATED: "):]
+            group, sep, user = text.rpartition(" was created by ")
+            if sep:
+                return GroupUpdated(group, user, 'created')
+            if text.endswith(" was created"):
+                return GroupUpdated(text[:-len(" was created")], None, 'created')
+            for marker, action in ((" was added to ", 'added'), (" joined ", 'joined'), (" left ", 'left')):
+                user, sep, group = text.rpartition(marker)
+                if sep:
+                    return GroupUpdated(group, user, action)
+            return None
+        if line.startswith("Group '") and " created" in line:
+            return GroupUpdated(line[len("Group '"):].rpartition("' created")[0], self.own_name, 'created')
+        return None
+
+    def _parse_c(self, line: str):
+        match = USER_LIST.match(line)
+        if match:
+            return UserList([u for u in match.group(1).split(', ') if u])
+        if line.startswith("Connected to ") and line.endswith(" You can now send messages directly."):
+            return ChatOpened(line[len("Connected to "):-len(". You can now send messages directly.")])
+        if line.startswith("Chat disconnected successfully"):
+            return ChatClosed(None, 'closed')
+        return None
+
+    def _parse_a(self, line: str):
+        match = GROUP_LIST_HEADER.match(line)
+        if match is None:
+            return None
+        self._group_lines = int(match.group(1))
+        return None if self._group_lines else self._finish_group_list()
+
+    def _parse_n(self, line: str):
+        return GroupList({}) if line.startswith("No groups available") else None
+
+    def _parse_j(self, line: str):
+        if line.startswith("Joined group '"):
+            return GroupUpdated(_quoted(line[len("Joined group '"):]), self.own_name, 'joined')
+        return None
+
+    def _parse_l(self, line: str):
+        if line.startswith("Left group '"):
+            return GroupUpdated(_quoted(line[len("Left group '"):]), self.own_name, 'left')
+        return None
+
+    def _parse_y(self, line: str):
+        if line.startswith("You were added to group '"):
+            group = line[len("You were added to group '"):].rpartition("' by ")[0]
+            return GroupUpdated(group, self.own_name, 'added')
+        return None
+
+    def _parse_m(self, line: str):
+        # Delivery acknowledgements, the most common reply during a burst
+        if line.startswith("Message sent to ") or line.startswith("Message delivered to "):
+            return Notice(line)
+        return None
+
+    def _parse_notice(self, line: str):
+        # Notifications that start with another user's name; one scan finds all group ones
+        index = line.find(" group '")
+        if index > 0:
+            rest = line[index + len(" group '"):]
+            for marker, action in ((" joined", 'joined'), (" left", 'left')):
+                if line.endswith(marker, 0, index):
+                    return GroupUpdated(_quoted(rest), line[:index - len(marker)], action)
+            if line.endswith(" was added to", 0, index):
+                return GroupUpdated(rest.rpartition("' by ")[0], line[:index - len(" was added to")], 'added')
+        if line.endswith(" connected to you. You can now send messages directly."):
+            return ChatOpened(line[:-len(" connected to you. You can now send messages directly.")], True)
+        return Notice(line)
+
+    _by_first_char: Dict[str, Callable] = {
+        '[': _parse_bracket,
+        'E': _parse_error,
+        'U': _parse_u,
+        'G': _parse_g,
+        'C': _parse_c,
+        'A': _parse_a,
+        'N': _parse_n,
+        'J': _parse_j,
+        'L': _parse_l,
+        'Y': _parse_y,
+        'M': _parse_m,
+    }
@@ -0,0 +1,196 @@
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from async_impl.capture import read_capture, DIR_IN, DIR_OUT, DIR_OPEN, DIR_CLOSE
+from async_impl.scheduler import ReplayScheduler
+
+RESUME_TOKEN_PREFIX = "RESUME_TOKEN:"
+RESUME_TOKEN_MASK = RESUME_TOKEN_PREFIX + "<token>"
+
+
+class ReplaySession:
+    """Client side of one captured session during replay."""
+
+    def __init__(self, session_id: int):
+        self.session_id = session_id
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.received = bytearray()
+        self.read_task: Optional[asyncio.Task] = None
+        self.error: Optional[str] = None
+
+    async def open(self, host: str, port: int):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        self.read_task = asyncio.create_task(self._collect())
+
+    async def _collect(self):
+        try:
+            while True:
+                data = await self.reader.read(65536)
+                if not data:
+                    break
+                self.received += data
+        except Exception as e:
+            self.error = type(e).__name__
+
+    async def send(self, data: bytes):
+        self.writer.write(data)
+        await self.writer.drain()
+
+    async def close(self):
+        if self.writer and not self.writer.is_closing():
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+
+
+def load_capture(filename: str):
+    """Split a capture into the inbound event schedule and the recorded outbound traffic."""
+    events = []
+    recorded_out: Dict[int, bytearray] = defaultdict(bytearray)
+    for record in read_capture(filename):
+        if record.direction == DIR_OUT:
+            recorded_out[record.session_id] += record.data
+        else:
+            events.append(record)
+    events.sort(key=lambda r: r.offset)
+    return events, recorded_out
+
+
+def _comparable_lines(data: bytes) -> List[str]:
+    # Resume tokens are random per run, so only their presence is compared
+    return [RESUME_TOKEN_MASK if line.startswith(RESUME_TOKEN_PREFIX) else line
+            for line in data.decode('utf-8', errors='replace').splitlines()]
+
+
+def diff_outbound(recorded: Dict[int, bytearray], replayed: Dict[int, bytearray]) -> Dict[int, List[str]]:
+    """Return a line diff for every session whose outbound traffic changed."""
+    diffs = {}
+    for session_id in sorted(set(recorded) | set(replayed)):
+        before = _comparable_lines(recorded.get(session_id, b''))
+        after = _comparable_lines(replayed.get(session_id, b''))
+        if before != after:
+            diffs[session_id] = list(difflib.unified_diff(
+                before, after, f"session {session_id} (recorded)", f"session {session_id} (replayed)", lineterm=''))
+    return diffs
+
+
+async def replay(filename: str, host: str, port: int, speed: float = 1.0, settle: float = 1.0) -> dict:
+    """Re-drive a capture against host:port.
+
+    Args:
+        filename: Capture file written by server_async.start_capture()
+        host: Server host
+        port: Server port
+        speed: Time scale (1 = real time, 10 = ten times faster, 0 = as fast as possible)
+        settle: Seconds to wait for late responses before closing the sessions
+    """
+    events, recorded_out = load_capture(filename)
+    sessions: Dict[int, ReplaySession] = {}
+    scheduler = ReplayScheduler(speed)
+    errors = defaultdict(int)
+    frames_sent = 0
+
+    start = time.monotonic()
+    for event in events:
+        await scheduler.wait_until(event.offset)
+
+        session = sessions.get(event.session_id)
+        try:
+            if event.direction == DIR_OPEN:
+                session = sessions[event.session_id] = ReplaySession(event.session_id)
+                await session.open(host, port)
+            elif session is None or session.writer is None:
+                continue
+            elif event.direction == DIR_IN:
+                await session.send(event.data)
+                frames_sent += 1
+            elif event.direction == DIR_CLOSE:
+                # Let the server answer everything sent so far before hanging up
+                await asyncio.sleep(0)
+                await session.close()
+        except (ConnectionError, OSError) as e:
+            errors[type(e).__name__] += 1
+            if session is not None:
+                session.error = type(e).__name__
+
+    if settle > 0:
+        await asyncio.sleep(settle)
+    for session in sessions.values():
+        await session.close()
+        if session.read_task:
+            try:
+                await asyncio.wait_for(session.read_task, timeout=settle or 1.0)
+            except asyncio.TimeoutError:
+                session.read_task.cancel()
+    elapsed = time.monotonic() - start
+
+    replayed_out = {sid: s.received for sid, s in sessions.items()}
+    diffs = diff_outbound(recorded_out, replayed_out) if recorded_out else {}
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'capture': filename,
+        'target': f"{host}:{port}",
+        'speed': speed,
+        'sessions': len(sessions),
+        'frames_sent': frames_sent,
+        'duration_seconds': round(elapsed, 3),
+        'frames_per_second': round(frames_sent / elapsed, 2) if elapsed > 0 else 0.0,
+        'schedule_lag_ms': scheduler.lag_summary(),
+        'errors': dict(errors),
+        'outbound_compared': bool(recorded_out),
+        'sessions_differing': len(diffs),
+        'diffs': {str(sid): lines for sid, lines in diffs.items()},
+    }
+
+
+async def replay_against_fresh_server(filename: str, speed: float = 1.0, settle: float = 1.0) -> dict:
+    """Start an in-process server on an ephemeral port and replay the capture against it."""
+    import logging
+    import async_impl.server_async as server_async
+    server_async.log.setLevel(logging.WARNING)
+    server = await asyncio.start_server(server_async.handle_client, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await replay(filename, '127.0.0.1', port, speed, settle)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay a server traffic capture")
+    parser.add_argument("capture", help="Capture file written with server_async.py --capture")
+    parser.add_argument("--target", help="host:port of the server to replay against (default: fresh in-process server)")
+    parser.add_argument("--speed", type=float, default=1.0, help="1 = real time, N = N times faster, 0 = max speed")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds to wait for trailing responses")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if args.target:
+        host, _, port = args.target.rpartition(":")
+        report = asyncio.run(replay(args.capture, host, int(port), args.speed, args.settle))
+    else:
+        report = asyncio.run(replay_against_fresh_server(args.capture, args.speed, args.settle))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Replay report written to {args.output}", file=sys.stderr)
+    else:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] Replayed {report['frames_sent']} frames over "
+          f"{report['sessions']} sessions; {report['sessions_differing']} session(s) differ", file=sys.stderr)
+    return 1 if report['sessions_differing'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime
+from typing import List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.metrics import percentile_summary
+
+# Sleep this much short of the due time and spin the rest, since asyncio.sleep() tends to overshoot
+SPIN_THRESHOLD = 0.002
+
+
+class ReplayScheduler:
+    """Dispatches events at their recorded offsets, scaled by a speed factor.
+
+    Every due time is computed from the schedule start on the monotonic clock,
+    so oversleeping on one event is absorbed by the next instead of adding up.
+    The lag of each dispatch behind its due time is kept so callers can tell
+    when the replaying side, not the target, is the bottleneck.
+    """
+
+    def __init__(self, speed: float = 1.0):
+        """
+        Args:
+            speed: 1 = recorded pace, 10 = ten times faster, 0 = as fast as possible
+        """
+        self.speed = speed
+        self.lag: List[float] = []
+        self._start: Optional[float] = None
+        self._base_offset: Optional[float] = None
+
+    def due_time(self, offset: float) -> float:
+        if self._start is None:
+            self._start = time.monotonic()
+            self._base_offset = offset
+        return self._start + (offset - self._base_offset) / self.speed
+
+    async def wait_until(self, offset: float) -> float:
+        """Sleep until the event recorded at `offset` (seconds) is due.
+
+        Returns:
+            How late the event is being dispatched, in seconds
+        """
+        if self.speed <= 0:
+            return 0.0
+        due = self.due_time(offset)
+        delay = due - time.monotonic()
+        if delay > SPIN_THRESHOLD:
+            await asyncio.sleep(delay - SPIN_THRESHOLD)
+        while time.monotonic() < due:
+            await asyncio.sleep(0)
+        late = time.monotonic() - due
+        self.lag.append(late)
+        return late
+
+    def lag_summary(self) -> dict:
+        """Schedule lag percentiles in milliseconds."""
+        return percentile_summary(self.lag)
+
+
+def parse_offset(value: str, first: Optional[datetime] = None):
+    """Turn a CSV timestamp into seconds.
+
+    Plain numbers are taken as seconds from the start of the capture; ISO
+    datetimes are converted to seconds since `first` (the first row's time).
+
+    Returns:
+        (offset in seconds, datetime of the first row or None)
+    """
+    try:
+        return float(value), first
+    except ValueError:
+        moment = datetime.fromisoformat(value.strip())
+        if first is None:
+            first = moment
+        return (moment - first).total_seconds(), first
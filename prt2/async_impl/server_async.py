@@ -2,13 +2,17 @@ import asyncio
 import json
 import sys
 import os
+import re
+import secrets
+import time
 from datetime import datetime
 from typing import Dict, Set, Callable, Optional
-from collections import deque
+from collections import OrderedDict, deque
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import config
 from utils import logger
+from async_impl.capture import CaptureRecorder, RecordingStreamWriter, DIR_IN
 
 config.load_config()
 
@@ -18,6 +22,14 @@ MAX_MESSAGE_SIZE = config.get_max_message_size()
 READ_TIMEOUT = config.get_read_timeout()
 MAX_NAME_LENGTH = config.get_max_name_length()
 RATE_LIMIT_MSGS, RATE_LIMIT_WINDOW = config.get_rate_limit()
+MAX_MESSAGE_LOG = config.get_max_message_log()
+FANOUT_CHUNK_SIZE, FANOUT_TICK_BUDGET = config.get_fanout_limits()
+
+RESUME_GRACE_SECONDS, RESUME_BACKLOG_LINES, RESUME_REPLY_CACHE = config.get_resume_settings()
+
+# Optional request prefix "#<id>|"; replies to that request carry the same id
+CORRELATION_PREFIX = re.compile(r'#([A-Za-z0-9_-]{1,32})\|')
+CORRELATION_PREFIX_MAX = 40
 
 connected_clients: Set[asyncio.StreamWriter] = set()
 client_info: Dict[asyncio.StreamWriter, dict] = {}
@@ -25,19 +37,347 @@ clients_by_name: Dict[str, asyncio.StreamWriter] = {}
 client_chats: Dict[asyncio.StreamWriter, asyncio.StreamWriter] = {}
 groups: Dict[str, Set[asyncio.StreamWriter]] = {}  # group_name -> set of writers
 client_groups: Dict[asyncio.StreamWriter, Set[str]] = {}  # writer -> set of group names
-message_log: list = []
+message_log: deque = deque(maxlen=MAX_MESSAGE_LOG)  # most recent entries only
+message_counts: Dict[str, int] = {'received': 0, 'sent': 0}  # totals, including entries rotated out
 client_rate_limits: Dict[asyncio.StreamWriter, deque] = {}
 
+sessions: Dict[str, dict] = {}  # resume token -> {'name', 'writer', 'expiry'}
+
 log_callback: Optional[Callable[[str], None]] = None
+capture_recorder: Optional[CaptureRecorder] = None
+
+# Deliveries made by all broadcasts in the current event-loop iteration
+_fanout_tick_used = 0
+_fanout_reset_scheduled = False
+fanout_stats = {
+    'broadcasts': 0,
+    'recipients': 0,
+    'yields': 0,
+    'total_duration': 0.0,
+    'max_duration': 0.0,
+    'total_loop_block': 0.0,
+    'max_loop_block': 0.0,
+}
 
 logger.setup_logger("tcp_server", config.get_log_level())
 log = logger.get_logger()
 
 
+def _log_message(log_entry: dict):
+    message_log.append(log_entry)
+    message_counts[log_entry['direction']] = message_counts.get(log_entry['direction'], 0) + 1
+
+
+def _check_rate_limit(writer: asyncio.StreamWriter, now: float) -> bool:
+    """Record a message at `now` and return False if the sender is over the limit."""
+    rate_queue = client_rate_limits.get(writer)
+    if rate_queue is None:
+        rate_queue = client_rate_limits[writer] = deque()
+    
+    while rate_queue and rate_queue[0] < now - RATE_LIMIT_WINDOW:
+        rate_queue.popleft()
+    
+    if len(rate_queue) >= RATE_LIMIT_MSGS:
+        return False
+    
+    rate_queue.append(now)
+    return True
+
+
+def _render_group_list() -> str:
+    """Build the LIST_GROUPS response text."""
+    if not groups:
+        return "No groups available\n"
+    group_info = []
+    for group_name, members in groups.items():
+        member_names = [client_info[w].get('name', 'Unknown') for w in members if w in client_info]
+        group_info.append(f"{group_name} ({len(members)} members: {', '.join(member_names)})")
+    return f"Available groups ({len(groups)}):\n" + "\n".join(group_info) + "\n"
+
+
+def _reset_fanout_budget():
+    global _fanout_tick_used, _fanout_reset_scheduled
+    _fanout_tick_used = 0
+    _fanout_reset_scheduled = False
+
+
+async def _broadcast(recipients, message: str, exclude=(), count_received: bool = False) -> int:
+    """Write `message` to every connected recipient, yielding to the event loop as it goes.
+    
+    The loop is released every FANOUT_CHUNK_SIZE recipients, and whenever all
+    broadcasts together have used up FANOUT_TICK_BUDGET deliveries in the current
+    loop iteration, so one huge group cannot starve every other session.
+    
+    Returns:
+        Number of recipients the message was written to
+    """
+    global _fanout_tick_used, _fanout_reset_scheduled
+    loop = asyncio.get_running_loop()
+    payload = message.encode('utf-8')
+    sent_count = 0
+    since_yield = 0
+    yields = 0
+    started = slice_started = time.perf_counter()
+    max_block = 0.0
+    
+    for member in recipients:
+        if since_yield >= FANOUT_CHUNK_SIZE or _fanout_tick_used >= FANOUT_TICK_BUDGET:
+            max_block = max(max_block, time.perf_counter() - slice_started)
+            await asyncio.sleep(0)
+            yields += 1
+            since_yield = 0
+            slice_started = time.perf_counter()
+        if member in exclude or member not in connected_clients:
+            continue
+        if not _fanout_reset_scheduled:
+            _fanout_reset_scheduled = True
+            loop.call_soon(_reset_fanout_budget)
+        _fanout_tick_used += 1
+        since_yield += 1
+        try:
+            member.write(payload)
+            await member.drain()
+            sent_count += 1
+            if count_received and member in client_info:
+                client_info[member]['messages_received'] += 1
+        except:
+            pass
+    
+    finished = time.perf_counter()
+    max_block = max(max_block, finished - slice_started)
+    duration = finished - started
+    fanout_stats['broadcasts'] += 1
+    fanout_stats['recipients'] += sent_count
+    fanout_stats['yields'] += yields
+    fanout_stats['total_duration'] += duration
+    fanout_stats['max_duration'] = max(fanout_stats['max_duration'], duration)
+    fanout_stats['total_loop_block'] += max_block
+    fanout_stats['max_loop_block'] = max(fanout_stats['max_loop_block'], max_block)
+    return sent_count
+
+
+async def _fanout_group_message(group_name: str, sender: asyncio.StreamWriter, forward_msg: str) -> int:
+    """Deliver a group message to every connected member except the sender.
+    
+    Returns:
+        Number of members the message was written to
+    """
+    return await _broadcast(list(groups.get(group_name, ())), forward_msg, exclude=(sender,), count_received=True)
+
+
+def _split_correlation_id(line: str):
+    """Split an optional "#<id>|" prefix off a request line.
+    
+    Returns:
+        (correlation_id or None, command text)
+    """
+    match = CORRELATION_PREFIX.match(line)
+    if match is None:
+        return None, line
+    return match.group(1), line[match.end():]
+
+
+def _format_reply(text: str, correlation_id: Optional[str]) -> str:
+    """Tag every line of a reply with the request's correlation ID.
+    
+    Continuation lines are sent as "#<id>+line" and the final line as
+    "#<id>|line", so clients know when a multi-line reply is complete.
+    """
+    if correlation_id is None:
+        return text
+    lines = text.rstrip('\n').split('\n')
+    tagged = [f"#{correlation_id}+{line}\n" for line in lines[:-1]]
+    tagged.append(f"#{correlation_id}|{lines[-1]}\n")
+    return ''.join(tagged)
+
+
+async def _reply(writer: asyncio.StreamWriter, text: str, correlation_id: Optional[str] = None):
+    """Send the response to the client's current request.
+    
+    Resumable sessions remember their recent correlated replies, so a request
+    resent after a reconnect is answered again instead of being run twice.
+    """
+    payload = _format_reply(text, correlation_id).encode('utf-8')
+    if correlation_id is not None:
+        recent = client_info.get(writer, {}).get('recent_replies')
+        if recent is not None:
+            recent[correlation_id] = payload
+            if len(recent) > RESUME_REPLY_CACHE:
+                recent.popitem(last=False)
+    writer.write(payload)
+    await writer.drain()
+
+
+class ParkedWriter:
+    """Stands in for a resumable session's writer while its client is away.
+    
+    It stays in every registry under the session's name, so chats and groups
+    keep delivering to it; the most recent lines are kept for the client to
+    collect when it resumes.
+    """
+    
+    def __init__(self, peername, backlog_lines: int):
+        self._peername = peername
+        self.backlog: deque = deque(maxlen=backlog_lines)
+        self.dropped = 0
+    
+    def write(self, data: bytes):
+        if len(self.backlog) == self.backlog.maxlen:
+            self.dropped += 1
+        self.backlog.append(bytes(data))
+    
+    async def drain(self):
+        pass
+    
+    def get_extra_info(self, name, default=None):
+        return self._peername if name == 'peername' else default
+    
+    def is_closing(self) -> bool:
+        return False
+    
+    def close(self):
+        pass
+    
+    async def wait_closed(self):
+        pass
+
+
+def _swap_writer(old, new):
+    """Move every registry reference from `old` to `new`."""
+    if old in connected_clients:
+        connected_clients.discard(old)
+        connected_clients.add(new)
+    for registry in (client_info, client_groups, client_rate_limits, client_chats):
+        if old in registry:
+            registry[new] = registry.pop(old)
+    for other, target in client_chats.items():
+        if target is old:
+            client_chats[other] = new
+    for info in client_info.values():
+        if info.get('chat_partner') is old:
+            info['chat_partner'] = new
+    for group_name in client_groups.get(new, ()):
+        members = groups.get(group_name)
+        if members is not None and old in members:
+            members.discard(old)
+            members.add(new)
+    name = client_info.get(new, {}).get('name')
+    if name and clients_by_name.get(name) is old:
+        clients_by_name[name] = new
+
+
+def _park_session(writer, token: str):
+    """Keep a dropped resumable session's slot for RESUME_GRACE_SECONDS."""
+    session = sessions[token]
+    parked = ParkedWriter(writer.get_extra_info('peername'), RESUME_BACKLOG_LINES)
+    _swap_writer(writer, parked)
+    session['writer'] = parked
+    session['expiry'] = asyncio.get_running_loop().call_later(RESUME_GRACE_SECONDS, _expire_session, token)
+    
+    log_msg = f"Session of {session['name']} parked for {RESUME_GRACE_SECONDS}s awaiting resume"
+    log.info(log_msg)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
+    if log_callback:
+        log_callback(log_msg)
+
+
+def _expire_session(token: str):
+    session = sessions.pop(token, None)
+    if session is None or not isinstance(session['writer'], ParkedWriter):
+        return
+    asyncio.ensure_future(_cleanup_client(session['writer'], session['name']))
+    
+    log_msg = f"Session of {session['name']} expired without resume"
+    log.info(log_msg)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
+    if log_callback:
+        log_callback(log_msg)
+
+
+async def _resume_session(writer: asyncio.StreamWriter, token: str, client_id: str) -> Optional[str]:
+    """Attach a new connection to a parked session.
+    
+    Returns:
+        The session's client name, or None if the token is unknown or expired
+    """
+    session = sessions.get(token)
+    if session is None:
+        error_msg = "ERROR: Resume failed - Session expired or unknown. Please register again.\n"
+        log.warning(f"Client {client_id} attempted to resume an unknown session")
+        writer.write(error_msg.encode('utf-8'))
+        await writer.drain()
+        return None
+    
+    previous = session['writer']
+    if isinstance(previous, ParkedWriter):
+        session['expiry'].cancel()
+        session['expiry'] = None
+        backlog = list(previous.backlog)
+        dropped = previous.dropped
+    else:
+        # The old connection is half-open and has not noticed the drop yet; take it over
+        backlog = []
+        dropped = 0
+    # Drop the fresh entries created for this connection; the session's own state takes their place
+    connected_clients.discard(writer)
+    client_info.pop(writer, None)
+    client_groups.pop(writer, None)
+    client_rate_limits.pop(writer, None)
+    _swap_writer(previous, writer)
+    session['writer'] = writer
+    client_info[writer]['address'] = writer.get_extra_info('peername')
+    client_info[writer]['client_id'] = client_id
+    previous.close()
+    
+    resumed = f"Session resumed: {session['name']}\n".encode('utf-8')
+    if dropped:
+        resumed += f"[System] {dropped} older messages were dropped while you were away\n".encode('utf-8')
+    writer.write(resumed + b''.join(backlog))
+    await writer.drain()
+    
+    log_msg = f"Client {client_id} resumed session of {session['name']} ({len(backlog)} backlog lines)"
+    log.info(log_msg)
+    print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
+    if log_callback:
+        log_callback(log_msg)
+    return session['name']
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read one newline-terminated frame from the client.
+    
+    Returns the trailing partial frame at EOF and b'' once the stream is exhausted.
+    For a frame longer than the stream buffer only its first buffer-sized piece is
+    returned, for the size check in handle_client to reject; the rest of it, up to
+    and including the next newline, is discarded so it is not run as a command.
+    """
+    try:
+        return await reader.readuntil(b'\n')
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError as e:
+        head = await reader.read(e.consumed)
+    while True:
+        try:
+            await reader.readuntil(b'\n')
+            return head
+        except asyncio.IncompleteReadError:
+            return head
+        except asyncio.LimitOverrunError as e:
+            await reader.read(e.consumed)
+
+
 async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    recorder = capture_recorder
+    session_id = None
+    if recorder is not None:
+        session_id = recorder.open_session()
+        writer = RecordingStreamWriter(writer, recorder, session_id)
+    
     addr = writer.get_extra_info('peername')
     client_id = f"{addr[0]}:{addr[1]}"
     client_name = None
+    session_ended = False
     
     connected_clients.add(writer)
     client_info[writer] = {
@@ -66,7 +406,9 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
         await writer.drain()
         
         try:
-            name_data = await asyncio.wait_for(reader.read(1024), timeout=READ_TIMEOUT)
+            name_data = await asyncio.wait_for(_read_frame(reader), timeout=READ_TIMEOUT)
+            if recorder is not None and name_data:
+                recorder.record(session_id, DIR_IN, name_data)
         except asyncio.TimeoutError:
             log_msg = f"Client {client_id} timed out while sending name"
             log.warning(log_msg)
@@ -79,60 +421,72 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
         
         client_name = name_data.decode("utf-8").strip()
         
-        if not client_name:
-            error_msg = "ERROR: Name validation failed - Name cannot be empty. Please provide a valid name.\n"
-            log.warning(f"Client {client_id} attempted to register with empty name")
-            writer.write(error_msg.encode('utf-8'))
-            await writer.drain()
-            return
-        
-        if len(client_name) > MAX_NAME_LENGTH:
-            error_msg = f"ERROR: Name validation failed - Name too long. Maximum length is {MAX_NAME_LENGTH} characters (received {len(client_name)}).\n"
-            log.warning(f"Client {client_id} attempted to register with name too long: {len(client_name)} chars")
-            writer.write(error_msg.encode('utf-8'))
-            await writer.drain()
-            return
-        
-        if '\n' in client_name or '\r' in client_name:
-            error_msg = "ERROR: Name validation failed - Name contains invalid characters (newline/carriage return). Please use only printable characters.\n"
-            log.warning(f"Client {client_id} attempted to register with invalid characters in name")
-            writer.write(error_msg.encode('utf-8'))
-            await writer.drain()
-            return
-        
-        if client_name in clients_by_name:
-            error_msg = f"ERROR: Name registration failed - The name '{client_name}' is already in use by another client. Please choose a different name.\n"
-            log.warning(f"Client {client_id} attempted to register with duplicate name: {client_name}")
-            writer.write(error_msg.encode('utf-8'))
+        if client_name.startswith("RESUME:"):
+            client_name = await _resume_session(writer, client_name[7:].strip(), client_id)
+            if client_name is None:
+                return
+        else:
+            # "SESSION:name" registers a resumable session
+            resumable = client_name.startswith("SESSION:")
+            if resumable:
+                client_name = client_name[8:].strip()
+            
+            if not client_name:
+                error_msg = "ERROR: Name validation failed - Name cannot be empty. Please provide a valid name.\n"
+                log.warning(f"Client {client_id} attempted to register with empty name")
+                writer.write(error_msg.encode('utf-8'))
+                await writer.drain()
+                return
+            
+            if len(client_name) > MAX_NAME_LENGTH:
+                error_msg = f"ERROR: Name validation failed - Name too long. Maximum length is {MAX_NAME_LENGTH} characters (received {len(client_name)}).\n"
+                log.warning(f"Client {client_id} attempted to register with name too long: {len(client_name)} chars")
+                writer.write(error_msg.encode('utf-8'))
+                await writer.drain()
+                return
+            
+            if '\n' in client_name or '\r' in client_name:
+                error_msg = "ERROR: Name validation failed - Name contains invalid characters (newline/carriage return). Please use only printable characters.\n"
+                log.warning(f"Client {client_id} attempted to register with invalid characters in name")
+                writer.write(error_msg.encode('utf-8'))
+                await writer.drain()
+                return
+            
+            if client_name in clients_by_name:
+                error_msg = f"ERROR: Name registration failed - The name '{client_name}' is already in use by another client. Please choose a different name.\n"
+                log.warning(f"Client {client_id} attempted to register with duplicate name: {client_name}")
+                writer.write(error_msg.encode('utf-8'))
+                await writer.drain()
+                return
+            
+            clients_by_name[client_name] = writer
+            client_info[writer]['name'] = client_name
+            
+            log_msg = f"Client {client_id} registered as: {client_name}"
+            log.info(log_msg)
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
+            if log_callback:
+                log_callback(log_msg)
+            
+            # Notify all other clients that a new user has connected
+            notification_msg = f"USER_CONNECTED:{client_name}\n"
+            await _broadcast(list(connected_clients), notification_msg, exclude=(writer,))
+            
+            name_ack = f"Name registered: {client_name}\nCommands: CONNECT:name, DISCONNECT_CHAT, CREATE_GROUP:name, JOIN_GROUP:name, LEAVE_GROUP:name, LIST_GROUPS, LIST_USERS, GROUP:group_name:message\n"
+            writer.write(name_ack.encode('utf-8'))
             await writer.drain()
-            return
-        
-        clients_by_name[client_name] = writer
-        client_info[writer]['name'] = client_name
-        
-        log_msg = f"Client {client_id} registered as: {client_name}"
-        log.info(log_msg)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
-        if log_callback:
-            log_callback(log_msg)
-        
-        # Notify all other clients that a new user has connected
-        notification_msg = f"USER_CONNECTED:{client_name}\n"
-        for other_writer in list(connected_clients):
-            if other_writer != writer and other_writer in connected_clients:
-                try:
-                    other_writer.write(notification_msg.encode('utf-8'))
-                    await other_writer.drain()
-                except Exception as e:
-                    log.warning(f"Failed to notify client about new user connection: {e}")
-        
-        name_ack = f"Name registered: {client_name}\nCommands: CONNECT:name, DISCONNECT_CHAT, CREATE_GROUP:name, JOIN_GROUP:name, LEAVE_GROUP:name, LIST_GROUPS, LIST_USERS, GROUP:group_name:message\n"
-        writer.write(name_ack.encode('utf-8'))
-        await writer.drain()
+            
+            if resumable:
+                token = secrets.token_urlsafe(16)
+                sessions[token] = {'name': client_name, 'writer': writer, 'expiry': None}
+                client_info[writer]['resume_token'] = token
+                client_info[writer]['recent_replies'] = OrderedDict()
+                writer.write(f"RESUME_TOKEN:{token}\n".encode('utf-8'))
+                await writer.drain()
         
         while True:
             try:
-                data = await reader.read(MAX_MESSAGE_SIZE)
+                data = await _read_frame(reader)
             except Exception as e:
                 log_msg = f"Client {client_name} ({client_id}) connection error: {type(e).__name__}"
                 log.warning(log_msg)
@@ -142,39 +496,40 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                 break
             if not data:
                 break
+            if recorder is not None:
+                recorder.record(session_id, DIR_IN, data)
+            
+            correlation_id, _ = _split_correlation_id(data[:CORRELATION_PREFIX_MAX].decode('utf-8', errors='ignore'))
             
             if len(data) >= MAX_MESSAGE_SIZE:
                 error_msg = f"ERROR: Message size validation failed - Message exceeds maximum size of {MAX_MESSAGE_SIZE} bytes (received {len(data)} bytes). Please send a shorter message.\n"
                 log.warning(f"Client {client_name} ({client_id}) sent message exceeding size limit: {len(data)} bytes")
                 try:
-                    writer.write(error_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, error_msg, correlation_id)
                 except:
                     pass
                 continue
             
-            data_decoded = data.decode("utf-8").strip()
+            correlation_id, data_decoded = _split_correlation_id(data.decode("utf-8").strip())
             timestamp = datetime.now().isoformat()
             
-            now = datetime.now().timestamp()
-            rate_queue = client_rate_limits.get(writer, deque())
-            
-            while rate_queue and rate_queue[0] < now - RATE_LIMIT_WINDOW:
-                rate_queue.popleft()
+            # A request resent after a session resume gets its original reply again
+            recent_replies = client_info[writer].get('recent_replies')
+            if correlation_id is not None and recent_replies and correlation_id in recent_replies:
+                writer.write(recent_replies[correlation_id])
+                await writer.drain()
+                continue
             
-            if len(rate_queue) >= RATE_LIMIT_MSGS:
+            # Ending the session is never rate limited, or a busy client would be parked instead
+            if data_decoded != "END_SESSION" and not _check_rate_limit(writer, datetime.now().timestamp()):
                 error_msg = f"ERROR: Rate limit exceeded. Maximum {RATE_LIMIT_MSGS} messages per {RATE_LIMIT_WINDOW} seconds.\n"
                 log.warning(f"Rate limit exceeded for client {client_name} ({client_id})")
                 try:
-                    writer.write(error_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, error_msg, correlation_id)
                 except:
                     pass
                 continue
             
-            rate_queue.append(now)
-            client_rate_limits[writer] = rate_queue
-            
             client_info[writer]['messages_received'] += 1
             
             # Skip logging for repeated requests (LIST_USERS, LIST_GROUPS)
@@ -188,7 +543,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     'direction': 'received',
                     'message': data_decoded
                 }
-                message_log.append(log_entry)
+                _log_message(log_entry)
                 
                 log_msg = f"Received from {client_name} ({client_id}): {data_decoded}"
                 log.debug(log_msg)
@@ -200,23 +555,12 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                 if data_decoded == "LIST_USERS":
                     user_list = list(clients_by_name.keys())
                     user_list_str = f"Connected users ({len(user_list)}): {', '.join(user_list)}\n"
-                    writer.write(user_list_str.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, user_list_str, correlation_id)
                     continue
                 
                 elif data_decoded == "LIST_GROUPS":
-                    group_list = list(groups.keys())
-                    if not group_list:
-                        group_list_str = "No groups available\n"
-                    else:
-                        group_info = []
-                        for group_name in group_list:
-                            member_count = len(groups[group_name])
-                            member_names = [client_info[w].get('name', 'Unknown') for w in groups[group_name] if w in client_info]
-                            group_info.append(f"{group_name} ({member_count} members: {', '.join(member_names)})")
-                        group_list_str = f"Available groups ({len(group_list)}):\n" + "\n".join(group_info) + "\n"
-                    writer.write(group_list_str.encode('utf-8'))
-                    await writer.drain()
+                    group_list_str = _render_group_list()
+                    await _reply(writer, group_list_str, correlation_id)
                     continue
                 
                 elif data_decoded.startswith("CREATE_GROUP:"):
@@ -224,14 +568,12 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     
                     if not group_name:
                         error_msg = "ERROR: Group name cannot be empty\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if group_name in groups:
                         error_msg = f"ERROR: Group '{group_name}' already exists\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     groups[group_name] = {writer}
@@ -239,18 +581,11 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     client_info[writer]['groups'].add(group_name)
                     
                     success_msg = f"Group '{group_name}' created. You are now a member.\n"
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     # Notify all clients to refresh groups list
-                    notification_msg = f"GROUP_UPDATED: {group_name} was created\n"
-                    for other_writer in list(connected_clients):
-                        if other_writer != writer and other_writer in connected_clients:
-                            try:
-                                other_writer.write(notification_msg.encode('utf-8'))
-                                await other_writer.drain()
-                            except:
-                                pass
+                    notification_msg = f"GROUP_UPDATED: {group_name} was created by {client_name}\n"
+                    await _broadcast(list(connected_clients), notification_msg, exclude=(writer,))
                     
                     log_msg = f"Group '{group_name}' created by {client_name}"
                     log.info(log_msg)
@@ -263,14 +598,12 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     
                     if group_name not in groups:
                         error_msg = f"ERROR: Group '{group_name}' does not exist\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if writer in groups[group_name]:
                         error_msg = f"ERROR: You are already a member of group '{group_name}'\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     groups[group_name].add(writer)
@@ -278,28 +611,15 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     client_info[writer]['groups'].add(group_name)
                     
                     success_msg = f"Joined group '{group_name}'\n"
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     # Notify other group members
-                    for member in groups[group_name]:
-                        if member != writer and member in connected_clients:
-                            try:
-                                notify_msg = f"{client_name} joined group '{group_name}'\n"
-                                member.write(notify_msg.encode('utf-8'))
-                                await member.drain()
-                            except:
-                                pass
+                    notify_msg = f"{client_name} joined group '{group_name}'\n"
+                    await _broadcast(list(groups[group_name]), notify_msg, exclude=(writer,))
                     
                     # Notify all clients to refresh groups list
                     notification_msg = f"GROUP_UPDATED: {client_name} joined {group_name}\n"
-                    for other_writer in list(connected_clients):
-                        if other_writer != writer and other_writer in connected_clients:
-                            try:
-                                other_writer.write(notification_msg.encode('utf-8'))
-                                await other_writer.drain()
-                            except:
-                                pass
+                    await _broadcast(list(connected_clients), notification_msg, exclude=(writer,))
                     
                     log_msg = f"{client_name} joined group '{group_name}'"
                     log.info(log_msg)
@@ -312,8 +632,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     parts = data_decoded[16:].split(":", 1)
                     if len(parts) != 2:
                         error_msg = "ERROR: Invalid INVITE_TO_GROUP format. Use: INVITE_TO_GROUP:group_name:user_name\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     group_name = parts[0].strip()
@@ -322,22 +641,19 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     # Check if group exists
                     if group_name not in groups:
                         error_msg = f"ERROR: Group '{group_name}' does not exist\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     # Check if inviter is a member
                     if writer not in groups[group_name]:
                         error_msg = f"ERROR: You are not a member of group '{group_name}'\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     # Check if invitee exists
                     if invitee_name not in clients_by_name:
                         error_msg = f"ERROR: User '{invitee_name}' is not connected\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     invitee_writer = clients_by_name[invitee_name]
@@ -345,8 +661,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     # Check if invitee is already in group
                     if invitee_writer in groups[group_name]:
                         error_msg = f"ERROR: User '{invitee_name}' is already a member of group '{group_name}'\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     # Add invitee to group
@@ -360,28 +675,15 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     await invitee_writer.drain()
                     
                     # Notify other group members
-                    for member in groups[group_name]:
-                        if member != writer and member != invitee_writer and member in connected_clients:
-                            try:
-                                notify_msg = f"{invitee_name} was added to group '{group_name}' by {client_name}\n"
-                                member.write(notify_msg.encode('utf-8'))
-                                await member.drain()
-                            except:
-                                pass
+                    notify_msg = f"{invitee_name} was added to group '{group_name}' by {client_name}\n"
+                    await _broadcast(list(groups[group_name]), notify_msg, exclude=(writer, invitee_writer))
                     
                     # Notify all clients to refresh groups list
                     notification_msg = f"GROUP_UPDATED: {invitee_name} was added to {group_name}\n"
-                    for other_writer in list(connected_clients):
-                        if other_writer != writer and other_writer != invitee_writer and other_writer in connected_clients:
-                            try:
-                                other_writer.write(notification_msg.encode('utf-8'))
-                                await other_writer.drain()
-                            except:
-                                pass
+                    await _broadcast(list(connected_clients), notification_msg, exclude=(writer, invitee_writer))
                     
                     success_msg = f"User '{invitee_name}' was added to group '{group_name}'\n"
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     log_msg = f"{client_name} added {invitee_name} to group '{group_name}'"
                     log.info(log_msg)
@@ -394,14 +696,12 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     
                     if group_name not in groups:
                         error_msg = f"ERROR: Group '{group_name}' does not exist\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if writer not in groups[group_name]:
                         error_msg = f"ERROR: You are not a member of group '{group_name}'\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     groups[group_name].discard(writer)
@@ -415,27 +715,14 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     else:
                         success_msg = f"Left group '{group_name}'\n"
                     # Notify other group members
-                    for member in groups[group_name]:
-                        if member in connected_clients:
-                            try:
-                                notify_msg = f"{client_name} left group '{group_name}'\n"
-                                member.write(notify_msg.encode('utf-8'))
-                                await member.drain()
-                            except:
-                                pass
+                    notify_msg = f"{client_name} left group '{group_name}'\n"
+                    await _broadcast(list(groups.get(group_name, ())), notify_msg)
                     
                     # Notify all clients to refresh groups list
                     notification_msg = f"GROUP_UPDATED: {client_name} left {group_name}\n"
-                    for other_writer in list(connected_clients):
-                        if other_writer != writer and other_writer in connected_clients:
-                            try:
-                                other_writer.write(notification_msg.encode('utf-8'))
-                                await other_writer.drain()
-                            except:
-                                pass
+                    await _broadcast(list(connected_clients), notification_msg, exclude=(writer,))
                     
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     log_msg = f"{client_name} left group '{group_name}'"
                     log.info(log_msg)
@@ -448,8 +735,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     parts = data_decoded[6:].split(":", 1)
                     if len(parts) != 2:
                         error_msg = "ERROR: Invalid GROUP format. Use: GROUP:group_name:message\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     group_name = parts[0].strip()
@@ -457,37 +743,24 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     
                     if group_name not in groups:
                         error_msg = f"ERROR: Group '{group_name}' does not exist\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if writer not in groups[group_name]:
                         error_msg = f"ERROR: You are not a member of group '{group_name}'\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     # Send message to all group members except sender
                     forward_msg = f"[{group_name}] {client_name}: {group_message}\n"
-                    sent_count = 0
-                    for member in groups[group_name]:
-                        if member != writer and member in connected_clients:
-                            try:
-                                member.write(forward_msg.encode('utf-8'))
-                                await member.drain()
-                                sent_count += 1
-                                if member in client_info:
-                                    client_info[member]['messages_received'] += 1
-                            except:
-                                pass
+                    sent_count = await _fanout_group_message(group_name, writer, forward_msg)
                     
                     if sent_count > 0:
                         success_msg = f"Message sent to {sent_count} member(s) in group '{group_name}'\n"
                     else:
                         success_msg = f"Message sent to group '{group_name}' (no other members online)\n"
                     
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     client_info[writer]['messages_sent'] += sent_count
                     
@@ -498,7 +771,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                         'direction': 'sent',
                         'message': f"Group message to {group_name}: {group_message}"
                     }
-                    message_log.append(log_entry)
+                    _log_message(log_entry)
                     
                     log_msg = f"Group message from {client_name} to {group_name} ({sent_count} recipients)"
                     log.debug(log_msg)
@@ -512,15 +785,13 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     if target_name == client_name:
                         error_msg = "ERROR: Connection failed - You cannot connect to yourself. Please specify a different client name.\n"
                         log.debug(f"Client {client_name} attempted to connect to themselves")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if target_name not in clients_by_name:
                         error_msg = f"ERROR: Connection failed - Client '{target_name}' not found. The client may not be connected or the name is incorrect. Use available client names.\n"
                         log.warning(f"Client {client_name} attempted to connect to non-existent client: {target_name}")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     target_writer = clients_by_name[target_name]
@@ -528,15 +799,13 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     if target_writer not in connected_clients:
                         error_msg = f"ERROR: Connection failed - Client '{target_name}' is no longer connected. The client may have disconnected.\n"
                         log.warning(f"Client {client_name} attempted to connect to disconnected client: {target_name}")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     if client_info[writer].get('chat_partner') == target_writer:
                         error_msg = f"ERROR: Connection failed - You are already connected to '{target_name}'. No need to reconnect.\n"
                         log.debug(f"Client {client_name} attempted to reconnect to {target_name}")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         continue
                     
                     # Close any existing chat connection before opening new one
@@ -562,8 +831,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     client_info[target_writer]['chat_partner'] = writer
                     
                     success_msg = f"Connected to {target_name}. You can now send messages directly.\n"
-                    writer.write(success_msg.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, success_msg, correlation_id)
                     
                     target_msg = f"{client_name} connected to you. You can now send messages directly.\n"
                     target_writer.write(target_msg.encode('utf-8'))
@@ -575,6 +843,12 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     if log_callback:
                         log_callback(log_msg)
                     
+                elif data_decoded == "END_SESSION":
+                    # Explicit logout: do not hold a resumable session open
+                    session_ended = True
+                    await _reply(writer, "Session ended\n", correlation_id)
+                    break
+                
                 elif data_decoded == "DISCONNECT_CHAT":
                     # Close current chat connection without disconnecting from server
                     if writer in client_chats:
@@ -597,8 +871,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                         client_info[writer]['chat_partner'] = None
                         
                         success_msg = "Chat disconnected successfully. You can start a new chat with CONNECT:name\n"
-                        writer.write(success_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, success_msg, correlation_id)
                         
                         log_msg = f"{client_name} disconnected from chat"
                         log.info(log_msg)
@@ -607,8 +880,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     else:
                         # Not in any chat
                         error_msg = "ERROR: You are not in any chat. Use CONNECT:name to start a chat.\n"
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                     continue
                     
                 elif client_info[writer].get('chat_partner'):
@@ -617,8 +889,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     if target_writer not in connected_clients:
                         error_msg = "ERROR: Message delivery failed - Your chat partner has disconnected. The chat session has been closed.\n"
                         log.warning(f"Client {client_name} attempted to send message to disconnected partner")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         client_info[writer]['chat_partner'] = None
                         if writer in client_chats:
                             del client_chats[writer]
@@ -633,8 +904,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     except (ConnectionResetError, BrokenPipeError, OSError) as e:
                         error_msg = "ERROR: Message delivery failed - Chat partner disconnected during message transmission. The chat session has been closed.\n"
                         log.error(f"Error forwarding message from {client_name} to {target_name}: {type(e).__name__}")
-                        writer.write(error_msg.encode('utf-8'))
-                        await writer.drain()
+                        await _reply(writer, error_msg, correlation_id)
                         client_info[writer]['chat_partner'] = None
                         if target_writer in client_info:
                             client_info[target_writer]['chat_partner'] = None
@@ -645,6 +915,10 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     client_info[writer]['messages_sent'] += 1
                     client_info[target_writer]['messages_received'] += 1
                     
+                    # Uncorrelated senders keep the old fire-and-forget behaviour
+                    if correlation_id is not None:
+                        await _reply(writer, f"Message delivered to {target_name}\n", correlation_id)
+                    
                     log_entry = {
                         'timestamp': timestamp,
                         'client_id': client_info[target_writer]['client_id'],
@@ -652,7 +926,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                         'direction': 'received',
                         'message': f"Forwarded from {client_name}: {data_decoded}"
                     }
-                    message_log.append(log_entry)
+                    _log_message(log_entry)
                     
                     log_msg = f"Message forwarded from {client_name} to {target_name}"
                     log.debug(log_msg)
@@ -662,8 +936,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                     
                 else:
                     response = f"server received {data_decoded.upper()}\n"
-                    writer.write(response.encode('utf-8'))
-                    await writer.drain()
+                    await _reply(writer, response, correlation_id)
                     
                     client_info[writer]['messages_sent'] += 1
                     
@@ -674,7 +947,7 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
                         'direction': 'sent',
                         'message': response.strip()
                     }
-                    message_log.append(log_entry)
+                    _log_message(log_entry)
                     
             except (ConnectionResetError, BrokenPipeError, OSError) as e:
                 log_msg = f"Client {client_name} ({client_id}) closed connection before response sent: {type(e).__name__}"
@@ -690,112 +963,29 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
         if log_callback:
             log_callback(log_msg)
-        # Notify chat partner immediately when user disconnects
-        # Try to find partner from client_chats first, then from chat_partner
-        partner = None
-        if writer in client_chats:
-            partner = client_chats[writer]
-        elif writer in client_info and client_info[writer].get('chat_partner'):
-            partner = client_info[writer]['chat_partner']
-        
-        if partner and partner in client_info and partner in connected_clients:
-            try:
-                disconnect_msg = f"[System] {client_name} has disconnected. You can no longer send messages to them.\n"
-                partner.write(disconnect_msg.encode('utf-8'))
-                await partner.drain()
-                client_info[partner]['chat_partner'] = None
-            except:
-                pass
-        
-        if partner and partner in client_info:
-            client_info[partner]['chat_partner'] = None
-        
-        # Clean up client_chats and client_info
-        if writer in client_chats:
-            if client_chats[writer] in client_chats and client_chats[client_chats[writer]] == writer:
-                del client_chats[client_chats[writer]]
-            del client_chats[writer]
     except Exception as e:
         log_msg = f"Error with client {client_id}: {e}"
         log.error(log_msg, exc_info=True)
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {log_msg}")
         if log_callback:
             log_callback(log_msg)
-        # Notify chat partner immediately when error occurs
-        # Try to find partner from client_chats first, then from chat_partner
-        partner = None
-        if writer in client_chats:
-            partner = client_chats[writer]
-        elif writer in client_info and client_info[writer].get('chat_partner'):
-            partner = client_info[writer]['chat_partner']
-        
-        if partner and partner in client_info and partner in connected_clients:
-            try:
-                disconnect_msg = f"[System] {client_name} has disconnected. You can no longer send messages to them.\n"
-                partner.write(disconnect_msg.encode('utf-8'))
-                await partner.drain()
-                client_info[partner]['chat_partner'] = None
-            except:
-                pass
-        
-        if partner and partner in client_info:
-            client_info[partner]['chat_partner'] = None
-        
-        # Clean up client_chats and client_info
-        if writer in client_chats:
-            if client_chats[writer] in client_chats and client_chats[client_chats[writer]] == writer:
-                del client_chats[client_chats[writer]]
-            del client_chats[writer]
     finally:
-        # Cleanup: notify chat partner if not already notified (backup)
-        # Try to find partner from client_chats first, then from chat_partner
-        partner = None
-        if writer in client_chats:
-            partner = client_chats[writer]
-        elif writer in client_info and client_info[writer].get('chat_partner'):
-            partner = client_info[writer]['chat_partner']
-        
-        if partner and partner in client_info and partner in connected_clients:
-            try:
-                disconnect_msg = f"[System] {client_name} has disconnected. You can no longer send messages to them.\n"
-                partner.write(disconnect_msg.encode('utf-8'))
-                await partner.drain()
-                client_info[partner]['chat_partner'] = None
-            except:
-                pass
-        
-        if partner and partner in client_info:
-            client_info[partner]['chat_partner'] = None
-        
-        # Clean up client_chats and client_info
-        if writer in client_chats:
-            if client_chats[writer] in client_chats and client_chats[client_chats[writer]] == writer:
-                del client_chats[client_chats[writer]]
-            del client_chats[writer]
-        
-        if client_name and client_name in clients_by_name:
-            del clients_by_name[client_name]
-        
-        # Remove from all groups
-        if writer in client_groups:
-            groups_to_remove = list(client_groups[writer])
-            for group_name in groups_to_remove:
-                if group_name in groups:
-                    groups[group_name].discard(writer)
-                    if not groups[group_name]:
-                        del groups[group_name]
-            del client_groups[writer]
-        
-        if writer in connected_clients:
-            connected_clients.remove(writer)
-        if writer in client_info:
-            del client_info[writer]
+        # After a takeover by a resumed connection this writer owns nothing and cleanup is a no-op
+        token = client_info.get(writer, {}).get('resume_token')
+        if token and not session_ended:
+            _park_session(writer, token)
+        else:
+            sessions.pop(token, None)
+            await _cleanup_client(writer, client_name)
         
-        if writer in client_rate_limits:
-            del client_rate_limits[writer]
+        if recorder is not None:
+            recorder.close_session(session_id)
         
         writer.close()
-        await writer.wait_closed()
+        try:
+            await writer.wait_closed()
+        except (ConnectionResetError, BrokenPipeError, OSError):
+            pass
         
         log_msg = f"Client {client_name or client_id} ({client_id}) cleaned up"
         log.info(log_msg)
@@ -804,6 +994,58 @@ async def handle_client(reader: asyncio.StreamReader, writer: asyncio.StreamWrit
             log_callback(log_msg)
 
 
+async def _cleanup_client(writer: asyncio.StreamWriter, client_name: Optional[str]):
+    """Remove every reference to a departing client from the server registries.
+    
+    Chat partners are notified once, and any other client still pointing at this
+    writer (stale chat_partner / client_chats entries) is unlinked so the writer
+    and its socket can be freed.
+    """
+    # Unregister first so no other handler can link to this writer while we await below
+    connected_clients.discard(writer)
+    registered = bool(client_name) and clients_by_name.get(client_name) is writer
+    if registered:
+        del clients_by_name[client_name]
+    
+    # Remove from all groups
+    for group_name in client_groups.pop(writer, ()):
+        if group_name in groups:
+            groups[group_name].discard(writer)
+            if not groups[group_name]:
+                del groups[group_name]
+    
+    partners = set()
+    if writer in client_chats:
+        partners.add(client_chats.pop(writer))
+    info = client_info.pop(writer, None)
+    if info and info.get('chat_partner'):
+        partners.add(info['chat_partner'])
+    # A partner relationship is not always symmetric (e.g. after a third client
+    # CONNECTs to the partner), so sweep for anything else still pointing here.
+    for other, other_info in client_info.items():
+        if other_info.get('chat_partner') is writer:
+            other_info['chat_partner'] = None
+            partners.add(other)
+    for other in [w for w, target in client_chats.items() if target is writer]:
+        del client_chats[other]
+    partners.discard(writer)
+    
+    client_rate_limits.pop(writer, None)
+    
+    for partner in partners:
+        if partner in connected_clients:
+            try:
+                disconnect_msg = f"[System] {client_name} has disconnected. You can no longer send messages to them.\n"
+                partner.write(disconnect_msg.encode('utf-8'))
+                await partner.drain()
+            except:
+                pass
+    
+    # Lets clients keep their user and group lists current without polling
+    if registered:
+        await _broadcast(list(connected_clients), f"USER_DISCONNECTED:{client_name}\n")
+
+
 async def start_server(host=None, port=None):
     server_host = host if host is not None else HOST
     server_port = port if port is not None else PORT
@@ -824,10 +1066,30 @@ def set_log_callback(callback: Callable[[str], None]):
     log_callback = callback
 
 
+def start_capture(filename: str, record_outbound: bool = True) -> CaptureRecorder:
+    """Record every new session's traffic to `filename` until stop_capture() is called."""
+    global capture_recorder
+    stop_capture()
+    capture_recorder = CaptureRecorder(filename, record_outbound)
+    log_msg = f"Capturing traffic to {filename}"
+    log.info(log_msg)
+    if log_callback:
+        log_callback(log_msg)
+    return capture_recorder
+
+
+def stop_capture():
+    global capture_recorder
+    if capture_recorder is not None:
+        capture_recorder.close()
+        log.info(f"Capture closed: {capture_recorder.filename} ({capture_recorder.records_written} records)")
+        capture_recorder = None
+
+
 def get_statistics():
-    total_messages = len(message_log)
-    received = sum(1 for msg in message_log if msg['direction'] == 'received')
-    sent = sum(1 for msg in message_log if msg['direction'] == 'sent')
+    received = message_counts.get('received', 0)
+    sent = message_counts.get('sent', 0)
+    total_messages = received + sent
     
     # Build chat connections mapping
     chat_connections = {}  # client_id -> partner_name
@@ -857,8 +1119,23 @@ def get_statistics():
             'groups': list(info.get('groups', set()))
         }
     
+    broadcasts = fanout_stats['broadcasts']
+    fanout = {
+        'broadcasts': broadcasts,
+        'recipients': fanout_stats['recipients'],
+        'yields': fanout_stats['yields'],
+        'avg_duration_ms': round(fanout_stats['total_duration'] / broadcasts * 1000, 3) if broadcasts else 0.0,
+        'max_duration_ms': round(fanout_stats['max_duration'] * 1000, 3),
+        'avg_loop_block_ms': round(fanout_stats['total_loop_block'] / broadcasts * 1000, 3) if broadcasts else 0.0,
+        'max_loop_block_ms': round(fanout_stats['max_loop_block'] * 1000, 3),
+        'chunk_size': FANOUT_CHUNK_SIZE,
+        'tick_budget': FANOUT_TICK_BUDGET,
+    }
+    
     return {
+        'fanout': fanout,
         'connected_clients': len(connected_clients),
+        'parked_sessions': sum(1 for session in sessions.values() if isinstance(session['writer'], ParkedWriter)),
         'total_messages': total_messages,
         'messages_received': received,
         'messages_sent': sent,
@@ -874,16 +1151,19 @@ def export_logs(filename: str = None):
         filename = f"server_logs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
     with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(message_log, f, indent=2, ensure_ascii=False)
+        json.dump(list(message_log), f, indent=2, ensure_ascii=False)
     
     return filename
 
 
 if __name__ == "__main__":
+    if "--capture" in sys.argv:
+        start_capture(sys.argv[sys.argv.index("--capture") + 1])
     try:
         asyncio.run(start_server())
     except KeyboardInterrupt:
         print(f"\n[{datetime.now().strftime('%H:%M:%S')}] Server shutting down...")
+        stop_capture()
         if message_log:
             export_logs()
             print(f"Logs exported to server_logs_*.json")
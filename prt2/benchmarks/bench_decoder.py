@@ -0,0 +1,159 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_impl.server_async as server_async
+from async_impl.protocol import DirectMessage, EventParser, GroupMessage
+from benchmarks.fakes import (FakeStreamReader, FakeStreamWriter, quiet_server, register_fake_client,
+                              reset_server_state)
+
+# User text that the old substring chain mistook for server notices
+TRICKY_TEXTS = ["Connected users should read this", "bob joined group 'x' yesterday", "my laptop has disconnected",
+                "ERROR 404 again", "the build was created", "you were added to group chat? lol"]
+
+
+def record_traffic() -> List[str]:
+    """Run a scripted session through the real server and return every line the clients received."""
+    reset_server_state(server_async)
+    peers = [register_fake_client(server_async, f"peer{i}") for i in range(3)]
+    for peer in peers:
+        peer.keep_output = True
+    script = ["recorder", "LIST_USERS", "CREATE_GROUP:team", "INVITE_TO_GROUP:team:peer0",
+              "INVITE_TO_GROUP:team:peer1", "LIST_GROUPS", "JOIN_GROUP:missing", "CREATE_GROUP:team"]
+    script += [f"GROUP:team:{text}" for text in TRICKY_TEXTS] + ["GROUP:team:status update 42"] * 20
+    script += ["CONNECT:peer2"] + TRICKY_TEXTS + ["how is it going?"] * 20 + ["DISCONNECT_CHAT", "LEAVE_GROUP:team"]
+    reader = FakeStreamReader([f"{line}\n".encode('utf-8') for line in script])
+    reader.feed_eof()
+    writer = FakeStreamWriter(keep_output=True)
+    asyncio.run(server_async.handle_client(reader, writer))
+    output = writer.output + b"".join(bytes(peer.output) for peer in peers)
+    reset_server_state(server_async)
+    return output.decode('utf-8').splitlines()
+
+
+def substring_decode(line: str):
+    """The GUI's decoding before the decoder, kept to compare against.
+
+    Tests run in the order of the old handle_received_message chain, and
+    each branch extracts its fields the way that chain did (minus the UI
+    updates). Returns (kind, fields).
+    """
+    lower = line.lower
+    if line.startswith("USER_CONNECTED:"):
+        return "UserConnected", line.split(":", 1)[1].strip()
+    if "Connected users" in line:
+        users_str = line.split(":", 1)[1].strip()
+        if "(" in users_str:
+            users_str = users_str.split(")", 1)[1].strip()
+        return "UserList", [u.strip() for u in users_str.split(",") if u.strip()]
+    if "Group" in line and ("created" in lower() or "You are now a member" in line):
+        return "GroupUpdated", line.split("'")[1] if "'" in line else None
+    if "was added to group" in lower() or "you were added to group" in lower():
+        return "GroupUpdated", line.split("'")[1] if "you were added to group" in lower() and "'" in line else None
+    if "has disconnected" in lower() and ("you can no longer send messages" in lower() or "[System]" in line):
+        return "ChatClosed", line.split("[System]")[1].strip().split(" has disconnected")[0].strip()
+    if "joined group" in lower() or "left group" in lower():
+        return "GroupUpdated", None
+    if "GROUP_UPDATED" in line:
+        return "GroupUpdated", None
+    if line.startswith("[") and "]" in line:
+        closing = line.find("]")
+        source = line[1:closing].strip()
+        body = line[closing + 1:].strip()
+        if body.startswith(":"):
+            body = body[1:].strip()
+        colon = body.find(":")
+        if colon != -1:
+            return "Message", (source, body[:colon].strip(), body[colon + 1:].strip())
+        return "Message", (source, source, body.strip())
+    if "ERROR" in line and "Group" in line and "already exists" in lower():
+        return "Error", line
+    if "ERROR" in line and "already connected" in lower():
+        return "Error", line.split("'")[1].split("'")[0] if "'" in line else None
+    if "ERROR" in line and ("disconnected" in lower() or "Message delivery failed" in line):
+        return "Error", line
+    if "connected to you" in lower() and "you can now send messages directly" in lower():
+        return "ChatOpened", line[:lower().find(" connected to you")].strip()
+    if line.startswith("Connected to ") and "You can now send messages directly" in line:
+        return "ChatOpened", line.split("Connected to ")[1].split(".")[0].strip()
+    if "joined group" in lower() or "left group" in lower() or "created" in lower() or "connected to" in lower():
+        return "GroupUpdated", None
+    return "Notice", None
+
+
+def time_lines(decoders: Dict[str, Callable[[str], object]], lines: List[str], repeat: int) -> Dict[str, dict]:
+    """Feed every line to each decoder `repeat` times and keep each one's fastest pass.
+
+    Passes alternate between the decoders, so background load affects them alike.
+    """
+    best = dict.fromkeys(decoders)
+    for _ in range(repeat):
+        for name, decode in decoders.items():
+            start = time.perf_counter()
+            for line in lines:
+                decode(line)
+            elapsed = time.perf_counter() - start
+            if best[name] is None or elapsed < best[name]:
+                best[name] = elapsed
+    return {name: {
+        'lines': len(lines),
+        'best_seconds': round(seconds, 6),
+        'ns_per_line': round(seconds / len(lines) * 1e9, 1),
+        'lines_per_sec': round(len(lines) / seconds, 1),
+    } for name, seconds in best.items()}
+
+
+def run(lines: List[str], repeat: int) -> dict:
+    parser = EventParser("recorder")
+    events = [parser.feed(line) for line in lines]
+    user_lines = [line for line, event in zip(lines, events) if isinstance(event, (DirectMessage, GroupMessage))]
+    tricky = [line for line in user_lines if any(line.endswith(text) for text in TRICKY_TEXTS)]
+    return {
+        **time_lines({'decoder': EventParser("recorder").feed, 'substring_chain': substring_decode}, lines, repeat),
+        'events': dict(Counter(type(event).__name__ for event in events if event is not None)),
+        # Chat lines whose text the old chain classified as something other than a message
+        'substring_misclassified': sum(1 for line in tricky if substring_decode(line)[0] != "Message"),
+        'tricky_lines': len(tricky),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Time the client's server-line decoder on recorded traffic")
+    parser.add_argument("--traffic", help="Text file of received lines (default: record a session in-process)")
+    parser.add_argument("--lines", type=int, default=200000, help="Replay the traffic up to this many lines")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    if args.traffic:
+        with open(args.traffic, 'r', encoding='utf-8') as f:
+            recorded = f.read().splitlines()
+    else:
+        with quiet_server(server_async):
+            recorded = record_traffic()
+    lines = (recorded * (args.lines // max(len(recorded), 1) + 1))[:args.lines]
+    results = run(lines, args.repeat)
+
+    report = {'timestamp': datetime.now().isoformat(), 'recorded_lines': len(recorded), **results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    for name in ('decoder', 'substring_chain'):
+        r = results[name]
+        print(f"{name:16s} {r['lines_per_sec']:>12,.1f} lines/s  {r['ns_per_line']:8.1f} ns/line")
+    print(f"speedup: {results['substring_chain']['ns_per_line'] / results['decoder']['ns_per_line']:.2f}x")
+    print(f"events: {results['events']}")
+    print(f"chat lines the substring chain misclassified: "
+          f"{results['substring_misclassified']} of {results['tricky_lines']} tricky lines (decoder: 0)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
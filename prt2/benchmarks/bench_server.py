@@ -0,0 +1,191 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_impl.server_async as server_async
+from benchmarks.fakes import (FakeStreamReader, FakeStreamWriter, quiet_server, register_fake_client,
+                              reset_server_state)
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+# Both files are machine specific and not committed; the baseline is created with --save-baseline
+BASELINE_FILE = os.path.join(BENCHMARK_DIR, "baseline_server.json")
+RESULTS_FILE = os.path.join(BENCHMARK_DIR, "bench_server_results.json")
+DEFAULT_THRESHOLD = 0.25
+
+
+def measure(func: Callable[[], int], repeat: int) -> Dict[str, float]:
+    """Run `func` `repeat` times and keep the fastest run.
+
+    Args:
+        func: Callable that performs the workload and returns the number of operations done
+        repeat: Number of runs
+    """
+    best = None
+    ops = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        ops = func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    ns_per_op = best / ops * 1e9 if ops else 0.0
+    return {
+        'ops': ops,
+        'best_seconds': round(best, 6),
+        'ns_per_op': round(ns_per_op, 1),
+        'ops_per_sec': round(1e9 / ns_per_op, 1) if ns_per_op else 0.0,
+    }
+
+
+def bench_dispatch(commands: int) -> int:
+    """Feed a mix of commands through `handle_client` for one fake session."""
+    reset_server_state(server_async)
+    peer = register_fake_client(server_async, "bench_peer")
+    mix = [b"LIST_USERS\n", b"hello server\n", b"GROUP:bench_group:hello group\n",
+           b"LIST_GROUPS\n", b"JOIN_GROUP:missing_group\n"]
+    chunks = [b"bench_user\n", b"CREATE_GROUP:bench_group\n", b"INVITE_TO_GROUP:bench_group:bench_peer\n"]
+    chunks += [mix[i % len(mix)] for i in range(commands)]
+    reader = FakeStreamReader(chunks)
+    reader.feed_eof()
+    asyncio.run(server_async.handle_client(reader, FakeStreamWriter()))
+    reset_server_state(server_async)
+    return commands
+
+
+def bench_rate_limiter(checks: int) -> int:
+    reset_server_state(server_async)
+    writer = FakeStreamWriter()
+    step = server_async.RATE_LIMIT_WINDOW / max(1, server_async.RATE_LIMIT_MSGS) / 2
+    now = 0.0
+    for _ in range(checks):
+        now += step
+        server_async._check_rate_limit(writer, now)
+    return checks
+
+
+def bench_list_groups(group_count: int, members_per_group: int = 5) -> Callable[[], int]:
+    reset_server_state(server_async)
+    writers = [register_fake_client(server_async, f"user_{i}") for i in range(members_per_group * 4)]
+    for g in range(group_count):
+        server_async.groups[f"group_{g}"] = {writers[(g + m) % len(writers)] for m in range(members_per_group)}
+
+    def run() -> int:
+        for _ in range(10):
+            server_async._render_group_list()
+        return 10
+    return run
+
+
+def bench_group_fanout(recipients: int) -> Callable[[], int]:
+    reset_server_state(server_async)
+    sender = register_fake_client(server_async, "sender")
+    members = {sender}
+    for i in range(recipients):
+        members.add(register_fake_client(server_async, f"member_{i}"))
+    server_async.groups["fanout_group"] = members
+
+    def run() -> int:
+        asyncio.run(server_async._fanout_group_message(
+            "fanout_group", sender, "[fanout_group] sender: benchmark payload\n"))
+        return recipients
+    return run
+
+
+def bench_statistics(log_entries: int, clients: int = 100) -> Callable[[], int]:
+    reset_server_state(server_async)
+    for i in range(clients):
+        register_fake_client(server_async, f"user_{i}")
+    directions = ('received', 'sent')
+    for i in range(log_entries):
+        server_async._log_message(
+            {'timestamp': '', 'client_id': '', 'client_name': '', 'direction': directions[i % 2], 'message': 'x'})
+
+    def run() -> int:
+        server_async.get_statistics()
+        return 1
+    return run
+
+
+def run_suite(scale: float = 1.0, repeat: int = 5) -> Dict[str, dict]:
+    results = {}
+    with quiet_server(server_async):
+        results['dispatch'] = measure(lambda: bench_dispatch(int(5000 * scale)), repeat)
+        results['rate_limiter'] = measure(lambda: bench_rate_limiter(int(200000 * scale)), repeat)
+        results['list_groups_1000'] = measure(bench_list_groups(int(1000 * scale)), repeat)
+        results['group_fanout_1000'] = measure(bench_group_fanout(int(1000 * scale)), repeat)
+        results['get_statistics_100k'] = measure(bench_statistics(int(100000 * scale)), repeat)
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> list:
+    """Return a list of (name, baseline_ns, current_ns, change) for regressed benchmarks."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline or not baseline[name].get('ns_per_op'):
+            continue
+        base_ns = baseline[name]['ns_per_op']
+        change = result['ns_per_op'] / base_ns - 1.0
+        result['baseline_ns_per_op'] = base_ns
+        result['change'] = round(change, 4)
+        if change > threshold:
+            regressions.append((name, base_ns, result['ns_per_op'], change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the async server hot paths")
+    parser.add_argument("--output", default=RESULTS_FILE, help="Where to write the JSON results")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed slowdown per benchmark before failing (0.25 = 25%%)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Workload size multiplier")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.scale, args.repeat)
+
+    regressions = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f).get('results', {})
+        regressions = compare(results, baseline, args.threshold)
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline}; skipping the regression check "
+              f"(run with --save-baseline to create one).")
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'scale': args.scale,
+        'threshold': args.threshold,
+        'results': results,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    for name, result in results.items():
+        change = f" ({result['change']:+.1%} vs baseline)" if 'change' in result else ""
+        print(f"{name:24s} {result['ns_per_op']:>14,.1f} ns/op {result['ops_per_sec']:>14,.1f} ops/s{change}")
+
+    if regressions:
+        print(f"\nFAILED: {len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}:")
+        for name, base_ns, current_ns, change in regressions:
+            print(f"  {name}: {base_ns:,.1f} -> {current_ns:,.1f} ns/op ({change:+.1%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
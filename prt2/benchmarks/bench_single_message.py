@@ -0,0 +1,111 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_impl.server_async as server_async
+import async_impl.client_async as client_async
+from benchmarks.fakes import quiet_server, reset_server_state
+from utils.metrics import percentile_summary
+
+RATE_LIMITED = "ERROR: Rate limit exceeded"
+
+
+async def _run_calls(call: Callable[[int], Awaitable[str]], seconds: float) -> dict:
+    """Make calls back to back for `seconds`, counting accepted and rate-limited replies."""
+    latencies: List[float] = []
+    accepted = limited = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        call_started = time.perf_counter()
+        response = await call(len(latencies))
+        latencies.append(time.perf_counter() - call_started)
+        if response.startswith(RATE_LIMITED):
+            limited += 1
+        else:
+            accepted += 1
+    elapsed = time.perf_counter() - started
+    return {
+        'calls': len(latencies),
+        'accepted': accepted,
+        'rate_limited': limited,
+        'seconds': round(elapsed, 4),
+        'calls_per_sec': round(len(latencies) / elapsed, 1),
+        'accepted_per_sec': round(accepted / elapsed, 1),
+        'latency_ms': percentile_summary(latencies),
+    }
+
+
+async def run_comparison(seconds: float, pool_size: int) -> dict:
+    """Time send_single_message per call, over the shared connection and over a pool, under the server's rate limit.
+
+    The limit applies per connection, so it decides what each mode can
+    actually deliver:
+    - connect_per_call gets a fresh allowance per call but pays a connect
+      and registration every time;
+    - pooled is the cheapest per call, but everything shares one allowance;
+    - pool spreads the calls over `pool_size` connections, multiplying the
+      allowance at the cost of that many server registrations.
+    """
+    reset_server_state(server_async)
+    server = await asyncio.start_server(server_async.handle_client, '127.0.0.1', 0)
+    client_async.HOST = '127.0.0.1'
+    client_async.PORT = server.sockets[0].getsockname()[1]
+    loop = asyncio.get_running_loop()
+    async with server:
+        results = {'connect_per_call': await _run_calls(
+            lambda i: client_async.send_single_message(f"bench message {i}", pooled=False), seconds)}
+        results['pooled'] = await _run_calls(
+            lambda i: client_async.send_single_message(f"bench message {i}"), seconds)
+        keeper = client_async._single_connection_keepers.pop(loop)
+        keeper.cancel()
+        await asyncio.gather(keeper, return_exceptions=True)
+
+        async with client_async.ConnectionPool(pool_size, name_prefix="bench_pool") as pool:
+            results['pool'] = await _run_calls(
+                lambda i: pool.connections[i % pool_size].request(f"bench message {i}"), seconds)
+        results['pool']['size'] = pool_size
+        # Let the server handlers finish their cleanup before the loop shuts down
+        handlers = asyncio.all_tasks() - {asyncio.current_task()}
+        if handlers:
+            await asyncio.wait(handlers, timeout=5)
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Compare connect-per-call, shared-connection and pooled send_single_message under the rate limit")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Run each mode for this long")
+    parser.add_argument("--target-rate", type=float, default=50.0,
+                        help="Calls per second the pool is sized for (one connection per rate-limit allowance)")
+    parser.add_argument("--pool-size", type=int, help="Connections in the pool (default: from --target-rate)")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    limit_per_sec = server_async.RATE_LIMIT_MSGS / server_async.RATE_LIMIT_WINDOW
+    pool_size = args.pool_size or max(1, math.ceil(args.target_rate / limit_per_sec))
+    with quiet_server(server_async, lift_rate_limit=False):
+        results = asyncio.run(run_comparison(args.seconds, pool_size))
+    client_async.message_log.clear()
+
+    report = {'timestamp': datetime.now().isoformat(), 'rate_limit_per_sec': limit_per_sec, **results}
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(f"server rate limit: {limit_per_sec:g} msgs/s per connection; pool of {pool_size}")
+    for mode in ('connect_per_call', 'pooled', 'pool'):
+        r = results[mode]
+        print(f"{mode:18s} {r['accepted_per_sec']:>9,.1f} accepted/s  {r['calls_per_sec']:>10,.1f} calls/s  "
+              f"rate limited {r['rate_limited']:>6}  p50 {r['latency_ms']['p50']:.3f} ms  "
+              f"p99 {r['latency_ms']['p99']:.3f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""In-process stand-ins for asyncio streams used by the benchmark and soak tools."""
+import asyncio
+import contextlib
+import os
+import logging
+import itertools
+from collections import deque
+from typing import Iterable, Optional
+
+_port_counter = itertools.count(20000)
+
+
+class FakeStreamReader:
+    """Replays queued chunks to `handle_client`, then reports EOF.
+    
+    A chunk may also be an exception instance, which is raised from `read()`
+    to simulate an abrupt disconnect.
+    """
+    
+    def __init__(self, chunks: Iterable = ()):
+        self._chunks = deque(chunks)
+        self._waiter: Optional[asyncio.Future] = None
+        self._eof = False
+    
+    def feed(self, chunk):
+        self._chunks.append(chunk)
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+    
+    def feed_eof(self):
+        self._eof = True
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+    
+    async def _next_chunk(self):
+        while not self._chunks:
+            if self._eof:
+                return b''
+            self._waiter = asyncio.get_running_loop().create_future()
+            await self._waiter
+        chunk = self._chunks.popleft()
+        if isinstance(chunk, BaseException):
+            raise chunk
+        return chunk
+    
+    async def read(self, n: int = -1) -> bytes:
+        return await self._next_chunk()
+    
+    async def readline(self) -> bytes:
+        return await self._next_chunk()
+    
+    async def readuntil(self, separator: bytes = b'\n') -> bytes:
+        return await self._next_chunk()
+
+
+class FakeStreamWriter:
+    """Collects written bytes without touching a socket."""
+    
+    def __init__(self, keep_output: bool = False):
+        self.peername = ('127.0.0.1', next(_port_counter))
+        self.keep_output = keep_output
+        self.output = bytearray()
+        self.bytes_written = 0
+        self.writes = 0
+        self._closing = False
+    
+    def write(self, data: bytes):
+        if self._closing:
+            raise ConnectionResetError("Fake writer is closed")
+        self.writes += 1
+        self.bytes_written += len(data)
+        if self.keep_output:
+            self.output += data
+    
+    async def drain(self):
+        return None
+    
+    def get_extra_info(self, name, default=None):
+        if name == 'peername':
+            return self.peername
+        return default
+    
+    def is_closing(self) -> bool:
+        return self._closing
+    
+    def close(self):
+        self._closing = True
+    
+    async def wait_closed(self):
+        return None
+
+
+def reset_server_state(server_async):
+    """Empty every registry in the server module between runs."""
+    server_async.connected_clients.clear()
+    server_async.client_info.clear()
+    server_async.clients_by_name.clear()
+    server_async.client_chats.clear()
+    server_async.groups.clear()
+    server_async.client_groups.clear()
+    server_async.client_rate_limits.clear()
+    server_async.message_log.clear()
+    for direction in server_async.message_counts:
+        server_async.message_counts[direction] = 0
+    for session in server_async.sessions.values():
+        if session['expiry'] is not None:
+            session['expiry'].cancel()
+    server_async.sessions.clear()
+    for key, value in server_async.fanout_stats.items():
+        server_async.fanout_stats[key] = type(value)()
+    server_async._fanout_tick_used = 0
+    server_async._fanout_reset_scheduled = False
+
+
+def register_fake_client(server_async, name: str) -> FakeStreamWriter:
+    """Insert a registered client directly into the server registries."""
+    writer = FakeStreamWriter()
+    server_async.connected_clients.add(writer)
+    server_async.client_info[writer] = {
+        'address': writer.peername,
+        'client_id': f"{writer.peername[0]}:{writer.peername[1]}",
+        'name': name,
+        'connected_at': '',
+        'messages_sent': 0,
+        'messages_received': 0,
+        'chat_partner': None,
+        'groups': set()
+    }
+    server_async.client_groups[writer] = set()
+    server_async.clients_by_name[name] = writer
+    return writer
+
+
+@contextlib.contextmanager
+def quiet_server(server_async, lift_rate_limit: bool = True):
+    """Silence the server's per-message prints/logging and, unless told otherwise, lift the rate limit."""
+    saved_level = server_async.log.level
+    saved_rate_limit = server_async.RATE_LIMIT_MSGS
+    server_async.log.setLevel(logging.ERROR)
+    if lift_rate_limit:
+        server_async.RATE_LIMIT_MSGS = float('inf')
+    try:
+        with open(os.devnull, 'w') as sink, contextlib.redirect_stdout(sink):
+            yield sink
+    finally:
+        server_async.log.setLevel(saved_level)
+        server_async.RATE_LIMIT_MSGS = saved_rate_limit
+        reset_server_state(server_async)
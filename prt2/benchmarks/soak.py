@@ -0,0 +1,272 @@
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import weakref
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import async_impl.server_async as server_async
+from benchmarks.fakes import FakeStreamReader, FakeStreamWriter, quiet_server
+
+REGISTRIES = ('connected_clients', 'client_info', 'clients_by_name', 'client_chats',
+              'groups', 'client_groups', 'client_rate_limits', 'message_log', 'sessions')
+
+
+class SoakSession:
+    """One client session driven through `handle_client`, over fakes or a real socket."""
+
+    def __init__(self, name: str, transport: str, port: Optional[int], live_writers: weakref.WeakSet):
+        self.name = name
+        self.transport = transport
+        self.port = port
+        self.live_writers = live_writers
+        self.task: Optional[asyncio.Task] = None
+        self.reader = None
+        self.writer = None
+
+    async def start(self):
+        if self.transport == "fake":
+            self.reader = FakeStreamReader()
+            server_writer = FakeStreamWriter()
+            self.live_writers.add(server_writer)
+            self.task = asyncio.create_task(server_async.handle_client(self.reader, server_writer))
+        else:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+            self.task = asyncio.create_task(self._drain_socket())
+        await self.send(self.name)
+        while self.name not in server_async.clients_by_name:
+            if self.task.done():
+                raise RuntimeError(f"Session {self.name} ended during registration")
+            await asyncio.sleep(0)
+
+    async def _drain_socket(self):
+        try:
+            while await self.reader.read(65536):
+                pass
+        except (ConnectionError, OSError):
+            pass
+
+    async def send(self, line: str):
+        if self.transport == "fake":
+            self.reader.feed(f"{line}\n".encode('utf-8'))
+        else:
+            self.writer.write(f"{line}\n".encode('utf-8'))
+            await self.writer.drain()
+
+    async def settle(self):
+        # Give the server handler a chance to process everything queued so far
+        for _ in range(4):
+            await asyncio.sleep(0)
+
+    async def disconnect(self, abrupt: bool):
+        if self.transport == "fake":
+            if abrupt:
+                self.reader.feed(ConnectionResetError("soak: abrupt disconnect"))
+            else:
+                self.reader.feed_eof()
+            await self.task
+            return
+        if abrupt:
+            self.writer.transport.abort()
+        else:
+            self.writer.close()
+        await self.task
+        # Wait until the server side has run its cleanup for this session
+        while self.name in server_async.clients_by_name:
+            await asyncio.sleep(0.001)
+
+
+def registry_counts() -> Dict[str, int]:
+    counts = {name: len(getattr(server_async, name)) for name in REGISTRIES}
+    counts['group_memberships'] = sum(len(members) for members in server_async.groups.values())
+    counts['dead_chat_partner_refs'] = sum(
+        1 for info in server_async.client_info.values()
+        if info.get('chat_partner') is not None and info['chat_partner'] not in server_async.connected_clients)
+    counts['dead_client_chats_refs'] = sum(
+        1 for target in server_async.client_chats.values() if target not in server_async.connected_clients)
+    return counts
+
+
+def open_fd_count() -> Optional[int]:
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+class SoakRunner:
+    """Runs connect/register/chat/join/disconnect cycles and samples server state."""
+
+    def __init__(self, transport: str = "fake", anchors: int = 4, group_pool: int = 8, concurrency: int = 32):
+        self.transport = transport
+        self.anchor_count = anchors
+        self.group_pool = group_pool
+        self.concurrency = concurrency
+        self.port = None
+        self.anchors: List[SoakSession] = []
+        self.live_writers = weakref.WeakSet()
+        self.samples: List[dict] = []
+
+    async def _setup(self):
+        if self.transport == "tcp":
+            self._server = await asyncio.start_server(server_async.handle_client, '127.0.0.1', 0)
+            self.port = self._server.sockets[0].getsockname()[1]
+        for i in range(self.anchor_count):
+            anchor = SoakSession(f"soak_anchor_{i}", self.transport, self.port, self.live_writers)
+            await anchor.start()
+            self.anchors.append(anchor)
+        # Anchors keep the group pool alive for the whole run
+        for g in range(self.group_pool):
+            await self.anchors[g % len(self.anchors)].send(f"CREATE_GROUP:soak_group_{g}")
+        await self.anchors[0].settle()
+
+    async def _cycle(self, n: int):
+        session = SoakSession(f"soak_{n}", self.transport, self.port, self.live_writers)
+        anchor = self.anchors[n % len(self.anchors)]
+        await session.start()
+        await session.send(f"JOIN_GROUP:soak_group_{n % self.group_pool}")
+        await session.send(f"CONNECT:{anchor.name}")
+        await session.settle()
+        await session.send(f"direct message {n}")
+        await session.send(f"GROUP:soak_group_{n % self.group_pool}:group message {n}")
+        # Point the anchor back at this session so its chat_partner references the writer being dropped
+        await anchor.send(f"CONNECT:{session.name}")
+        await session.settle()
+        if n % 3 == 0:
+            await session.send(f"CREATE_GROUP:soak_private_{n}")
+        await session.settle()
+        await session.disconnect(abrupt=(n % 2 == 0))
+
+    def _sample(self, cycles_done: int, started: float):
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        sample = {
+            'cycles': cycles_done,
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+            'traced_memory_kb': round(current / 1024, 1),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'live_server_writers': len(self.live_writers),
+            'open_fds': open_fd_count(),
+            'registries': registry_counts(),
+            'fanout': dict(server_async.fanout_stats),
+        }
+        self.samples.append(sample)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {cycles_done:>9} cycles | "
+              f"mem {sample['traced_memory_kb']:>10.1f} KB | clients {sample['registries']['client_info']} | "
+              f"groups {sample['registries']['groups']} | chats {sample['registries']['client_chats']}",
+              file=sys.stderr)
+        return sample
+
+    async def run(self, cycles: int, sample_every: int) -> dict:
+        tracemalloc.start()
+        started = time.monotonic()
+        await self._setup()
+        baseline_snapshot = None
+        done = 0
+        while done < cycles:
+            batch = min(self.concurrency, cycles - done)
+            results = await asyncio.gather(*(self._cycle(done + i) for i in range(batch)), return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException):
+                    raise result
+            done += batch
+            if done % sample_every < batch or done == cycles:
+                self._sample(done, started)
+                if baseline_snapshot is None:
+                    baseline_snapshot = tracemalloc.take_snapshot()
+        final_snapshot = tracemalloc.take_snapshot()
+        top_growth = [
+            {'location': str(stat.traceback[0]), 'size_diff_kb': round(stat.size_diff / 1024, 1),
+             'count_diff': stat.count_diff}
+            for stat in final_snapshot.compare_to(baseline_snapshot, 'lineno')[:10]
+        ] if baseline_snapshot is not None else []
+        tracemalloc.stop()
+
+        for anchor in self.anchors:
+            await anchor.disconnect(abrupt=False)
+        if self.transport == "tcp":
+            self._server.close()
+            await self._server.wait_closed()
+        return {'samples': self.samples, 'top_memory_growth': top_growth}
+
+
+def evaluate(samples: List[dict], max_memory_growth_kb: float, anchors: int, group_pool: int) -> List[str]:
+    """Return a list of failure descriptions for structures that kept growing."""
+    failures = []
+    if len(samples) < 2:
+        return failures
+    first, last = samples[0], samples[-1]
+    expected_max = {
+        'connected_clients': anchors, 'client_info': anchors, 'clients_by_name': anchors,
+        'client_groups': anchors, 'client_rate_limits': anchors, 'client_chats': anchors, 'sessions': anchors,
+        'groups': group_pool, 'group_memberships': group_pool,
+        'dead_chat_partner_refs': 0, 'dead_client_chats_refs': 0,
+    }
+    for name, limit in expected_max.items():
+        if last['registries'][name] > limit:
+            failures.append(f"{name} holds {last['registries'][name]} entries after all sessions ended (expected <= {limit})")
+    if last['registries']['message_log'] > (server_async.message_log.maxlen or float('inf')):
+        failures.append(f"message_log exceeds its bound of {server_async.message_log.maxlen}")
+    if last['live_server_writers'] > first['live_server_writers']:
+        failures.append(f"{last['live_server_writers'] - first['live_server_writers']} StreamWriter objects are still referenced")
+    if first['open_fds'] is not None and last['open_fds'] is not None and last['open_fds'] > first['open_fds'] + 2:
+        failures.append(f"open file descriptors grew from {first['open_fds']} to {last['open_fds']}")
+    # Compare the second half of the run against the first sample taken after warm-up
+    midpoint = samples[len(samples) // 2]
+    growth = last['traced_memory_kb'] - midpoint['traced_memory_kb']
+    if growth > max_memory_growth_kb:
+        failures.append(f"traced memory grew {growth:.1f} KB over the second half of the run "
+                        f"(limit {max_memory_growth_kb} KB)")
+    return failures
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Soak test the async server for leaks across connect/disconnect cycles")
+    parser.add_argument("--cycles", type=int, default=20000, help="Number of client lifecycles (use millions for a full soak)")
+    parser.add_argument("--transport", choices=("fake", "tcp"), default="fake",
+                        help="fake: in-memory streams (fast); tcp: real loopback sockets")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--anchors", type=int, default=4, help="Long-lived clients the cycling sessions chat with")
+    parser.add_argument("--groups", type=int, default=8)
+    parser.add_argument("--sample-every", type=int, default=2000)
+    parser.add_argument("--message-log-bound", type=int, default=1000)
+    parser.add_argument("--max-memory-growth-kb", type=float, default=512.0)
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args(argv)
+
+    runner = SoakRunner(args.transport, args.anchors, args.groups, args.concurrency)
+    saved_log = server_async.message_log
+    # Use a small bound so the log reaches steady state early instead of reading as growth
+    server_async.message_log = deque(maxlen=args.message_log_bound)
+    try:
+        with quiet_server(server_async):
+            result = asyncio.run(runner.run(args.cycles, args.sample_every))
+    finally:
+        server_async.message_log = saved_log
+    failures = evaluate(result['samples'], args.max_memory_growth_kb, args.anchors, args.groups)
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'cycles': args.cycles,
+        'transport': args.transport,
+        'passed': not failures,
+        'failures': failures,
+        **result,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({'passed': report['passed'], 'failures': failures,
+                      'final': result['samples'][-1] if result['samples'] else None}, indent=2))
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,6 @@
 import socket
-import csv
+
+from utils.csv_source import CsvSource
 
 HOST = "192.168.0.106"
 PORT = 10000
@@ -15,17 +16,14 @@ def start_client():
         welcome = client_socket.recv(1024).decode('utf-8')
         print(f"Server says: {welcome}")
         
-        with open(CSV_FILE, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                if row['src_app'] == 'client_browser' and row['dst_app'] == 'web_server':
-                    message = row['message']
-                    print(f"Sending: {message}")
-                    
-                    client_socket.sendall((message + '\n').encode('utf-8'))
-                    
-                    response = client_socket.recv(1024).decode('utf-8')
-                    print(f"Server response: {response}")
+        for item in CsvSource(CSV_FILE):
+            message = item.message
+            print(f"Sending: {message}")
+            
+            client_socket.sendall((message + '\n').encode('utf-8'))
+            
+            response = client_socket.recv(1024).decode('utf-8')
+            print(f"Server response: {response}")
             
     except ConnectionRefusedError:
         print("Connection failed: Server is not responding.")
@@ -0,0 +1,218 @@
+import math
+import time
+import tkinter as tk
+from collections import namedtuple
+from datetime import datetime
+from tkinter import ttk
+from typing import Callable, List, Optional
+
+from utils.metrics import TimeSeries
+from gui.theme import COLORS, FONTS
+
+# One chart: its title, unit and the sampler called once per tick (None: no sample this tick)
+ChartSeries = namedtuple("ChartSeries", ["title", "unit", "sample"])
+
+SERIES_COLORS = [COLORS['accent_primary'], COLORS['accent_green'], COLORS['text_warning'], COLORS['text_error']]
+
+
+def load_matplotlib():
+    """Import the Tk backend on first use; None when matplotlib is not installed."""
+    try:
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    except ImportError:
+        return None
+    return Figure, FigureCanvasTkAgg
+
+
+def per_second(read_total: Callable[[], float]) -> Callable[[], Optional[float]]:
+    """Sampler turning a growing counter into its rate since the previous sample.
+
+    `read_total` may return None while the counter is unavailable.
+    """
+    last = [None, None]     # total, time
+
+    def sample():
+        total, now = read_total(), time.monotonic()
+        previous, then = last
+        last[:] = total, now
+        if total is None or previous is None or now <= then or total < previous:
+            return None
+        return (total - previous) / (now - then)
+    return sample
+
+
+def per_event(read_sum: Callable[[], float], read_count: Callable[[], int],
+              scale: float = 1.0) -> Callable[[], Optional[float]]:
+    """Sampler for the mean of the values added to a running sum since the previous sample.
+
+    None when no event happened in between, so quiet periods leave a gap
+    instead of repeating a stale value.
+    """
+    last = [None, None]     # sum, count
+
+    def sample():
+        total, count = read_sum(), read_count()
+        previous_total, previous_count = last
+        last[:] = total, count
+        if count is None or previous_count is None or count <= previous_count:
+            return None
+        return (total - previous_total) / (count - previous_count) * scale
+    return sample
+
+
+def _axis_top(value: float) -> float:
+    """The smallest 1/2/5 x 10^k at or above 1.2 * value, so the line has headroom."""
+    target = max(value * 1.2, 1.0)
+    magnitude = 10 ** math.floor(math.log10(target))
+    for step in (1, 2, 5, 10):
+        if step * magnitude >= target:
+            return step * magnitude
+    return 10 * magnitude
+
+
+class ChartRecorder:
+    """Samples every series once per interval into a fixed-size ring buffer.
+
+    Recording runs on a Tk timer from start() on, whether or not a chart is
+    shown, so an opened chart has the recent past. Attached LiveCharts views
+    are rendered after every sample.
+    """
+
+    def __init__(self, root, series: List[ChartSeries], history_seconds: int, interval_ms: int):
+        self.root = root
+        self.series = series
+        self.interval_ms = interval_ms
+        self.history_seconds = history_seconds
+        capacity = max(2, history_seconds * 1000 // interval_ms)
+        self.data = [TimeSeries(capacity) for _ in series]
+        self.views: List['LiveCharts'] = []
+        self._timer = None
+
+    def start(self):
+        if self._timer is None:
+            self._timer = self.root.after(self.interval_ms, self._tick)
+
+    def stop(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def sample(self):
+        now = time.monotonic()
+        for series, data in zip(self.series, self.data):
+            try:
+                value = series.sample()
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Error sampling {series.title}: {e}")
+                value = None
+            data.append(now, math.nan if value is None else float(value))
+        for view in list(self.views):
+            view.render(now)
+
+    def _tick(self):
+        self.sample()
+        self._timer = self.root.after(self.interval_ms, self._tick)
+
+
+class LiveCharts:
+    """Line charts of a ChartRecorder's series, updated by blitting.
+
+    Axes, grid and labels are drawn once and cached as the background of
+    each chart. A tick restores the cached background and draws only the
+    lines and value readouts; a full draw happens only when a value outgrows
+    its axis (or shrinks well below it) and when the panel is resized.
+    Without matplotlib the panel shows the latest values as text instead.
+    """
+
+    def __init__(self, parent, recorder: ChartRecorder):
+        self.parent = parent
+        self.recorder = recorder
+        self.canvas = None
+        self.last_render_ms = 0.0
+        self._backgrounds = None
+        backend = load_matplotlib()
+        if backend is None:
+            ttk.Label(parent, text="Install matplotlib for live charts (pip install matplotlib)",
+                      font=FONTS['default']).pack(anchor=tk.W, padx=5, pady=5)
+            self._labels = []
+            for series in recorder.series:
+                label = ttk.Label(parent, text=f"{series.title}: -", font=FONTS['default'])
+                label.pack(anchor=tk.W, padx=5)
+                self._labels.append(label)
+        else:
+            self._create_figure(*backend)
+        recorder.views.append(self)
+        self.render(time.monotonic())
+
+    def _create_figure(self, Figure, FigureCanvasTkAgg):
+        series = self.recorder.series
+        self.figure = Figure(figsize=(6, 1.5 * len(series)), dpi=100, facecolor=COLORS['bg_panel'])
+        self.axes = list(self.figure.subplots(len(series), 1, sharex=True, squeeze=False)[:, 0])
+        self.lines = []
+        self.readouts = []
+        for index, (ax, item) in enumerate(zip(self.axes, series)):
+            ax.set_facecolor(COLORS['bg_secondary'])
+            ax.set_xlim(-self.recorder.history_seconds, 0)
+            ax.set_ylim(0, 1)
+            ax.set_title(f"{item.title} ({item.unit})", loc='left', fontsize=9, color=COLORS['text_primary'])
+            ax.tick_params(colors=COLORS['text_secondary'], labelsize=8)
+            ax.grid(True, color=COLORS['border_medium'], linewidth=0.5)
+            for spine in ax.spines.values():
+                spine.set_color(COLORS['border_light'])
+            # Animated artists are left out of full draws and drawn by render() on top of the background
+            line, = ax.plot([], [], color=SERIES_COLORS[index % len(SERIES_COLORS)], linewidth=1.5, animated=True)
+            readout = ax.text(0.99, 0.85, "", transform=ax.transAxes, ha='right', fontsize=9,
+                              color=COLORS['text_primary'], animated=True)
+            self.lines.append(line)
+            self.readouts.append(readout)
+        self.axes[-1].set_xlabel("seconds ago", color=COLORS['text_secondary'], fontsize=8)
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self.parent)
+        self.figure.tight_layout()
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _on_draw(self, event):
+        # A full draw (first paint, resize, rescale): cache the new backgrounds and put the lines back
+        self._backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        self._blit()
+
+    def _blit(self):
+        for ax, line, readout, background in zip(self.axes, self.lines, self.readouts, self._backgrounds):
+            self.canvas.restore_region(background)
+            ax.draw_artist(line)
+            ax.draw_artist(readout)
+            self.canvas.blit(ax.bbox)
+
+    def render(self, now: float):
+        started = time.perf_counter()
+        if self.canvas is None:
+            for label, series, data in zip(self._labels, self.recorder.series, self.recorder.data):
+                value = data.latest()
+                label.config(text=f"{series.title}: {'-' if math.isnan(value) else f'{value:.1f}'} {series.unit}")
+            self.last_render_ms = (time.perf_counter() - started) * 1000
+            return
+        if not self.canvas.get_tk_widget().winfo_viewable():
+            return
+
+        rescale = False
+        for ax, line, readout, data in zip(self.axes, self.lines, self.readouts, self.recorder.data):
+            times, values = data.points()
+            line.set_data([t - now for t in times], values)
+            latest = data.latest()
+            readout.set_text("-" if math.isnan(latest) else f"{latest:.1f}")
+            peak = max((v for v in values if not math.isnan(v)), default=0.0)
+            top = ax.get_ylim()[1]
+            if peak > top or (top > 1 and peak < top / 4):
+                ax.set_ylim(0, _axis_top(peak))
+                rescale = True
+
+        if rescale or self._backgrounds is None:
+            self.canvas.draw()      # _on_draw blits the lines
+        else:
+            self._blit()
+        self.last_render_ms = (time.perf_counter() - started) * 1000
+
+    def detach(self):
+        if self in self.recorder.views:
+            self.recorder.views.remove(self)
@@ -1,34 +1,46 @@
+import time
+IMPORTS_STARTED = time.perf_counter()  # For --profile-startup
+
+import argparse
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
-import asyncio
-import threading
-import csv
-import time
+from collections import deque
 from datetime import datetime
 import sys
 import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import async_impl.client_async as client_async
+from async_impl.chat_client import ChatClient
+from utils import config
+from utils.metrics import ThroughputCounter
+from async_impl.protocol import (ChatClosed, ChatOpened, DirectMessage, Error, GroupList, GroupMessage, GroupUpdated,
+                                 Notice, UserConnected, UserDisconnected, UserList)
 
 from gui.theme import COLORS, FONTS
-
-try:
-    from playsound import playsound
-    SOUND_AVAILABLE = True
-except ImportError:
-    SOUND_AVAILABLE = False
-    print("Warning: playsound not installed. Sound notifications will be disabled.")
-    print("Install with: pip install playsound")
+from gui.charts import ChartRecorder, ChartSeries, LiveCharts, per_event, per_second
+from gui.network import EventBridge, NetworkThread
+from gui.notifications import Notifier
+from gui.sorted_listbox import SortedListbox
+from gui.history import SEARCH_PAGE_SIZE, ChatHistory, store_path_for
 
 SOUND_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Icq old sound.mp3")
 
 CONNECTION_TIMEOUT = 30.0
-AUTO_REFRESH_INTERVAL_MS = 5000
+# push: keep users/groups current from server notifications; poll: re-list every AUTO_REFRESH_INTERVAL_MS
+PRESENCE_MODE, AUTO_REFRESH_INTERVAL_MS = config.get_presence_settings()
+HISTORY_DIR, HISTORY_MEMORY_LINES, HISTORY_FLUSH_INTERVAL = config.get_history_settings()
+CHART_HISTORY_SECONDS, CHART_INTERVAL_MS = config.get_chart_settings()
 GROUPS_LIST_DELAY_MS = 100
 CHAT_OPEN_DELAY_MS = 50
 GROUPS_UPDATE_DELAY_MS = 200
 DEBOUNCE_DELAY_MS = 300
+CLOSE_TIMEOUT = 1.0          # Seconds the window waits for the session to end on the server
+CHAT_VIEW_LINES = 200        # Lines rendered when a chat is opened
+CHAT_PAGE_LINES = 100        # Lines loaded per scroll step
+CHAT_VIEW_MAX_LINES = 1000   # Lines kept in the Text widget before trimming the far end
+CSV_PROGRESS_INTERVAL_MS = 200  # How often the CSV window shows the replay's progress
+CSV_RATE_WINDOW = 2             # Seconds averaged by the live msgs/s readout
 
 
 class ClientGUI:
@@ -47,17 +59,34 @@ class ClientGUI:
         self.connected = False
         self.sending_messages = False
         self.csv_file = None
-        self.connection_reader = None
-        self.connection_writer = None
-        self.connection_loop = None
+        # The running CSV replay; the network thread only stores its latest progress
+        self._csv_window = None
+        self._csv_future = None
+        self._csv_timer = None
+        self._csv_progress = None
+        self._csv_last_rtt = None
+        self._csv_acked_seen = 0
+        self._csv_throughput = ThroughputCounter(CSV_RATE_WINDOW + 2)
+        # The session's ChatClient, used on the network loop only. Its resumable
+        # connection holds commands sent while it reconnects and resends them
+        self.chat = None
+        self._chat_closing = None
         self.client_name = ""
+        self._user_disconnect = False
         
-        self.chat_history = {}
+        # The user's message store, open while connected; recent lines stay in memory
+        self.history = None
+        self._reset_chat_view()
+        self._search_window = None
+        self._search_hits = []
+        self._search_query = ""
+        self._search_timer = None
         
         self.current_chat_target = None
         self.current_chat_is_group = False
         
-        self.sound_enabled = True
+        # One sound worker for the session; bursts share a sound
+        self.notifier = Notifier(SOUND_FILE)
         
         self.auto_refresh_enabled = True
         
@@ -78,34 +107,36 @@ class ClientGUI:
         self._groups_listbox_update_pending = False
         self._groups_listbox_update_timer = None
         
+        # One network loop for the whole session; its results reach Tk once per frame
+        self.network = NetworkThread()
+        self.bridge = EventBridge(self.root)
+        self.bridge.start()
+        
         self.style = ttk.Style()
         self.configure_ttk_styles()
         
+        # Lines received and commands sent on the chat session, for the messages/s chart
+        self._session_messages = 0
+        self._charts_window = None
+        self.charts = ChartRecorder(self.root, [
+            ChartSeries("Messages", "msgs/s", per_second(lambda: self._session_messages + client_async.message_counts['sent']
+                                                         + client_async.message_counts['received'])),
+            ChartSeries("Connected clients", "clients", lambda: len(self.users) if self.connected else None),
+            ChartSeries("Group fan-out", "recipients/msg", self._largest_group_fanout),
+            ChartSeries("RTT", "ms", per_event(lambda: client_async.latency_histogram.total,
+                                               lambda: client_async.latency_histogram.count, scale=1000.0)),
+        ], CHART_HISTORY_SECONDS, CHART_INTERVAL_MS)
+        
         self.create_widgets()
+        self.charts.start()
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
         
-
-        self.root.update_idletasks()
-
-        self.root.geometry("")
+        # One layout pass for the requested size; the window is at least that
+        # big, so the buttons row always fits and no second pass is needed
         self.root.update_idletasks()
-
         req_width = max(900, self.root.winfo_reqwidth() + 20)
         req_height = max(700, self.root.winfo_reqheight() + 20)
         self.root.geometry(f"{req_width}x{req_height}")
-        self.root.update_idletasks()
-        
-
-        try:
-            buttons_y = self.buttons_frame.winfo_y()
-            window_height = self.root.winfo_height()
-            buttons_height = self.buttons_frame.winfo_reqheight()
-            if buttons_y + buttons_height > window_height:
-
-                new_height = buttons_y + buttons_height + 50
-                self.root.geometry(f"{req_width}x{new_height}")
-                self.root.update_idletasks()
-        except:
-            pass
     
     def configure_ttk_styles(self):
         self.style.configure('Primary.TButton',
@@ -294,6 +325,7 @@ class ClientGUI:
                                         yscrollcommand=scrollbar_users.set)
         self.users_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar_users.config(command=self.users_listbox.yview)
+        self.users_view = SortedListbox(self.users_listbox)
         
         self.users_listbox.bind("<<ListboxSelect>>", lambda e: self.on_user_selected())
         
@@ -332,6 +364,7 @@ class ClientGUI:
                                          yscrollcommand=scrollbar_groups.set)
         self.groups_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         scrollbar_groups.config(command=self.groups_listbox.yview)
+        self.groups_view = SortedListbox(self.groups_listbox)
         
         self.groups_listbox.bind("<<ListboxSelect>>", lambda e: self.on_group_selected())
         self.groups_listbox.bind("<Double-Button-1>", lambda e: self.open_group_chat())
@@ -382,7 +415,7 @@ class ClientGUI:
                                                         font=FONTS['medium'], relief=tk.FLAT, borderwidth=1,
                                                         insertbackground=COLORS['text_primary'])
         self.main_chat_text.pack(fill=tk.BOTH, expand=True)
-        self.main_chat_text.config(state=tk.DISABLED)
+        self.main_chat_text.config(state=tk.DISABLED, yscrollcommand=self._on_chat_scroll)
         
         chat_input_frame = tk.Frame(chat_tab, bg=COLORS['chat_bg'], pady=5)
         chat_input_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -404,13 +437,45 @@ class ClientGUI:
         
         ttk.Button(self.buttons_frame, text="Clear Messages", command=self.clear_messages,
                   style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.buttons_frame, text="Search", command=self.show_search_window,
+                  style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
+        self.mute_btn = ttk.Button(self.buttons_frame, text="Mute Chat", command=self.toggle_mute_current_chat,
+                                   style='Secondary.TButton')
+        self.mute_btn.pack(side=tk.LEFT, padx=5)
+        self.root.bind("<Control-f>", lambda e: self.show_search_window())
         ttk.Button(self.buttons_frame, text="Export Logs", command=self.export_logs,
                   style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
         ttk.Button(self.buttons_frame, text="CSV Options", command=self.show_csv_menu,
                   style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(self.buttons_frame, text="Charts", command=self.show_charts_window,
+                  style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
         
+    def _largest_group_fanout(self):
+        """Recipients of a message to the largest group this client is in."""
+        if not self.connected:
+            return None
+        return max((len(members) - 1 for members in self.groups.values() if self.client_name in members), default=None)
+
+    def show_charts_window(self):
+        """Open the live charts; they show what was recorded since startup."""
+        if self._charts_window is not None and self._charts_window.winfo_exists():
+            self._charts_window.lift()
+            return
+        window = self._charts_window = tk.Toplevel(self.root)
+        window.title("Live Charts")
+        window.configure(bg=COLORS['bg_main'])
+        view = LiveCharts(window, self.charts)
+
+        def close():
+            view.detach()
+            window.destroy()
+        window.protocol("WM_DELETE_WINDOW", close)
+
     def show_csv_menu(self):
-        csv_window = tk.Toplevel(self.root)
+        if self._csv_window is not None and self._csv_window.winfo_exists():
+            self._csv_window.lift()
+            return
+        csv_window = self._csv_window = tk.Toplevel(self.root)
         csv_window.title("CSV File Options")
         csv_window.minsize(400, 200)
         csv_window.resizable(True, True)
@@ -418,7 +483,8 @@ class ClientGUI:
         csv_frame = ttk.LabelFrame(csv_window, text="CSV File", padding=10)
         csv_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
-        self.csv_label = ttk.Label(csv_frame, text="No CSV file selected")
+        self.csv_label = ttk.Label(csv_frame, text=f"CSV: {os.path.basename(self.csv_file)}"
+                                   if self.csv_file else "No CSV file selected")
         self.csv_label.pack(pady=10)
         
         btn_frame = tk.Frame(csv_frame)
@@ -430,10 +496,22 @@ class ClientGUI:
         ttk.Button(btn_frame, text="Send All Messages", command=self.send_all_messages,
                   style='Secondary.TButton').pack(side=tk.LEFT, padx=5)
         
+        self.csv_cancel_btn = ttk.Button(btn_frame, text="Cancel", command=self.cancel_csv_send,
+                                         style='Secondary.TButton', state=tk.DISABLED)
+        self.csv_cancel_btn.pack(side=tk.LEFT, padx=5)
+        
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(csv_frame, variable=self.progress_var, maximum=100)
         self.progress_bar.pack(fill=tk.X, pady=10, padx=10)
         
+        self.csv_status_label = ttk.Label(csv_frame, text="")
+        self.csv_status_label.pack(pady=2)
+        self.csv_rate_label = ttk.Label(csv_frame, text="")
+        self.csv_rate_label.pack(pady=2)
+        
+        if self.sending_messages:
+            self.csv_cancel_btn.config(state=tk.NORMAL)
+            self._render_csv_progress()
 
         csv_window.update_idletasks()
 
@@ -452,7 +530,7 @@ class ClientGUI:
         if filename:
             self.csv_file = filename
             if hasattr(self, 'csv_label'):
-                self.csv_label.config(text=f"CSV: {filename.split('/')[-1]}")
+                self.csv_label.config(text=f"CSV: {os.path.basename(filename)}")
 
     def connect(self):
         """Establish connection to the chat server.
@@ -474,80 +552,56 @@ class ClientGUI:
             client_async.HOST = host
             client_async.PORT = port
             
-            def connect_async():
-                try:
-                    self.connection_loop = asyncio.new_event_loop()
-                    asyncio.set_event_loop(self.connection_loop)
-                    
-                    async def do_connect():
-                        self.connection_reader, self.connection_writer = await asyncio.open_connection(host, port)
-                        try:
-                            welcome_data = await asyncio.wait_for(self.connection_reader.read(4096), timeout=CONNECTION_TIMEOUT)
-                        except asyncio.TimeoutError:
-                            self.root.after(0, lambda: self._set_connected(False))
-                            return
-                        welcome = welcome_data.decode('utf-8').strip()
-                        
-                        name_with_newline = self.client_name + '\n'
-                        self.connection_writer.write(name_with_newline.encode('utf-8'))
-                        await self.connection_writer.drain()
-                        
-                        try:
-                            name_response_data = await asyncio.wait_for(self.connection_reader.read(4096), timeout=CONNECTION_TIMEOUT)
-                        except asyncio.TimeoutError:
-                            self.root.after(0, lambda: self._set_connected(False))
-                            return
-                        name_response = name_response_data.decode('utf-8').strip()
-                        
-                        if "ERROR" in name_response:
-                            self.root.after(0, lambda: messagebox.showerror("Error", name_response))
-                            self.root.after(0, lambda: self._set_connected(False))
-                            return
-                        
-                        self.root.after(0, lambda: self._set_connected(True))
-                        self.root.after(0, lambda: self.refresh_users_visual())
-                        self.root.after(GROUPS_LIST_DELAY_MS, lambda: self.list_groups_visual())
-                        self.root.after(0, lambda: self.start_auto_refresh())
-                        
-                        async def read_messages():
-                            buffer = ""
-                            try:
-                                while True:
-                                    try:
-                                        data = await self.connection_reader.read(4096)
-                                    except Exception as e:
-                                        break
-                                    if not data:
-                                        break
-                                    buffer += data.decode('utf-8')
-
-                                    while '\n' in buffer:
-                                        line, buffer = buffer.split('\n', 1)
-                                        message = line.strip()
-                                        if message:
-
-                                            if message != "LIST_USERS" and message != "LIST_GROUPS":
-                                                self.root.after(0, lambda msg=message: self.handle_received_message(msg))
-                            except Exception as e:
-                                self.root.after(0, lambda: self._set_connected(False))
-                        
-                        asyncio.create_task(read_messages())
-                        
-                    self.connection_loop.run_until_complete(do_connect())
-                    try:
-                        self.connection_loop.run_forever()
-                    except Exception:
-                        pass
-                except Exception as e:
-                    error_msg = str(e)
-                    self.root.after(0, lambda msg=error_msg: messagebox.showerror("Error", f"Connection failed: {msg}"))
-                    self.root.after(0, lambda: self._set_connected(False))
-            
-            threading.Thread(target=connect_async, daemon=True).start()
+            self._user_disconnect = False
+            self._open_history()
+            self.network.submit(self._connect_async(host, port))
 
         except Exception as e:
             messagebox.showerror("Error", f"Connection failed: {e}")
 
+    async def _connect_async(self, host, port):
+        chat = ChatClient(host, port, on_state_change=self._on_connection_state)
+        chat.on(None, self._dispatch_event)
+        try:
+            # Registers the session and loads the user and group lists
+            await chat.connect(self.client_name)
+        except Exception as e:
+            await chat.close()
+            self.bridge.post(messagebox.showerror, "Error", f"Connection failed: {e}")
+            self.bridge.post(self._set_connected, False)
+            return
+        self.chat = chat
+        
+        self.bridge.post(self._set_connected, True)
+        self.bridge.post(self.start_auto_refresh)
+
+    def _dispatch_event(self, event):
+        # Runs on the network loop for every event the ChatClient parses
+        if not self._user_disconnect:
+            self.bridge.post(self.handle_event, event)
+
+    def _on_connection_state(self, state):
+        # Runs on the network loop; the ChatClient reconnects and resends by itself
+        if self._user_disconnect:
+            return
+        if state == 'reconnecting':
+            self.bridge.post(self._set_reconnecting, True)
+        elif state == 'failed':
+            self.bridge.post(messagebox.showerror, "Error", "Connection lost and could not be re-established")
+            self.bridge.post(self._set_connected, False)
+        else:
+            # Resumed or registered again: notifications may have been missed meanwhile
+            self.bridge.post(self._set_reconnecting, False)
+            self.bridge.post(self.resync_presence)
+
+    def _set_reconnecting(self, status: bool):
+        if not self.connected:
+            return
+        if status:
+            self.status_label.config(text="● Reconnecting...", fg=COLORS['status_connecting'])
+        else:
+            self.status_label.config(text="● Connected", fg=COLORS['status_online'])
+
     def _set_connected(self, status: bool):
         self.connected = status
         if status:
@@ -564,20 +618,13 @@ class ClientGUI:
         if self.connected and self.current_chat_target and not self.current_chat_is_group:
             self.send_command_safe("DISCONNECT_CHAT")
         
-        if self.connection_writer and not self.connection_writer.is_closing():
-            try:
-                self.connection_writer.close()
-            except:
-                pass
-        
-        if self.connection_loop and self.connection_loop.is_running():
-            try:
-                tasks = [task for task in asyncio.all_tasks(self.connection_loop) if not task.done()]
-                for task in tasks:
-                    task.cancel()
-                self.connection_loop.call_soon_threadsafe(self.connection_loop.stop)
-            except:
-                pass
+        self._user_disconnect = True
+        # The network loop keeps running; only this connection's tasks end.
+        # Closing sends END_SESSION, so the server does not hold the session
+        if self.chat is not None:
+            self._chat_closing = self.network.submit(self.chat.close())
+            self.chat = None
+        self.bridge.clear()
         
         self.auto_refresh_enabled = False
         
@@ -602,9 +649,6 @@ class ClientGUI:
         self._groups_listbox_update_pending = False
         
         self._set_connected(False)
-        self.connection_reader = None
-        self.connection_writer = None
-        self.connection_loop = None
         self.client_name = ""
         
         self.current_chat_target = None
@@ -614,7 +658,8 @@ class ClientGUI:
         self.my_groups = set()
         self.pending_group_selection = None
         
-        self.chat_history = {}
+        self._close_history()
+        self._reset_chat_view()
         
         self.main_chat_text.config(state=tk.NORMAL)
         self.main_chat_text.delete(1.0, tk.END)
@@ -668,6 +713,11 @@ class ClientGUI:
         if not self.connected or not self.auto_refresh_enabled:
             return
         
+        if PRESENCE_MODE == "push":
+            # Pushed events keep the lists current from here on
+            self.resync_presence()
+            return
+        
         if not self.sending_messages:
 
             if not self._refresh_pending:
@@ -677,6 +727,72 @@ class ClientGUI:
         
         self.root.after(AUTO_REFRESH_INTERVAL_MS, self.start_auto_refresh)
 
+    def resync_presence(self):
+        """Fetch the full users and groups lists, replacing the local state."""
+        self.refresh_users_visual(force=True)
+        self.root.after(GROUPS_LIST_DELAY_MS, lambda: self.list_groups_visual(force=True))
+
+    def _apply_presence(self, event):
+        """Apply a pushed presence event to `users`/`groups`.
+        
+        An event that does not fit the local state (a membership change in a
+        group we never heard of) means a notification was missed, so a full
+        resync is requested instead.
+        
+        Returns:
+            True if the message needs no further handling
+        """
+        if isinstance(event, UserConnected):
+            name = event.name
+            if name and name != self.client_name:
+                self.users[name] = {'name': name}
+                self.update_users_listbox()
+                if self.current_chat_target == name and not self.current_chat_is_group:
+                    self.add_message_to_main_chat("System", f"{name} is now online")
+                    self._update_chat_ui_for_connect()
+                    self._establish_chat_connection(name)
+            return True
+        
+        if isinstance(event, UserDisconnected):
+            self.users.pop(event.name, None)
+            for group_name in list(self.groups):
+                members = self.groups[group_name]
+                if event.name in members:
+                    members.remove(event.name)
+                    if not members:
+                        del self.groups[group_name]
+            self.update_users_listbox()
+            self.update_groups_listbox()
+            if self.current_chat_target == event.name and not self.current_chat_is_group:
+                self._update_chat_ui_for_disconnect()
+            return True
+        
+        if isinstance(event, GroupUpdated):
+            if event.user == self.client_name and event.action in ('created', 'added'):
+                return False  # handled below, which also opens the group chat
+            if event.action == 'created':
+                self.groups.setdefault(event.group, [event.user] if event.user else [])
+            elif event.group not in self.groups:
+                self.list_groups_visual()
+                return True
+            elif event.action == 'left':
+                members = self.groups[event.group]
+                if event.user in members:
+                    members.remove(event.user)
+                if not members:
+                    del self.groups[event.group]
+            elif event.user not in self.groups[event.group]:
+                self.groups[event.group].append(event.user)
+            if event.user and event.user != self.client_name and event.user not in self.users:
+                self.refresh_users_visual()
+            self.update_groups_listbox()
+            return True
+        
+        if isinstance(event, Notice) and "older messages were dropped" in event.text:
+            # The resumed session lost notifications too
+            self.resync_presence()
+        return False
+
     def list_groups_visual(self, force=False):
         """Request updated groups list from server.
         
@@ -715,19 +831,22 @@ class ClientGUI:
         self._groups_refresh_pending = False
 
     async def send_command_async(self, command):
-        """Send a command to the server asynchronously.
+        """Send a command to the server and wait for its reply.
+        
+        The reply's events reach the GUI through the ChatClient, so the reply
+        itself is not needed here.
         
         Args:
             command: The command string to send (without newline)
         """
+        chat = self.chat
+        if chat is None:
+            return
         try:
-            if not self.connection_writer or self.connection_writer.is_closing():
-                return
-            message_with_newline = command + '\n'
-            self.connection_writer.write(message_with_newline.encode('utf-8'))
-            await self.connection_writer.drain()
-        except Exception as e:
-
+            await chat.request(command)
+        except Exception:
+            # An ERROR reply already reached _on_error as an event, and a lost
+            # connection is reported through _on_connection_state
             pass
     
     def send_command_safe(self, command):
@@ -736,21 +855,20 @@ class ClientGUI:
         Args:
             command: The command string to send
         """
-        if not self.connected or not self.connection_writer or self.connection_writer.is_closing():
+        if not self.connected:
             return
         
         try:
-            asyncio.run_coroutine_threadsafe(
-                self.send_command_async(command), self.connection_loop)
+            self.network.submit(self.send_command_async(command))
+            self._session_messages += 1
         except:
             pass
 
     def on_user_selected(self):
-        selection = self.users_listbox.curselection()
-        if not selection:
+        user_name = self.users_view.selected_key()
+        if not user_name:
             return
         
-        user_name = self.users_listbox.get(selection[0])
         self.show_chat_with_user(user_name, False)
     
     def show_chat_with_user(self, target_name, is_group):
@@ -771,6 +889,7 @@ class ClientGUI:
         self._update_chat_input_state(target_name, is_group)
         
         self._load_chat_history(target_name, is_group)
+        self._update_mute_button()
         
         if not is_group:
             self._establish_chat_connection(target_name)
@@ -811,18 +930,155 @@ class ClientGUI:
         self.main_chat_text.delete(1.0, tk.END)
         
         chat_key = f"GROUP:{target_name}" if is_group else target_name
-        
-        if chat_key in self.chat_history and self.chat_history[chat_key]:
-            for msg in self.chat_history[chat_key]:
-                self.main_chat_text.insert(tk.END, msg + "\n")
-        else:
-            self.chat_history[chat_key] = []
-            
+
+        if not self._render_latest(chat_key):
             if is_group:
                 self._show_group_welcome_message(target_name)
             else:
                 self._show_direct_chat_welcome_message(target_name)
-    
+            self._view_header_lines = int(self.main_chat_text.index("end-1c").split(".")[0]) - 1
+
+    def _open_history(self):
+        """Open the message store of the user being connected."""
+        self._close_history()
+        schedule_flush = lambda flush: self.network.call_later(HISTORY_FLUSH_INTERVAL, flush)
+        try:
+            self.history = ChatHistory(HISTORY_MEMORY_LINES, store_path_for(HISTORY_DIR, self.client_name),
+                                       schedule_flush=schedule_flush)
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Chat history store unavailable ({e}), "
+                  f"keeping this session's messages in a temporary file")
+            self.history = ChatHistory(HISTORY_MEMORY_LINES, schedule_flush=schedule_flush)
+
+    def _close_history(self):
+        if self.history is not None:
+            self.history.close()
+            self.history = None
+        self._search_hits = []
+        if self._search_window is not None and self._search_window.winfo_exists():
+            self._search_window.destroy()
+        self._search_window = None
+
+    def _reset_chat_view(self, chat_key=None):
+        """Forget which lines the chat view shows (the widget itself is cleared by the caller)."""
+        self._view_chat = chat_key
+        self._view_ids = deque()           # History ids of the rendered lines, top to bottom
+        self._view_header_lines = 0        # Welcome lines above the first history line
+        self._view_at_end = True           # The newest line of the chat is rendered
+        self._view_has_older = False       # The store has lines above the rendered window
+        self._view_loading = False
+
+    def _render_latest(self, chat_key):
+        """Replace the chat view with the newest lines of `chat_key` in one insert.
+
+        Returns:
+            False if the chat has no history yet
+        """
+        self.main_chat_text.delete(1.0, tk.END)
+        self._reset_chat_view(chat_key)
+        lines = self.history.latest(chat_key, CHAT_VIEW_LINES)
+        if not lines:
+            return False
+        self.main_chat_text.insert(tk.END, "".join(line + "\n" for _, line in lines))
+        self._view_ids.extend(line_id for line_id, _ in lines)
+        self._view_has_older = self.history.count(chat_key) > len(lines)
+        return True
+
+    def _render_around(self, chat_key, line_id):
+        """Replace the chat view with the lines around `line_id` and scroll to that line."""
+        older = self.history.before(chat_key, line_id + 1, CHAT_PAGE_LINES)
+        newer = self.history.after(chat_key, line_id, CHAT_PAGE_LINES)
+        self.main_chat_text.config(state=tk.NORMAL)
+        self.main_chat_text.delete(1.0, tk.END)
+        self._reset_chat_view(chat_key)
+        lines = older + newer
+        self.main_chat_text.insert(tk.END, "".join(line + "\n" for _, line in lines))
+        self._view_ids.extend(item_id for item_id, _ in lines)
+        self._view_has_older = len(older) == CHAT_PAGE_LINES
+        self._view_at_end = len(newer) < CHAT_PAGE_LINES
+        self.main_chat_text.tag_config("search_hit", background=COLORS['list_item_selected'])
+        self.main_chat_text.tag_add("search_hit", f"{len(older)}.0", f"{len(older)}.end")
+        self.main_chat_text.config(state=tk.DISABLED)
+        self.main_chat_text.see(f"{len(older)}.0")
+
+    def _view_append(self, line_id, line, jump=False):
+        """Show a new line of the open chat (the widget must be in NORMAL state).
+
+        While the view is scrolled back past its window the line only shows up
+        when the user scrolls down, unless `jump` brings the view to the newest lines.
+        """
+        if not self._view_at_end:
+            if jump:
+                self._render_latest(self._view_chat)
+            return
+        self.main_chat_text.insert(tk.END, line + "\n")
+        self._view_ids.append(line_id)
+        if len(self._view_ids) > CHAT_VIEW_MAX_LINES:
+            self._trim_view_top(len(self._view_ids) - CHAT_VIEW_LINES)
+
+    def _trim_view_top(self, count):
+        first = self._view_header_lines + 1
+        self.main_chat_text.delete(f"{first}.0", f"{first + count}.0")
+        for _ in range(count):
+            self._view_ids.popleft()
+        self._view_has_older = True
+
+    def _trim_view_bottom(self, count):
+        first = self._view_header_lines + len(self._view_ids) - count + 1
+        self.main_chat_text.delete(f"{first}.0", "end-1c")
+        for _ in range(count):
+            self._view_ids.pop()
+        self._view_at_end = False
+
+    def _on_chat_scroll(self, first, last):
+        """Scrollbar callback of the chat view; loads a page when it reaches either edge."""
+        self.main_chat_text.vbar.set(first, last)
+        if self._view_loading or not self._view_ids:
+            return
+        if float(first) <= 0.0 and self._view_has_older:
+            self._view_loading = True
+            self.root.after_idle(self._load_older_page)
+        elif float(last) >= 1.0 and not self._view_at_end:
+            self._view_loading = True
+            self.root.after_idle(self._load_newer_page)
+
+    def _load_older_page(self):
+        self._view_loading = False
+        if not self._view_ids or self.main_chat_text.yview()[0] > 0.0:
+            return
+        lines = self.history.before(self._view_chat, self._view_ids[0], CHAT_PAGE_LINES)
+        self._view_has_older = len(lines) == CHAT_PAGE_LINES
+        if not lines:
+            return
+
+        first = self._view_header_lines + 1
+        self.main_chat_text.config(state=tk.NORMAL)
+        self.main_chat_text.insert(f"{first}.0", "".join(line + "\n" for _, line in lines))
+        self._view_ids.extendleft(line_id for line_id, _ in reversed(lines))
+        excess = len(self._view_ids) - CHAT_VIEW_MAX_LINES
+        if excess > 0:
+            self._trim_view_bottom(excess)
+        self.main_chat_text.config(state=tk.DISABLED)
+        # Keep the line that was at the top where the user left it
+        self.main_chat_text.yview(f"{first + len(lines)}.0")
+
+    def _load_newer_page(self):
+        self._view_loading = False
+        if not self._view_ids or self.main_chat_text.yview()[1] < 1.0:
+            return
+        lines = self.history.after(self._view_chat, self._view_ids[-1], CHAT_PAGE_LINES)
+        self._view_at_end = len(lines) < CHAT_PAGE_LINES
+        if not lines:
+            return
+
+        self.main_chat_text.config(state=tk.NORMAL)
+        self.main_chat_text.insert(tk.END, "".join(line + "\n" for _, line in lines))
+        self._view_ids.extend(line_id for line_id, _ in lines)
+        excess = len(self._view_ids) - CHAT_VIEW_MAX_LINES
+        if excess > 0:
+            self._trim_view_top(excess)
+        self.main_chat_text.config(state=tk.DISABLED)
+
     def _show_group_welcome_message(self, group_name):
         if group_name in self.groups and self.client_name in self.groups[group_name]:
             members = self.groups[group_name]
@@ -881,6 +1137,7 @@ class ClientGUI:
         
         self.current_chat_target = None
         self.current_chat_is_group = False
+        self._reset_chat_view()
         
         self.main_chat_text.config(state=tk.NORMAL)
         self.main_chat_text.delete(1.0, tk.END)
@@ -914,21 +1171,22 @@ class ClientGUI:
         
         self.send_chat_message(self.current_chat_target, message, self.current_chat_is_group)
     
-    def play_notification_sound(self):
-        if not self.sound_enabled or not SOUND_AVAILABLE:
-            return
-        
-        if not os.path.exists(SOUND_FILE):
+    def play_notification_sound(self, chat_key):
+        self.notifier.notify(chat_key)
+
+    def toggle_mute_current_chat(self):
+        """Mute or unmute notification sounds for the open conversation."""
+        if not self.current_chat_target:
             return
-        
-        def play_sound():
-            try:
-                playsound(SOUND_FILE, block=False)
-            except Exception as e:
-                print(f"Error playing sound: {e}")
-        
-        threading.Thread(target=play_sound, daemon=True).start()
-    
+        chat_key = f"GROUP:{self.current_chat_target}" if self.current_chat_is_group else self.current_chat_target
+        self.notifier.set_muted(chat_key, not self.notifier.is_muted(chat_key))
+        self._update_mute_button()
+
+    def _update_mute_button(self):
+        chat_key = f"GROUP:{self.current_chat_target}" if self.current_chat_is_group else self.current_chat_target
+        muted = bool(self.current_chat_target) and self.notifier.is_muted(chat_key)
+        self.mute_btn.config(text="Unmute Chat" if muted else "Mute Chat")
+
     def add_message_to_main_chat(self, sender, message, is_me=False):
         """Add a message to the main chat display and save to history.
         
@@ -950,25 +1208,21 @@ class ClientGUI:
             else:
                 display_msg = f"[{timestamp}] {message}"
         
-        self.main_chat_text.insert(tk.END, display_msg + "\n")
+        chat_key = f"GROUP:{self.current_chat_target}" if self.current_chat_is_group else self.current_chat_target
+        self._view_append(self.history.append(chat_key, display_msg), display_msg, jump=is_me)
         self.main_chat_text.config(state=tk.DISABLED)
-        self.main_chat_text.see(tk.END)
-        
+        if self._view_at_end:
+            self.main_chat_text.see(tk.END)
+
         if not is_me:
-            self.play_notification_sound()
-        
-        chat_key = f"GROUP:{self.current_chat_target}" if self.current_chat_is_group else self.current_chat_target
-        if chat_key not in self.chat_history:
-            self.chat_history[chat_key] = []
-        self.chat_history[chat_key].append(display_msg)
+            self.play_notification_sound(chat_key)
     
     def open_chat_with_user(self):
-        selection = self.users_listbox.curselection()
-        if not selection:
+        user_name = self.users_view.selected_key()
+        if not user_name:
             messagebox.showwarning("Warning", "Please select a user!")
             return
         
-        user_name = self.users_listbox.get(selection[0])
         self.show_chat_with_user(user_name, False)
 
     def on_group_selected(self):
@@ -976,7 +1230,7 @@ class ClientGUI:
         if not selection:
             return
         
-        group_name = self.groups_listbox.get(selection[0]).split(" (")[0]
+        group_name = self.groups_view.key_at(selection[0])
         self.show_chat_with_user(group_name, True)
     
     def open_group_chat(self):
@@ -985,7 +1239,7 @@ class ClientGUI:
             messagebox.showwarning("Warning", "Please select a group!")
             return
         
-        group_name = self.groups_listbox.get(selection[0]).split(" (")[0]
+        group_name = self.groups_view.key_at(selection[0])
         self.show_chat_with_user(group_name, True)
     
     def add_member_to_group(self):
@@ -994,7 +1248,7 @@ class ClientGUI:
             messagebox.showwarning("Warning", "Please select a group!")
             return
         
-        group_name = self.groups_listbox.get(selection[0]).split(" (")[0]
+        group_name = self.groups_view.key_at(selection[0])
         
         if group_name not in self.groups or self.client_name not in self.groups[group_name]:
             messagebox.showwarning("Warning", "You must be a member of the group to add members!")
@@ -1076,7 +1330,7 @@ class ClientGUI:
             messagebox.showwarning("Warning", "Please select a group!")
             return
         
-        group_name = self.groups_listbox.get(selection[0]).split(" (")[0]
+        group_name = self.groups_view.key_at(selection[0])
         
         if group_name not in self.groups:
             self.groups[group_name] = [self.client_name]
@@ -1111,13 +1365,14 @@ class ClientGUI:
             messagebox.showwarning("Warning", "Please select a group!")
             return
         
-        group_name = self.groups_listbox.get(selection[0]).split(" (")[0]
+        group_name = self.groups_view.key_at(selection[0])
         
         self.send_command_safe(f"LEAVE_GROUP:{group_name}")
         
         if self.current_chat_target == group_name and self.current_chat_is_group:
             self.current_chat_target = None
             self.current_chat_is_group = False
+            self._reset_chat_view()
             self.main_chat_text.config(state=tk.NORMAL)
             self.main_chat_text.delete(1.0, tk.END)
             self.main_chat_text.config(state=tk.DISABLED)
@@ -1151,325 +1406,178 @@ class ClientGUI:
             self.add_message_to_main_chat("You", message, is_me=True)
         else:
             chat_key = f"GROUP:{target}" if is_group else target
-            if chat_key not in self.chat_history:
-                self.chat_history[chat_key] = []
             timestamp = datetime.now().strftime('%H:%M')
-            self.chat_history[chat_key].append(f"[{timestamp}] You: {message}")
+            self.history.append(chat_key, f"[{timestamp}] You: {message}")
 
-    def handle_received_message(self, message):
-        """Process incoming message from server.
+    def handle_event(self, event):
+        """Process one event from the server.
         
-        Handles various message types: user connections, group updates, chat messages, errors.
+        The ChatClient parses every line and reply once into a typed event
+        (see async_impl.protocol), which is dispatched by type to one of the
+        _on_* handlers below.
         
         Args:
-            message: The raw message string from server
+            event: The event, posted from the network loop
         """
-        msg_stripped = message.strip()
-        if msg_stripped == "LIST_USERS" or msg_stripped == "LIST_GROUPS":
-            return
-        
-        if message.startswith("USER_CONNECTED:"):
-            try:
-                new_user_name = message.split(":", 1)[1].strip()
-                if new_user_name and new_user_name != self.client_name:
-                    if self.current_chat_target == new_user_name and not self.current_chat_is_group:
-                        self.add_message_to_main_chat("System", f"{new_user_name} is now online")
-                        self._update_chat_ui_for_connect()
-                        self._establish_chat_connection(new_user_name)
-                    
-                    self.root.after(GROUPS_LIST_DELAY_MS, lambda: self.refresh_users_visual(force=True))
-                return
-            except:
-                pass
-        if "Connected users" in message or message.startswith("Connected users"):
-            try:
-                parts = message.split(":", 1)
-                if len(parts) > 1:
-                    users_str = parts[1].strip()
-
-                    if "(" in users_str:
-
-                        users_str = users_str.split(")", 1)[1].strip()
-                        if users_str.startswith(":"):
-                            users_str = users_str[1:].strip()
-                    user_list = [u.strip() for u in users_str.split(",") if u.strip()]
-                    if user_list or not self.users:
-                        self.update_users_display(user_list)
-                    return
-            except Exception as e:
-
-                print(f"Error parsing users list: {e}")
-                pass
+        self._session_messages += 1
+        if PRESENCE_MODE == "push" and self._apply_presence(event):
             return
-        elif "Available groups" in message or message.startswith("Available groups") or message.startswith("No groups available"):
-            try:
-                if message.startswith("No groups available"):
-                    self.groups = {}
-                    self.update_groups_listbox()
+        handler = self._event_handlers.get(type(event))
+        if handler is not None:
+            handler(self, event)
+
+    def _on_user_connected(self, event):
+        # Poll mode only; push mode applies it in _apply_presence
+        name = event.name
+        if name and name != self.client_name:
+            if self.current_chat_target == name and not self.current_chat_is_group:
+                self.add_message_to_main_chat("System", f"{name} is now online")
+                self._update_chat_ui_for_connect()
+                self._establish_chat_connection(name)
+            self.root.after(GROUPS_LIST_DELAY_MS, lambda: self.refresh_users_visual(force=True))
+
+    def _on_user_list(self, event):
+        if event.names or not self.users:
+            self.update_users_display(event.names)
+
+    def _on_group_list(self, event):
+        self._apply_group_list({name: list(members) for name, members in event.groups.items()})
+
+    def _on_group_updated(self, event):
+        if event.user == self.client_name and event.action in ('created', 'added'):
+            group_name = event.group
+            if group_name not in self.groups:
+                self.groups[group_name] = [self.client_name]
+            elif self.client_name not in self.groups[group_name]:
+                self.groups[group_name].append(self.client_name)
+            self.pending_group_selection = group_name
+            self.update_groups_listbox()
+            if self.current_chat_target == group_name and self.current_chat_is_group:
+                text = f"Group '{group_name}' created" if event.action == 'created' else f"You were added to group '{group_name}'"
+                self.add_message_to_main_chat("System", text)
+            if event.action == 'created':
+                self.root.after(CHAT_OPEN_DELAY_MS, lambda: self.show_chat_with_user(group_name, True))
+                # A new group has only its creator, so push mode already knows its members
+                if PRESENCE_MODE == "push":
                     return
-                
-                lines = message.split("\n")
-                groups_dict = {}
-                for line in lines:
-                    if "(" in line and "members" in line:
-                        group_name = line.split("(")[0].strip()
-                        if group_name:
-                            if "members:" in line:
-                                members_str = line.split("members:")[1].split(")")[0].strip()
-                                members = [m.strip() for m in members_str.split(",") if m.strip()]
-                                groups_dict[group_name] = members
-                            else:
-                                groups_dict[group_name] = []
-                
-                old_groups = dict(self.groups)
-                
-                preserved_groups = {}
-                if self.pending_group_selection:
-                    if self.pending_group_selection not in groups_dict:
-                        if self.pending_group_selection in old_groups:
-                            if self.client_name in old_groups[self.pending_group_selection]:
-                                preserved_groups[self.pending_group_selection] = old_groups[self.pending_group_selection]
-                        else:
-                            if self.pending_group_selection in self.groups and self.client_name in self.groups[self.pending_group_selection]:
-                                preserved_groups[self.pending_group_selection] = self.groups[self.pending_group_selection]
-                
-                for group_name, members in old_groups.items():
-                    if group_name not in groups_dict and self.client_name in members:
-                        preserved_groups[group_name] = members
-                
-                self.groups = groups_dict.copy()
-                
-                for group_name, members in preserved_groups.items():
-                    self.groups[group_name] = members
-                
-                if self.pending_group_selection and self.pending_group_selection in groups_dict:
-                    pass
-                
-                self.update_groups_listbox()
-                if self.current_chat_target and self.current_chat_is_group:
-                    was_member = self.current_chat_target in old_groups and self.client_name in old_groups.get(self.current_chat_target, [])
-                    is_member = self.current_chat_target in self.groups and self.client_name in self.groups.get(self.current_chat_target, [])
-                    if was_member != is_member:
-                        self._update_chat_ui_for_group_membership()
-                return
-            except Exception as e:
-                print(f"Error parsing groups: {e}")
-                pass
-            return
-        elif "Group" in message and ("created" in message.lower() or "You are now a member" in message):
-            try:
-                if "'" in message:
-                    group_name = message.split("'")[1]
-                    if group_name not in self.groups:
-                        self.groups[group_name] = [self.client_name]
-                    elif self.client_name not in self.groups[group_name]:
-                        self.groups[group_name].append(self.client_name)
-                    self.pending_group_selection = group_name
-                    self.update_groups_listbox()
-                    self.root.after(CHAT_OPEN_DELAY_MS, lambda: self.show_chat_with_user(group_name, True))
-                    if self.current_chat_target == group_name and self.current_chat_is_group:
-                        self.add_message_to_main_chat("System", message.strip())
-            except:
-                pass
+            else:
+                self._update_chat_ui_for_group_membership()
+        
+        if not self._groups_refresh_pending:
+            self.root.after(GROUPS_UPDATE_DELAY_MS, self.list_groups_visual)
 
-            if not self._groups_refresh_pending:
-                self.root.after(GROUPS_UPDATE_DELAY_MS, self.list_groups_visual)
+    def _on_chat_opened(self, event):
+        name = event.name
+        if not name or name == self.client_name:
             return
-        elif "was added to group" in message.lower() or "you were added to group" in message.lower():
-            if "you were added to group" in message.lower():
-                try:
-                    if "'" in message:
-                        group_name = message.split("'")[1]
-                        if group_name not in self.groups:
-                            self.groups[group_name] = [self.client_name]
-                        elif self.client_name not in self.groups[group_name]:
-                            self.groups[group_name].append(self.client_name)
-                        self.pending_group_selection = group_name
-                        self.update_groups_listbox()
-                        if self.current_chat_target == group_name and self.current_chat_is_group:
-                            self.add_message_to_main_chat("System", message.strip())
-                        self._update_chat_ui_for_group_membership()
-                except:
-                    pass
+        if name not in self.users:
+            self.users[name] = {'name': name}
+            self.update_users_listbox()
+        if event.incoming and not self.current_chat_target:
+            self.show_chat_with_user(name, False)
+        elif self.current_chat_target == name and not self.current_chat_is_group:
+            was_disconnected = (self.main_message_entry['state'] == 'disabled' or 
+                                self.chat_title_label.cget('text').endswith('(Disconnected)'))
+            if was_disconnected:
+                self.add_message_to_main_chat("System", f"{name} is now online")
+            elif event.incoming:
+                self.add_message_to_main_chat("System", f"{name} connected to you. You can now chat!")
+            else:
+                self.add_message_to_main_chat("System", f"Connected to {name}. You can now chat!")
+            self._update_chat_ui_for_connect()
+
+    def _on_chat_closed(self, event):
+        is_partner = self.current_chat_target == event.name and not self.current_chat_is_group
+        if event.reason == 'ended' and is_partner:
+            self.add_message_to_main_chat("System", f"{event.name} ended the chat. The chat session has been closed.")
+        elif event.reason == 'disconnected':
+            if self.current_chat_target and not self.current_chat_is_group:
+                self.add_message_to_main_chat("System", f"{event.name} has been disconnected")
+                self._close_chat_after_disconnect()
+            if event.name in self.users:
+                del self.users[event.name]
+                self.update_users_listbox()
 
-            if not self._groups_refresh_pending:
-                self.root.after(100, self.list_groups_visual)
-            return
-        elif "has disconnected" in message.lower() and ("you can no longer send messages" in message.lower() or "[System]" in message):
-            try:
-                disconnected_name = None
-                if "[System]" in message:
-                    parts = message.split("[System]")[1].strip()
-                    if " has disconnected" in parts:
-                        disconnected_name = parts.split(" has disconnected")[0].strip()
-                
-                if self.current_chat_target and not self.current_chat_is_group:
-                    if disconnected_name:
-                        self.add_message_to_main_chat("System", f"{disconnected_name} has been disconnected")
-                    else:
-                        self.add_message_to_main_chat("System", f"{self.current_chat_target} has been disconnected")
-                    self._close_chat_after_disconnect()
-                
-                if disconnected_name and disconnected_name in self.users:
-                    del self.users[disconnected_name]
-                    self.update_users_listbox()
-            except Exception as e:
-                print(f"Error handling disconnect message: {e}")
-            return
-        elif "joined group" in message.lower() or "left group" in message.lower():
+    def _on_direct_message(self, event):
+        if event.text:
+            self._receive_chat_line(event.sender, event.sender, False, event.sender, event.text)
 
-            if not self._groups_refresh_pending:
-                self.root.after(GROUPS_UPDATE_DELAY_MS, self.list_groups_visual)
-            return
-        elif "GROUP_UPDATED" in message:
+    def _on_group_message(self, event):
+        if event.sender and event.text:
+            self._receive_chat_line(f"GROUP:{event.group}", event.group, True, event.sender, event.text)
 
-            if not self._groups_refresh_pending:
-                self.root.after(100, self.list_groups_visual)
-            return
-        elif message.startswith("[") and "]" in message:
-            try:
-                closing_bracket_pos = message.find("]")
-                if closing_bracket_pos == -1:
-                    return
-                
-                message_source = message[1:closing_bracket_pos].strip()
-                if not message_source:
-                    return
-                
-                message_body = message[closing_bracket_pos + 1:].strip()
-                if not message_body:
-                    return
-                
-                if message_body.startswith(":"):
-                    message_body = message_body[1:].strip()
-                
-                if not message_body:
-                    return
-                
-                if message_body == "LIST_USERS" or message_body == "LIST_GROUPS":
-                    return
-                
-                colon_pos = message_body.find(":")
-                if colon_pos != -1:
-                    sender = message_body[:colon_pos].strip()
-                    msg_content = message_body[colon_pos + 1:].strip()
-                    
-                    if not sender or not msg_content:
-                        return
-                    
-                    if message_source in self.groups:
-                        group_key = f"GROUP:{message_source}"
-                        
-                        if self.current_chat_target == message_source and self.current_chat_is_group:
-                            self.add_message_to_main_chat(sender, msg_content)
-                        else:
-                            self.play_notification_sound()
-                        
-                        if group_key not in self.chat_history:
-                            self.chat_history[group_key] = []
-                        timestamp = datetime.now().strftime('%H:%M')
-                        self.chat_history[group_key].append(f"[{timestamp}] {sender}: {msg_content}")
-                        
-                        return
-                    else:
-                        sender_name = message_source
-                        msg_content = message_body.strip()
-                        
-                        if self.current_chat_target == sender_name and not self.current_chat_is_group:
-                            self.add_message_to_main_chat(sender_name, msg_content)
-                        else:
-                            self.play_notification_sound()
-                        
-                        if sender_name not in self.chat_history:
-                            self.chat_history[sender_name] = []
-                        timestamp = datetime.now().strftime('%H:%M')
-                        self.chat_history[sender_name].append(f"[{timestamp}] {sender_name}: {msg_content}")
-                        
-                        return
-                else:
-                    sender = message_source
-                    msg_content = message_body.strip()
-                    
-                    if not msg_content:
-                        return
-                    
-                    if self.current_chat_target == sender and not self.current_chat_is_group:
-                        self.add_message_to_main_chat(sender, msg_content)
-                    else:
-                        self.play_notification_sound()
-                    
-                    if sender not in self.chat_history:
-                        self.chat_history[sender] = []
-                    timestamp = datetime.now().strftime('%H:%M')
-                    self.chat_history[sender].append(f"[{timestamp}] {sender}: {msg_content}")
-                    
-                    return
-                    
-            except Exception as e:
-                print(f"Error parsing chat message: {e}, message: {message}")
-                return
-        elif "ERROR" in message and "Group" in message and "already exists" in message.lower():
-            messagebox.showerror("Error", message.strip())
-            return
-        elif "ERROR" in message and "already connected" in message.lower():
-            try:
-                if "'" in message:
-                    target_name = message.split("'")[1].split("'")[0]
-                    if target_name and self.current_chat_target == target_name and not self.current_chat_is_group:
-                        self._update_chat_ui_for_connect()
-            except:
-                pass
-            return
-        elif "ERROR" in message and ("disconnected" in message.lower() or "Message delivery failed" in message or "Chat partner has disconnected" in message):
+    def _receive_chat_line(self, chat_key, target, is_group, sender, text):
+        # add_message_to_main_chat stores the line of the open chat itself
+        if self.current_chat_target == target and self.current_chat_is_group == is_group:
+            self.add_message_to_main_chat(sender, text)
+        else:
+            self.play_notification_sound(chat_key)
+            timestamp = datetime.now().strftime('%H:%M')
+            self.history.append(chat_key, f"[{timestamp}] {sender}: {text}")
+
+    def _on_error(self, event):
+        text = event.text
+        if text.startswith("ERROR: Group '") and text.endswith("' already exists"):
+            messagebox.showerror("Error", text)
+        elif text.startswith("ERROR: Connection failed - You are already connected to '"):
+            target_name = text[len("ERROR: Connection failed - You are already connected to '"):].partition("'")[0]
+            if target_name and self.current_chat_target == target_name and not self.current_chat_is_group:
+                self._update_chat_ui_for_connect()
+        elif text.startswith("ERROR: Message delivery failed") or \
+                (text.startswith("ERROR: Connection failed - Client '") and " is no longer connected" in text):
             if self.current_chat_target and not self.current_chat_is_group:
                 self.add_message_to_main_chat("System", f"{self.current_chat_target} has been disconnected")
                 self._close_chat_after_disconnect()
+
+    _event_handlers = {
+        UserConnected: _on_user_connected,
+        UserList: _on_user_list,
+        GroupList: _on_group_list,
+        GroupUpdated: _on_group_updated,
+        ChatOpened: _on_chat_opened,
+        ChatClosed: _on_chat_closed,
+        DirectMessage: _on_direct_message,
+        GroupMessage: _on_group_message,
+        Error: _on_error,
+    }
+
+    def _apply_group_list(self, groups_dict):
+        """Replace `groups` with a full LIST_GROUPS result, keeping groups we just joined."""
+        if not groups_dict:
+            self.groups = {}
+            self.update_groups_listbox()
             return
-        elif "connected to you" in message.lower() and "you can now send messages directly" in message.lower():
-            try:
-                idx = message.lower().find(" connected to you")
-                if idx > 0:
-                    sender_name = message[:idx].strip()
-                    if sender_name and sender_name != self.client_name:
-                        if sender_name not in self.users:
-                            self.users[sender_name] = {'name': sender_name}
-                            self.update_users_listbox()
-                        if not self.current_chat_target:
-                            self.show_chat_with_user(sender_name, False)
-                        elif self.current_chat_target == sender_name and not self.current_chat_is_group:
-                            was_disconnected = (self.main_message_entry['state'] == 'disabled' or 
-                                              self.chat_title_label.cget('text').endswith('(Disconnected)'))
-                            if was_disconnected:
-                                self.add_message_to_main_chat("System", f"{sender_name} is now online")
-                            else:
-                                self.add_message_to_main_chat("System", f"{sender_name} connected to you. You can now chat!")
-                            self._update_chat_ui_for_connect()
-            except Exception as e:
-                pass
-            return
-        elif message.startswith("Connected to ") and "You can now send messages directly" in message:
-            try:
-                if "Connected to " in message and "." in message:
-                    target_name = message.split("Connected to ")[1].split(".")[0].strip()
-                    if target_name and target_name != self.client_name:
-                        if target_name not in self.users:
-                            self.users[target_name] = {'name': target_name}
-                            self.update_users_listbox()
-                        if self.current_chat_target == target_name and not self.current_chat_is_group:
-                            was_disconnected = (self.main_message_entry['state'] == 'disabled' or 
-                                              self.chat_title_label.cget('text').endswith('(Disconnected)'))
-                            if was_disconnected:
-                                self.add_message_to_main_chat("System", f"{target_name} is now online")
-                            else:
-                                self.add_message_to_main_chat("System", f"Connected to {target_name}. You can now chat!")
-                            self._update_chat_ui_for_connect()
-            except Exception as e:
-                pass
-            return
-        elif "joined group" in message.lower() or "left group" in message.lower() or "created" in message.lower() or "connected to" in message.lower():
-            if ("joined" in message.lower() or "created" in message.lower()) and not self._groups_refresh_pending:
-                self.list_groups_visual()
-            return
+        
+        old_groups = dict(self.groups)
+        
+        preserved_groups = {}
+        if self.pending_group_selection:
+            if self.pending_group_selection not in groups_dict:
+                if self.pending_group_selection in old_groups:
+                    if self.client_name in old_groups[self.pending_group_selection]:
+                        preserved_groups[self.pending_group_selection] = old_groups[self.pending_group_selection]
+                else:
+                    if self.pending_group_selection in self.groups and self.client_name in self.groups[self.pending_group_selection]:
+                        preserved_groups[self.pending_group_selection] = self.groups[self.pending_group_selection]
+        
+        for group_name, members in old_groups.items():
+            if group_name not in groups_dict and self.client_name in members:
+                preserved_groups[group_name] = members
+        
+        self.groups = groups_dict.copy()
+        
+        for group_name, members in preserved_groups.items():
+            self.groups[group_name] = members
+        
+        if self.pending_group_selection and self.pending_group_selection in groups_dict:
+            pass
+        
+        self.update_groups_listbox()
+        if self.current_chat_target and self.current_chat_is_group:
+            was_member = self.current_chat_target in old_groups and self.client_name in old_groups.get(self.current_chat_target, [])
+            is_member = self.current_chat_target in self.groups and self.client_name in self.groups.get(self.current_chat_target, [])
+            if was_member != is_member:
+                self._update_chat_ui_for_group_membership()
 
     def update_users_display(self, user_list):
         """Update the users display with new list from server.
@@ -1478,29 +1586,14 @@ class ClientGUI:
             user_list: List of user names currently connected
         """
         def _update():
-            selected = self.users_listbox.curselection()
-            selected_name = None
-            if selected:
-                try:
-                    selected_name = self.users_listbox.get(selected[0])
-                except:
-                    pass
-            
             new_users = {name: {'name': name} for name in user_list if name != self.client_name}
             
             if new_users or not user_list:
                 old_users = set(self.users.keys())
                 self.users = new_users
+                # The listbox keeps the selected user selected by itself
                 self._update_users_listbox_internal()
                 
-                if selected_name and selected_name in self.users:
-                    try:
-                        index = sorted(self.users.keys()).index(selected_name)
-                        self.users_listbox.selection_set(index)
-                        self.users_listbox.see(index)
-                    except:
-                        pass
-                
                 if self.current_chat_target and not self.current_chat_is_group:
                     if self.current_chat_target not in self.users and self.current_chat_target in old_users:
                         self.add_message_to_main_chat("System", f"{self.current_chat_target} has been disconnected")
@@ -1532,13 +1625,8 @@ class ClientGUI:
         self._update_users_listbox_internal()
     
     def _update_users_listbox_internal(self):
-        self.users_listbox.delete(0, tk.END)
-        if self.users:
-            for name in sorted(self.users.keys()):
-                self.users_listbox.insert(tk.END, name)
-        else:
-            if self.connected:
-                self.users_listbox.insert(tk.END, "(No other users connected)")
+        self.users_view.sync({name: name for name in self.users},
+                             placeholder="(No other users connected)" if self.connected else None)
 
     def update_groups_listbox(self):
         """Update groups listbox with debouncing to prevent excessive updates."""
@@ -1557,36 +1645,12 @@ class ClientGUI:
         self._update_groups_listbox_internal()
     
     def _update_groups_listbox_internal(self):
-        selection = self.groups_listbox.curselection()
-        selected_group = None
-        if selection:
-            try:
-                selected_group = self.groups_listbox.get(selection[0]).split(" (")[0]
-            except:
-                pass
-        
-        if self.pending_group_selection:
-            selected_group = self.pending_group_selection
-        
-        self.groups_listbox.delete(0, tk.END)
+        # Only changed rows are touched; the selection and scroll position stay put
+        self.groups_view.sync({group_name: f"{group_name} ({len(members)} members)"
+                               for group_name, members in self.groups.items()})
         
-        if self.groups:
-            sorted_groups = sorted(self.groups.keys())
-            for group_name in sorted_groups:
-                members = self.groups[group_name]
-                member_count = len(members)
-                display = f"{group_name} ({member_count} members)"
-                self.groups_listbox.insert(tk.END, display)
-            
-            if selected_group and selected_group in self.groups:
-                try:
-                    index = sorted_groups.index(selected_group)
-                    self.groups_listbox.selection_set(index)
-                    self.groups_listbox.see(index)
-                    if self.pending_group_selection == selected_group:
-                        self.pending_group_selection = None
-                except:
-                    pass
+        if self.pending_group_selection and self.groups_view.select(self.pending_group_selection):
+            self.pending_group_selection = None
         
         my_groups = {}
         for group_name, members in self.groups.items():
@@ -1611,43 +1675,114 @@ class ClientGUI:
             messagebox.showwarning("Warning", "Already sending messages!")
             return
 
-        threading.Thread(target=self._send_all_async, daemon=True).start()
-
-    def _send_all_async(self):
         try:
-            self.sending_messages = True
-            
             client_async.HOST = self.host_var.get()
             client_async.PORT = int(self.port_var.get())
-            
-            total_messages = 0
-            with open(self.csv_file, 'r', encoding='utf-8') as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    if row['src_app'] == 'client_browser' and row['dst_app'] == 'web_server':
-                        total_messages += 1
-            
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+        except ValueError:
+            messagebox.showerror("Error", "Port must be a number")
+            return
+
+        self.sending_messages = True
+        self._csv_progress = None
+        self._csv_last_rtt = None
+        self._csv_acked_seen = 0
+        self._csv_throughput.reset()
+        self._csv_future = self.network.submit(
+            client_async.send_messages_from_csv(self.csv_file, delay=0.1, on_progress=self._on_csv_progress))
+        if self._csv_window_open():
+            self.csv_cancel_btn.config(state=tk.NORMAL)
+            self.progress_var.set(0)
+            self.csv_status_label.config(text="Connecting...")
+            self.csv_rate_label.config(text="")
+        self._csv_timer = self.root.after(CSV_PROGRESS_INTERVAL_MS, self._poll_csv_send)
+
+    def cancel_csv_send(self):
+        """Stop the running CSV send; the replay closes its connection and the summary follows."""
+        if self._csv_future is not None:
+            self._csv_future.cancel()
+
+    def _on_csv_progress(self, progress):
+        # Network thread: keep the latest counts; the Tk side polls them
+        self._csv_progress = progress
+        if progress.rtt_ms is not None:
+            self._csv_last_rtt = progress.rtt_ms
+
+    def _csv_window_open(self) -> bool:
+        return self._csv_window is not None and self._csv_window.winfo_exists()
+
+    def _poll_csv_send(self):
+        self._csv_timer = None
+        self._render_csv_progress()
+        if self._csv_future.done():
+            self._finish_csv_send()
+        else:
+            self._csv_timer = self.root.after(CSV_PROGRESS_INTERVAL_MS, self._poll_csv_send)
+
+    def _render_csv_progress(self):
+        progress = self._csv_progress
+        if progress is None:
+            return
+        now = time.monotonic()
+        self._csv_throughput.record(now, progress.acked - self._csv_acked_seen)
+        self._csv_acked_seen = progress.acked
+        if not self._csv_window_open():
+            return
+        # The total is known once the CSV cache exists; until then the bar just shows activity
+        if progress.total:
+            self.progress_bar.config(mode='determinate')
+            self.progress_var.set(100.0 * progress.sent / progress.total)
+            sent = f"Sent {progress.sent}/{progress.total}"
+        else:
+            self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.step(5)
+            sent = f"Sent {progress.sent}"
+        limited = f" ({progress.rate_limited} rate limited)" if progress.rate_limited else ""
+        self.csv_status_label.config(text=f"{sent}   acked {progress.acked}   failed {progress.failed}{limited}")
+        rtt = f"{self._csv_last_rtt:.1f} ms" if self._csv_last_rtt is not None else "-"
+        self.csv_rate_label.config(
+            text=f"{self._csv_throughput.rate(now, CSV_RATE_WINDOW):.1f} msgs/s   RTT {rtt}")
+
+    def _finish_csv_send(self):
+        future, self._csv_future = self._csv_future, None
+        self.sending_messages = False
+        if self._csv_timer is not None:
+            self.root.after_cancel(self._csv_timer)
+            self._csv_timer = None
+        progress = self._csv_progress
+        sent, acked, failed = (progress.sent, progress.acked, progress.failed) if progress else (0, 0, 0)
+
+        if future.cancelled():
+            title, show = "CSV Send Cancelled", messagebox.showinfo
+            text = f"Cancelled after {sent} messages: {acked} acked, {failed} failed"
+        else:
             try:
-                loop.run_until_complete(client_async.send_messages_from_csv(self.csv_file, delay=0.1))
-            finally:
-                try:
-                    pending = asyncio.all_tasks(loop)
-                    for task in pending:
-                        task.cancel()
-                    if pending:
-                        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                except:
-                    pass
-                loop.close()
-            
-            self.root.after(0, lambda: self.progress_var.set(100))
-            
-        except Exception as e:
-            pass
-        finally:
-            self.sending_messages = False
+                summary = future.result()
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] CSV send failed: {e}")
+                summary = {'error': str(e)}
+            if summary.get('error'):
+                title, show = "CSV Send Failed", messagebox.showerror
+                text = summary['error']
+            elif summary['messages_sent'] + summary['messages_failed'] == 0:
+                title, show = "Warning", messagebox.showwarning
+                text = "No client-to-server messages found in the CSV file"
+            else:
+                rtt = summary['rtt_ms']
+                title, show = "CSV Send Complete", messagebox.showinfo
+                limited = summary.get('messages_rate_limited')
+                limited = f" ({limited} rate limited)" if limited else ""
+                text = (f"Sent {summary['messages_sent']}, failed {summary['messages_failed']}{limited} "
+                        f"in {summary['duration_seconds']:.1f}s ({summary['throughput_msgs_per_sec']} msgs/s)\n"
+                        f"RTT ms: p50 {rtt['p50']}  p99 {rtt['p99']}  max {rtt['max']}")
+
+        if self._csv_window_open():
+            self.csv_cancel_btn.config(state=tk.DISABLED)
+            self.progress_bar.config(mode='determinate')
+            if title == "CSV Send Complete":
+                self.progress_var.set(100)
+            self.csv_status_label.config(text=text.split("\n")[0])
+            self.csv_rate_label.config(text="")
+        show(title, text)
 
     def clear_messages(self):
         if self.current_chat_target:
@@ -1655,8 +1790,124 @@ class ClientGUI:
             self.main_chat_text.delete(1.0, tk.END)
             self.main_chat_text.config(state=tk.DISABLED)
             chat_key = f"GROUP:{self.current_chat_target}" if self.current_chat_is_group else self.current_chat_target
-            if chat_key in self.chat_history:
-                self.chat_history[chat_key] = []
+            self.history.clear(chat_key)
+            self._reset_chat_view(chat_key)
+
+    def show_search_window(self):
+        """Open the window that searches the stored messages of every conversation."""
+        if self.history is None:
+            messagebox.showwarning("Warning", "Connect to search your message history!")
+            return
+        if self._search_window is not None and self._search_window.winfo_exists():
+            self._search_window.lift()
+            return
+
+        search_window = self._search_window = tk.Toplevel(self.root)
+        search_window.title("Search Messages")
+        search_window.minsize(500, 350)
+
+        search_frame = ttk.LabelFrame(search_window, text="Search", padding=10)
+        search_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        self.search_var = tk.StringVar(value="")
+        search_entry = tk.Entry(search_frame, textvariable=self.search_var, font=FONTS['medium'],
+                                bg=COLORS['list_bg'], fg=COLORS['text_primary'], relief=tk.FLAT, borderwidth=1,
+                                highlightthickness=1, highlightbackground=COLORS['border_medium'],
+                                highlightcolor=COLORS['accent_primary'], insertbackground=COLORS['text_primary'])
+        search_entry.pack(fill=tk.X, pady=5)
+        search_entry.bind("<KeyRelease>", lambda e: self._schedule_search())
+        search_entry.bind("<Return>", lambda e: self.run_search())
+        search_entry.focus_set()
+
+        results_frame = tk.Frame(search_frame)
+        results_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+        scrollbar_results = tk.Scrollbar(results_frame)
+        scrollbar_results.pack(side=tk.RIGHT, fill=tk.Y)
+        self.search_listbox = tk.Listbox(results_frame, bg=COLORS['list_bg'], fg='#ffffff',
+                                         font=FONTS['default'], relief=tk.FLAT,
+                                         selectbackground=COLORS['list_item_selected'], selectforeground='#ffffff',
+                                         yscrollcommand=scrollbar_results.set)
+        self.search_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar_results.config(command=self.search_listbox.yview)
+        self.search_listbox.bind("<Double-Button-1>", lambda e: self.open_search_result())
+
+        status_frame = tk.Frame(search_frame)
+        status_frame.pack(fill=tk.X, pady=5)
+        self.search_status_label = ttk.Label(status_frame, text="Type to search all conversations")
+        self.search_status_label.pack(side=tk.LEFT)
+        self.search_more_btn = ttk.Button(status_frame, text="Older Results", command=self.load_more_search_results,
+                                          style='Secondary.TButton', state=tk.DISABLED)
+        self.search_more_btn.pack(side=tk.RIGHT)
+
+        self._search_hits = []
+        self._search_query = ""
+
+    def _schedule_search(self):
+        # Search as the user types, once typing pauses
+        if self._search_timer:
+            self.root.after_cancel(self._search_timer)
+        self._search_timer = self.root.after(DEBOUNCE_DELAY_MS, self.run_search)
+
+    def run_search(self):
+        self._search_timer = None
+        if self.history is None or self._search_window is None:
+            return
+        query = self.search_var.get().strip()
+        if query == self._search_query and self._search_hits:
+            return
+        self._search_query = query
+        self._search_hits = []
+        self.search_listbox.delete(0, tk.END)
+        self._show_search_page(self.history.search(query) if query else [])
+
+    def load_more_search_results(self):
+        if self.history is None or not self._search_hits:
+            return
+        self._show_search_page(self.history.search(self._search_query, before_id=self._search_hits[-1].line_id))
+
+    def _show_search_page(self, hits):
+        self._search_hits.extend(hits)
+        if hits:
+            rows = []
+            for hit in hits:
+                is_group = hit.chat.startswith("GROUP:")
+                chat_name = f"{hit.chat[len('GROUP:'):]} (Group)" if is_group else hit.chat
+                day = datetime.fromtimestamp(hit.timestamp).strftime('%Y-%m-%d')
+                rows.append(f"{day}  {chat_name}  {hit.line}")
+            self.search_listbox.insert(tk.END, *rows)
+        has_more = len(hits) == SEARCH_PAGE_SIZE
+        self.search_more_btn.config(state=tk.NORMAL if has_more else tk.DISABLED)
+        if not self._search_query:
+            self.search_status_label.config(text="Type to search all conversations")
+        else:
+            count = len(self._search_hits)
+            self.search_status_label.config(text=f"{count}{'+' if has_more else ''} result{'s' if count != 1 else ''}")
+
+    def open_search_result(self):
+        """Open the conversation of the selected search result, scrolled to the matching line."""
+        selection = self.search_listbox.curselection()
+        if not selection or self.history is None or not self.connected:
+            return
+        hit = self._search_hits[selection[0]]
+        is_group = hit.chat.startswith("GROUP:")
+        self.show_chat_with_user(hit.chat[len("GROUP:"):] if is_group else hit.chat, is_group)
+        self._render_around(hit.chat, hit.line_id)
+
+    def _on_close(self):
+        if self.connected:
+            self.disconnect()
+        if self._chat_closing is not None:
+            try:
+                self._chat_closing.result(CLOSE_TIMEOUT)
+            except Exception:
+                pass
+        self._close_history()
+        self.cancel_csv_send()
+        self.charts.stop()
+        self.notifier.stop()
+        self.bridge.stop()
+        self.network.stop()
+        self.root.destroy()
 
     def export_logs(self):
         try:
@@ -1672,7 +1923,25 @@ class ClientGUI:
 
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat client GUI")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long the imports, window setup and first paint took")
+    args = parser.parse_args(argv)
+    profile = None
+    if args.profile_startup:
+        from gui.startup import StartupProfile
+        profile = StartupProfile(IMPORTS_STARTED, "Client GUI")
+        profile.mark("imports")
     root = tk.Tk()
+    if profile:
+        profile.mark("Tk root")
     app = ClientGUI(root)
+    if profile:
+        profile.mark("widgets")
+        profile.watch_first_paint(root)
     root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import deque, namedtuple
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+HISTORY_MEMORY_LINES = 500
+SEARCH_PAGE_SIZE = 50
+
+HistoryLine = Tuple[int, str]  # (line id, formatted line)
+SearchHit = namedtuple("SearchHit", ["line_id", "chat", "line", "timestamp"])
+
+_WORD = re.compile(r"\w+")
+
+
+def store_path_for(directory: str, name: str) -> str:
+    """The history file of user `name` inside `directory`."""
+    return os.path.join(os.path.expanduser(directory), f"{quote(name, safe='')}.db")
+
+
+def _terms(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class ChatHistory:
+    """Chat lines per conversation: the newest few in memory, every line in an SQLite store.
+
+    Each conversation keeps at most `memory_limit` recent lines in a deque.
+    Appended lines get their id at once and are written in batches by flush(),
+    which `schedule_flush` arranges to run later (the GUI runs it on its
+    network thread); without it every append is written immediately. Line ids
+    grow with time across all conversations, so they order lines inside a
+    conversation and serve as page cursors for scrollback and search.
+
+    Lines are indexed for full-text search with FTS5 when SQLite has it, and
+    with a plain term -> id table otherwise.
+    """
+
+    def __init__(self, memory_limit: int = HISTORY_MEMORY_LINES, store_path: Optional[str] = None,
+                 schedule_flush: Optional[Callable[[Callable[[], None]], None]] = None):
+        """
+        Args:
+            memory_limit: Recent lines kept in memory per conversation
+            store_path: SQLite file (default: a temporary file removed by close())
+            schedule_flush: Called with flush() when the first unwritten line is
+                appended; must call it later, from any one thread
+        """
+        self.memory_limit = memory_limit
+        self._temporary = store_path is None
+        if store_path is None:
+            fd, store_path = tempfile.mkstemp(prefix="chat_history_", suffix=".db")
+            os.close(fd)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(store_path)), exist_ok=True)
+        self.store_path = store_path
+        self._schedule_flush = schedule_flush
+
+        # Writes (flush, clear) and reads use separate connections, so a batch
+        # being written never blocks a page load or a search (WAL)
+        self._writer = sqlite3.connect(store_path, isolation_level=None, check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode = WAL")
+        self._writer.execute(f"PRAGMA synchronous = {'OFF' if self._temporary else 'NORMAL'}")
+        self._writer.execute("CREATE TABLE IF NOT EXISTS messages ("
+                             "id INTEGER PRIMARY KEY, chat TEXT NOT NULL, ts REAL NOT NULL, line TEXT NOT NULL)")
+        self._writer.execute("CREATE INDEX IF NOT EXISTS messages_chat_id ON messages (chat, id)")
+        self.full_text = self._create_search_index()
+        self._reader = sqlite3.connect(store_path, isolation_level=None)
+
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()      # guards _pending and _next_id
+        self._pending: List[tuple] = []    # (id, chat, ts, line) not yet written
+        self._next_id = (self._reader.execute("SELECT MAX(id) FROM messages").fetchone()[0] or 0) + 1
+        self._recent: Dict[str, Deque[HistoryLine]] = {}
+
+    def _create_search_index(self) -> bool:
+        tables = {row[0] for row in self._writer.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        if "message_terms" not in tables:
+            try:
+                # External content: the text is stored once, in `messages`
+                self._writer.execute("CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("
+                                     "line, content='messages', content_rowid='id', prefix='2 3')")
+                return True
+            except sqlite3.OperationalError:
+                pass
+        self._writer.execute("CREATE TABLE IF NOT EXISTS message_terms ("
+                             "term TEXT NOT NULL, id INTEGER NOT NULL, PRIMARY KEY (term, id)) WITHOUT ROWID")
+        return False
+
+    def _load_recent(self, chat: str) -> Deque[HistoryLine]:
+        recent = self._recent.get(chat)
+        if recent is None:
+            rows = self._reader.execute("SELECT id, line FROM messages WHERE chat = ? ORDER BY id DESC LIMIT ?",
+                                        (chat, self.memory_limit)).fetchall()
+            recent = self._recent[chat] = deque(reversed(rows), maxlen=self.memory_limit)
+        return recent
+
+    def _pending_lines(self, chat: str) -> List[HistoryLine]:
+        with self._lock:
+            return [(line_id, line) for line_id, pending_chat, _, line in self._pending if pending_chat == chat]
+
+    def append(self, chat: str, line: str) -> int:
+        """Store a line and return its id."""
+        recent = self._load_recent(chat)
+        with self._lock:
+            line_id = self._next_id
+            self._next_id += 1
+            self._pending.append((line_id, chat, time.time(), line))
+            first = len(self._pending) == 1
+        recent.append((line_id, line))
+        if self._schedule_flush is None:
+            self.flush()
+        elif first:
+            self._schedule_flush(self.flush)
+        return line_id
+
+    def flush(self):
+        """Write every pending line in one transaction."""
+        with self._write_lock:
+            with self._lock:
+                rows = list(self._pending)
+            if not rows or self._writer is None:
+                return
+            self._writer.execute("BEGIN")
+            self._writer.executemany("INSERT INTO messages (id, chat, ts, line) VALUES (?, ?, ?, ?)", rows)
+            if self.full_text:
+                self._writer.executemany("INSERT INTO messages_fts (rowid, line) VALUES (?, ?)",
+                                         [(row[0], row[3]) for row in rows])
+            else:
+                self._writer.executemany("INSERT OR IGNORE INTO message_terms (term, id) VALUES (?, ?)",
+                                         [(term, row[0]) for row in rows for term in set(_terms(row[3]))])
+            self._writer.execute("COMMIT")
+            with self._lock:
+                # Rows appended while writing stay pending for the next flush
+                del self._pending[:len(rows)]
+                more = bool(self._pending)
+        if more and self._schedule_flush is not None:
+            self._schedule_flush(self.flush)
+
+    def count(self, chat: str) -> int:
+        stored = self._reader.execute("SELECT COUNT(*) FROM messages WHERE chat = ?", (chat,)).fetchone()[0]
+        return stored + len(self._pending_lines(chat))
+
+    def latest(self, chat: str, limit: int) -> List[HistoryLine]:
+        """The newest `limit` lines, oldest first."""
+        recent = self._load_recent(chat)
+        if limit <= len(recent):
+            return list(recent)[-limit:]
+        return self.before(chat, None, limit)
+
+    def before(self, chat: str, line_id: Optional[int], limit: int) -> List[HistoryLine]:
+        """Up to `limit` lines older than `line_id` (None: the newest), oldest first."""
+        recent = self._load_recent(chat)
+        if recent and line_id is not None and line_id > recent[0][0]:
+            newer_in_memory = [item for item in recent if item[0] < line_id]
+            if len(newer_in_memory) >= limit:
+                return newer_in_memory[-limit:]
+        if line_id is None:
+            rows = self._reader.execute("SELECT id, line FROM messages WHERE chat = ? ORDER BY id DESC LIMIT ?",
+                                        (chat, limit)).fetchall()
+        else:
+            rows = self._reader.execute("SELECT id, line FROM messages WHERE chat = ? AND id < ? "
+                                        "ORDER BY id DESC LIMIT ?", (chat, line_id, limit)).fetchall()
+        pending = [item for item in self._pending_lines(chat) if line_id is None or item[0] < line_id]
+        return sorted(set(rows).union(pending))[-limit:]
+
+    def after(self, chat: str, line_id: int, limit: int) -> List[HistoryLine]:
+        """Up to `limit` lines newer than `line_id`, oldest first."""
+        recent = self._load_recent(chat)
+        if recent and line_id >= recent[0][0]:
+            return [item for item in recent if item[0] > line_id][:limit]
+        rows = self._reader.execute("SELECT id, line FROM messages WHERE chat = ? AND id > ? "
+                                    "ORDER BY id LIMIT ?", (chat, line_id, limit)).fetchall()
+        pending = [item for item in self._pending_lines(chat) if item[0] > line_id]
+        return sorted(set(rows).union(pending))[:limit]
+
+    def search(self, query: str, before_id: Optional[int] = None, limit: int = SEARCH_PAGE_SIZE) -> List[SearchHit]:
+        """Lines of every conversation containing all words of `query`, newest first.
+
+        With FTS5 the last word also matches as a prefix, so results follow
+        the user's typing. Pass the line_id of the last hit as `before_id` for
+        the next page. Lines appended since the last flush are not searched.
+        """
+        terms = _terms(query)
+        if not terms:
+            return []
+        cursor = before_id if before_id is not None else self._next_id
+        if self.full_text:
+            match = " ".join(f'"{term}"' for term in terms) + "*"
+            rows = self._reader.execute(
+                "SELECT m.id, m.chat, m.line, m.ts FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid "
+                "WHERE messages_fts MATCH ? AND messages_fts.rowid < ? ORDER BY messages_fts.rowid DESC LIMIT ?",
+                (match, cursor, limit)).fetchall()
+        else:
+            others = " AND EXISTS (SELECT 1 FROM message_terms WHERE term = ? AND id = t.id)" * (len(terms) - 1)
+            rows = self._reader.execute(
+                "SELECT m.id, m.chat, m.line, m.ts FROM message_terms t JOIN messages m ON m.id = t.id "
+                f"WHERE t.term = ? AND t.id < ?{others} ORDER BY t.id DESC LIMIT ?",
+                (terms[0], cursor, *terms[1:], limit)).fetchall()
+        return [SearchHit(*row) for row in rows]
+
+    def clear(self, chat: str):
+        """Delete every line of one conversation, in memory and on disk."""
+        with self._write_lock:
+            with self._lock:
+                self._pending = [row for row in self._pending if row[1] != chat]
+            self._writer.execute("BEGIN")
+            if self.full_text:
+                self._writer.execute("INSERT INTO messages_fts (messages_fts, rowid, line) "
+                                     "SELECT 'delete', id, line FROM messages WHERE chat = ?", (chat,))
+            else:
+                self._writer.execute("DELETE FROM message_terms WHERE id IN "
+                                     "(SELECT id FROM messages WHERE chat = ?)", (chat,))
+            self._writer.execute("DELETE FROM messages WHERE chat = ?", (chat,))
+            self._writer.execute("COMMIT")
+        self._recent.pop(chat, None)
+
+    def close(self):
+        """Write pending lines and close the store."""
+        self.flush()
+        with self._write_lock:
+            self._writer.close()
+            self._writer = None
+        self._reader.close()
+        if self._temporary:
+            for suffix in ("", "-wal", "-shm"):
+                try:
+                    os.remove(self.store_path + suffix)
+                except OSError:
+                    pass
@@ -0,0 +1,82 @@
+import asyncio
+import concurrent.futures
+import threading
+from collections import deque
+from datetime import datetime
+
+FRAME_INTERVAL_MS = 16
+MAX_EVENTS_PER_FRAME = 5000
+
+
+class NetworkThread:
+    """One asyncio event loop running in a daemon thread for the whole GUI session.
+
+    Connections, reconnects and CSV sends all run on this loop, so the GUI
+    never creates a thread or an event loop per operation.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="gui-network", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Run a coroutine on the network loop (callable from any thread)."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, callback, *args):
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def call_later(self, delay: float, callback, *args):
+        """Run `callback(*args)` on the network loop after `delay` seconds (callable from any thread)."""
+        self.loop.call_soon_threadsafe(self.loop.call_later, delay, callback, *args)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=1.0)
+
+
+class EventBridge:
+    """Carries callbacks from the network thread to the Tk thread in batches.
+
+    The network side calls post() from any thread; the Tk side drains the
+    queue once per frame and runs everything pending in one go, so a burst
+    of messages costs one Tk timer and one redraw per frame instead of one
+    after() callback per line.
+    """
+
+    def __init__(self, root, interval_ms: int = FRAME_INTERVAL_MS, max_batch: int = MAX_EVENTS_PER_FRAME):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.max_batch = max_batch
+        self._queue = deque()  # append() and popleft() are thread-safe
+        self._timer = None
+
+    def post(self, callback, *args):
+        self._queue.append((callback, args))
+
+    def clear(self):
+        self._queue.clear()
+
+    def start(self):
+        if self._timer is None:
+            self._timer = self.root.after(self.interval_ms, self._drain)
+
+    def stop(self):
+        if self._timer is not None:
+            self.root.after_cancel(self._timer)
+            self._timer = None
+
+    def _drain(self):
+        # Anything beyond max_batch waits for the next frame so the UI keeps responding
+        for _ in range(min(len(self._queue), self.max_batch)):
+            callback, args = self._queue.popleft()
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Error in GUI event {getattr(callback, '__name__', callback)}: {e}")
+        self._timer = self.root.after(self.interval_ms, self._drain)
@@ -0,0 +1,105 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional, Set
+
+COALESCE_WINDOW = 1.0      # Notifications within this many seconds share one sound
+CHAT_MIN_INTERVAL = 5.0    # At most one sound per conversation per this many seconds
+
+
+def load_player(sound_file: str) -> Optional[Callable[[], None]]:
+    """Resolve the sound file and backend once; returns a blocking play() or None.
+
+    playsound (and the audio backend it loads) is imported here, on the
+    worker's first sound, so it never slows down the GUI's startup.
+    """
+    try:
+        from playsound import playsound
+    except ImportError:
+        print("Warning: playsound not installed. Sound notifications will be disabled.")
+        print("Install with: pip install playsound")
+        return None
+    if not os.path.exists(sound_file):
+        return None
+    path = os.path.abspath(sound_file)
+    return lambda: playsound(path, block=True)
+
+
+class Notifier:
+    """Plays the notification sound for incoming messages from one worker thread.
+
+    notify() only does bookkeeping on the calling (Tk) thread: muted
+    conversations and conversations that sounded within `chat_interval` are
+    skipped, and everything else sets a single pending flag. The worker
+    plays one sound per pending flag and then waits `window` seconds, so a
+    burst of messages across any number of conversations costs one sound
+    per window instead of a thread and a sound per message.
+    """
+
+    def __init__(self, sound_file: str, window: float = COALESCE_WINDOW, chat_interval: float = CHAT_MIN_INTERVAL):
+        self.sound_file = sound_file
+        self.window = window
+        self.chat_interval = chat_interval
+        self.enabled = True
+        self.muted: Set[str] = set()
+        self.played = 0
+        self.coalesced = 0
+        self._last_by_chat: Dict[str, float] = {}
+        self._pending = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._player: Optional[Callable[[], None]] = None
+
+    def is_muted(self, chat_key: str) -> bool:
+        return chat_key in self.muted
+
+    def set_muted(self, chat_key: str, muted: bool):
+        if muted:
+            self.muted.add(chat_key)
+        else:
+            self.muted.discard(chat_key)
+
+    def notify(self, chat_key: str) -> bool:
+        """Ask for a sound for a message in `chat_key`.
+
+        Returns:
+            True if this call scheduled a sound, False if it was muted, rate
+            limited or merged into a sound that is already pending
+        """
+        if not self.enabled or chat_key in self.muted:
+            return False
+        now = time.monotonic()
+        last = self._last_by_chat.get(chat_key)
+        if last is not None and now - last < self.chat_interval:
+            return False
+        self._last_by_chat[chat_key] = now
+        if self._pending.is_set():
+            self.coalesced += 1
+            return False
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="gui-notifications", daemon=True)
+            self._thread.start()
+        self._pending.set()
+        return True
+
+    def _run(self):
+        self._player = load_player(self.sound_file)
+        while True:
+            self._pending.wait()
+            if self._stopped.is_set():
+                return
+            self._pending.clear()
+            if self._player is not None:
+                try:
+                    self._player()
+                except Exception as e:
+                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Error playing sound: {e}")
+            self.played += 1
+            # Notifications during the sound and the window set the flag again and share one sound after it
+            if self._stopped.wait(self.window):
+                return
+
+    def stop(self):
+        self._stopped.set()
+        self._pending.set()
@@ -1,3 +1,7 @@
+import time
+IMPORTS_STARTED = time.perf_counter()  # For --profile-startup
+
+import argparse
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, filedialog
 import asyncio
@@ -9,10 +13,30 @@ import os
 import math
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-import async_impl.server_async as server_async
+from utils import config
 
+from gui.charts import ChartRecorder, ChartSeries, LiveCharts, per_event, per_second
 from gui.theme import COLORS, FONTS, SPACING, BORDER_RADIUS, get_button_colors
 
+CHART_HISTORY_SECONDS, CHART_INTERVAL_MS = config.get_chart_settings()
+
+# async_impl.server_async, imported on first use: importing it loads the
+# server settings and sets up logging, which a GUI that only starts is spared
+server_async = None
+
+
+def load_server():
+    global server_async
+    if server_async is None:
+        import async_impl.server_async as module
+        server_async = module
+    return server_async
+
+
+def _if_server(read):
+    """Chart sampler reading the server's state, or no sample before the server module is loaded."""
+    return lambda: read() if server_async is not None else None
+
 
 class ServerGUI:
     """GUI application for the chat server.
@@ -39,7 +63,18 @@ class ServerGUI:
         self.group_rects = {}
         self.connection_lines = {}
         
+        # Sampled once per interval into ring buffers, shown on the Live Charts tab
+        self.charts = ChartRecorder(self.root, [
+            ChartSeries("Messages received", "msgs/s",
+                        per_second(_if_server(lambda: server_async.message_counts['received']))),
+            ChartSeries("Connected clients", "clients", _if_server(lambda: len(server_async.client_info))),
+            ChartSeries("Group fan-out", "recipients/msg",
+                        per_event(_if_server(lambda: server_async.fanout_stats['recipients']),
+                                  _if_server(lambda: server_async.fanout_stats['broadcasts']))),
+        ], CHART_HISTORY_SECONDS, CHART_INTERVAL_MS)
+        
         self.create_widgets()
+        self.charts.start()
         
         self.update_statistics()
     
@@ -113,7 +148,7 @@ class ServerGUI:
         stats_frame = ttk.LabelFrame(self.root, text="Statistics", padding=10)
         stats_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        self.stats_text = tk.Text(stats_frame, height=4, wrap=tk.WORD,
+        self.stats_text = tk.Text(stats_frame, height=6, wrap=tk.WORD,
                                   bg=COLORS['bg_panel'], fg=COLORS['text_primary'],
                                   font=FONTS['default'], relief=tk.FLAT)
         self.stats_text.pack(fill=tk.BOTH, expand=True)
@@ -128,6 +163,12 @@ class ServerGUI:
         table_tab = ttk.Frame(main_notebook)
         main_notebook.add(table_tab, text="Table View")
         
+        # The chart view (and matplotlib) is built when the tab is first shown
+        self.charts_tab = ttk.Frame(main_notebook)
+        main_notebook.add(self.charts_tab, text="Live Charts")
+        self.live_charts = None
+        main_notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        
         clients_frame = ttk.LabelFrame(table_tab, text="Connected Clients", padding=10)
         clients_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
@@ -161,6 +202,11 @@ class ServerGUI:
         ttk.Button(buttons_frame, text="Export Statistics", command=self.export_statistics).pack(side=tk.LEFT, padx=5)
         ttk.Button(buttons_frame, text="Refresh", command=self.update_all).pack(side=tk.LEFT, padx=5)
     
+    def on_tab_changed(self, event):
+        notebook = event.widget
+        if self.live_charts is None and notebook.nametowidget(notebook.select()) is self.charts_tab:
+            self.live_charts = LiveCharts(self.charts_tab, self.charts)
+    
     def create_visual_tab(self, parent):
         """Create the visual network visualization tab."""
         left_frame = ttk.Frame(parent)
@@ -227,8 +273,7 @@ class ServerGUI:
 • Purple dashed = Group membership"""
         
         ttk.Label(legend_frame, text=legend_text, justify=tk.LEFT, font=FONTS['default']).pack(anchor=tk.W, padx=5, pady=5)
-        
-        self.update_visual_canvas_size()
+        # The canvas' scroll region is set by its first <Configure>, once the window is laid out
         
     def update_visual_canvas_size(self):
         try:
@@ -257,7 +302,7 @@ class ServerGUI:
             messagebox.showerror("Error", "Invalid port number!")
             return
         
-        server_async.set_log_callback(self.log_message)
+        load_server().set_log_callback(self.log_message)
         
         self.server_running = True
         self.server_thread = threading.Thread(target=self.run_server, daemon=True)
@@ -293,7 +338,6 @@ class ServerGUI:
         self.server_running = False
         
         try:
-            import async_impl.server_async as server_async
             connected_clients = getattr(server_async, 'connected_clients', set())
             for writer in list(connected_clients):
                 try:
@@ -321,15 +365,24 @@ class ServerGUI:
     def update_statistics(self):
         """Update server statistics display."""
         try:
+            if server_async is None:
+                # Nothing to show before the first start; keep the server module unloaded
+                self.stats_text.delete(1.0, tk.END)
+                self.stats_text.insert(1.0, "Server not started")
+                self.draw_visual_network()
+                self.root.after(5000, self.update_statistics)
+                return
             stats = server_async.get_statistics()
             
             self.stats_text.delete(1.0, tk.END)
             groups_count = len(stats.get('groups', {}))
+            fanout = stats['fanout']
             stats_str = f"""Connected Clients: {stats['connected_clients']}
 Total Messages: {stats['total_messages']}
 Messages Received: {stats['messages_received']}
 Messages Sent: {stats['messages_sent']}
-Active Groups: {groups_count}"""
+Active Groups: {groups_count}
+Broadcasts: {fanout['broadcasts']} (avg {fanout['avg_duration_ms']} ms, max {fanout['max_duration_ms']} ms, max loop block {fanout['max_loop_block_ms']} ms)"""
             self.stats_text.insert(1.0, stats_str)
             
             self.clients_tree.delete(*self.clients_tree.get_children())
@@ -396,7 +449,7 @@ Active Groups: {groups_count}"""
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
             )
             if filename:
-                server_async.export_logs(filename)
+                load_server().export_logs(filename)
                 self.log_message(f"Logs exported to {filename}")
                 messagebox.showinfo("Success", f"Logs exported to {filename}")
         except Exception as e:
@@ -409,7 +462,7 @@ Active Groups: {groups_count}"""
                 filetypes=[("JSON files", "*.json"), ("All files", "*.*")]
             )
             if filename:
-                stats = server_async.get_statistics()
+                stats = load_server().get_statistics()
                 with open(filename, 'w', encoding='utf-8') as f:
                     json.dump(stats, f, indent=2, ensure_ascii=False)
                 self.log_message(f"Statistics exported to {filename}")
@@ -493,7 +546,7 @@ Active Groups: {groups_count}"""
                         self.visual_canvas.create_line(x, y + 18, mx, my - 35, 
                                                       fill=COLORS['accent_secondary'], width=2, dash=(5, 3))
         
-        stats = server_async.get_statistics()
+        stats = server_async.get_statistics() if server_async is not None else {}
         chat_connections = stats.get('chat_connections', {})
         client_by_name = {info.get('name'): cid for cid, info in self.clients.items()}
         
@@ -520,8 +573,26 @@ Active Groups: {groups_count}"""
         self.connection_lines = {}
 
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Chat server GUI")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="Print how long the imports, window setup and first paint took")
+    args = parser.parse_args(argv)
+    profile = None
+    if args.profile_startup:
+        from gui.startup import StartupProfile
+        profile = StartupProfile(IMPORTS_STARTED, "Server GUI")
+        profile.mark("imports")
     root = tk.Tk()
+    if profile:
+        profile.mark("Tk root")
     app = ServerGUI(root)
+    if profile:
+        profile.mark("widgets")
+        profile.watch_first_paint(root)
     root.mainloop()
 
+
+if __name__ == "__main__":
+    main()
+
@@ -0,0 +1,97 @@
+import tkinter as tk
+from bisect import bisect_left
+from typing import Dict, List, Optional
+
+# Past this share of changed rows one full reload is cheaper than row-by-row edits
+REBUILD_FRACTION = 0.5
+
+
+class SortedListbox:
+    """A Listbox whose rows stay sorted by key and are updated by diff.
+
+    `keys` mirrors the rows in order, so a key's row is found with bisect
+    instead of a scan. sync() inserts and deletes only the rows that
+    changed, which keeps the selection and the scroll position of a long
+    list in place and avoids redrawing it on every refresh.
+    """
+
+    def __init__(self, listbox: tk.Listbox):
+        self.listbox = listbox
+        self.keys: List[str] = []
+        self._texts: Dict[str, str] = {}
+        self._placeholder = False
+
+    def index(self, key: str) -> Optional[int]:
+        index = bisect_left(self.keys, key)
+        if index < len(self.keys) and self.keys[index] == key:
+            return index
+        return None
+
+    def key_at(self, index: int) -> Optional[str]:
+        return self.keys[index] if 0 <= index < len(self.keys) else None
+
+    def selected_key(self) -> Optional[str]:
+        selection = self.listbox.curselection()
+        return self.key_at(selection[0]) if selection else None
+
+    def select(self, key: str, see: bool = True) -> bool:
+        index = self.index(key)
+        if index is None:
+            return False
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        if see:
+            self.listbox.see(index)
+        return True
+
+    def sync(self, items: Dict[str, str], placeholder: Optional[str] = None):
+        """Make the rows show `items` ({key: row text}) in key order.
+
+        Args:
+            items: The full new contents
+            placeholder: Row shown while `items` is empty
+        """
+        selected = self.selected_key()
+        top = self.key_at(self.listbox.nearest(0)) if self.keys else None
+
+        removed = [key for key in self._texts if key not in items]
+        added = [key for key in items if key not in self._texts]
+        changed = [key for key in items if key in self._texts and self._texts[key] != items[key]]
+
+        if self._placeholder or len(removed) + len(added) > REBUILD_FRACTION * max(len(items), 1):
+            self._rebuild(items)
+        else:
+            # Highest index first, so earlier deletions do not shift later ones
+            for index in sorted((self.index(key) for key in removed), reverse=True):
+                self.listbox.delete(index)
+                del self.keys[index]
+            for key in sorted(added):
+                index = bisect_left(self.keys, key)
+                self.keys.insert(index, key)
+                self.listbox.insert(index, items[key])
+            for key in changed:
+                index = self.index(key)
+                self.listbox.delete(index)
+                self.listbox.insert(index, items[key])
+            self._texts = dict(items)
+
+        if not items and placeholder is not None:
+            self.listbox.insert(tk.END, placeholder)
+            self._placeholder = True
+
+        if selected is not None and self.selected_key() != selected:
+            if not self.select(selected, see=False):
+                self.listbox.selection_clear(0, tk.END)
+        if top is not None and top in self._texts:
+            self.listbox.yview(self.index(top))
+
+    def _rebuild(self, items: Dict[str, str]):
+        self.keys = sorted(items)
+        self._texts = dict(items)
+        self._placeholder = False
+        self.listbox.delete(0, tk.END)
+        if self.keys:
+            self.listbox.insert(tk.END, *(items[key] for key in self.keys))
+
+    def clear(self):
+        self.sync({})
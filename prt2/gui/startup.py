@@ -0,0 +1,43 @@
+import time
+from datetime import datetime
+from typing import List, Tuple
+
+
+class StartupProfile:
+    """Wall-clock marks from the start of a GUI module's imports to its first paint.
+
+    The GUI entry points create one with the time taken at the top of the
+    module, mark() each startup phase, and call watch_first_paint() before
+    mainloop(); the first Expose event of the window completes the profile
+    and prints it.
+    """
+
+    def __init__(self, started: float, name: str):
+        self.name = name
+        self.marks: List[Tuple[str, float]] = [("start", started)]
+        self._paint_binding = None
+
+    def mark(self, label: str):
+        self.marks.append((label, time.perf_counter()))
+
+    def phases(self) -> List[Tuple[str, float]]:
+        """(label, milliseconds since the previous mark) for every phase."""
+        return [(label, (t - self.marks[i][1]) * 1000) for i, (label, t) in enumerate(self.marks[1:])]
+
+    def total_ms(self) -> float:
+        return (self.marks[-1][1] - self.marks[0][1]) * 1000
+
+    def watch_first_paint(self, root):
+        self._paint_binding = root.bind("<Expose>", lambda e: self._on_first_paint(root), add="+")
+
+    def _on_first_paint(self, root):
+        if self._paint_binding is None:
+            return
+        root.unbind("<Expose>", self._paint_binding)
+        self._paint_binding = None
+        self.mark("first paint")
+        self.report()
+
+    def report(self):
+        phases = ", ".join(f"{label} {ms:.1f} ms" for label, ms in self.phases())
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {self.name} startup: {phases} (total {self.total_ms():.1f} ms)")
@@ -0,0 +1,42 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_impl.client_async as client_async
+import async_impl.server_async as server_async
+from benchmarks.fakes import reset_server_state
+from gui.network import NetworkThread
+from utils import config
+
+
+async def _drain_handlers():
+    handlers = asyncio.all_tasks() - {asyncio.current_task()}
+    if handlers:
+        await asyncio.wait(handlers, timeout=2)
+
+
+@pytest.fixture(autouse=True)
+def csv_cache_directory(tmp_path, monkeypatch):
+    """Keep the CSV caches written during tests out of the configured cache directory."""
+    directory = str(tmp_path / "csv_cache")
+    monkeypatch.setitem(config.get_config().setdefault("csv", {}), "cache_directory", directory)
+    return directory
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """A real server on a background loop, with the client pointed at it."""
+    reset_server_state(server_async)
+    network = NetworkThread()
+    listener = network.submit(asyncio.start_server(server_async.handle_client, '127.0.0.1', 0)).result(5)
+    monkeypatch.setattr(client_async, 'HOST', '127.0.0.1')
+    monkeypatch.setattr(client_async, 'PORT', listener.sockets[0].getsockname()[1])
+    yield
+    network.call_soon(listener.close)
+    network.submit(_drain_handlers()).result(5)
+    network.stop()
+    reset_server_state(server_async)
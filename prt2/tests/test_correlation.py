@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+import async_impl.client_async as client_async
+from async_impl.server_async import _format_reply, _split_correlation_id
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("#17|LIST_GROUPS", ("17", "LIST_GROUPS")),
+    ("#a_b-C|GROUP:team:hi | there", ("a_b-C", "GROUP:team:hi | there")),
+    ("#1|#abc|hello", ("1", "#abc|hello")),
+    ("LIST_USERS", (None, "LIST_USERS")),
+    ("#|LIST_USERS", (None, "#|LIST_USERS")),
+    ("#no spaces|x", (None, "#no spaces|x")),
+    ("#" + "x" * 33 + "|x", (None, "#" + "x" * 33 + "|x")),
+])
+def test_split_correlation_id(line, expected):
+    assert _split_correlation_id(line) == expected
+
+
+def test_format_reply_tags_every_line():
+    assert _format_reply("Connected users (1): bob\n", "7") == "#7|Connected users (1): bob\n"
+    assert _format_reply("Available groups (2):\na (1 members: x)\nb (1 members: y)\n", "7") == (
+        "#7+Available groups (2):\n#7+a (1 members: x)\n#7|b (1 members: y)\n")
+    assert _format_reply("plain\n", None) == "plain\n"
+
+
+def test_replies_complete_out_of_order():
+    async def run():
+        conn = client_async.PipelinedConnection()
+        loop = asyncio.get_running_loop()
+        futures = {request_id: loop.create_future() for request_id in ("1", "2", "3")}
+        conn._pending.update(futures)
+        unsolicited = []
+        conn.on_unsolicited = unsolicited.append
+        for line in ["#1+first of one", "#3|three", "USER_CONNECTED:dave", "#1+second of one",
+                     "#2|two", "#1|last of one"]:
+            conn._dispatch_line(line)
+        return ({request_id: future.result() for request_id, future in futures.items()},
+                unsolicited, conn.in_flight, conn._partial)
+
+    results, unsolicited, in_flight, partial = asyncio.run(run())
+    assert results == {"1": "first of one\nsecond of one\nlast of one", "2": "two", "3": "three"}
+    assert unsolicited == ["USER_CONNECTED:dave"]
+    assert in_flight == 0
+    assert partial == {}
+
+
+async def raw_client(name: str):
+    reader, writer = await asyncio.open_connection(client_async.HOST, client_async.PORT)
+    writer.write(f"{name}\n".encode('utf-8'))
+    await writer.drain()
+    while not (await reader.readline()).startswith(b"Commands:"):
+        pass
+    return reader, writer
+
+
+async def read_line(reader) -> str:
+    return (await asyncio.wait_for(reader.readline(), 3)).decode('utf-8').rstrip('\n')
+
+
+def test_server_echoes_the_id_on_single_and_multi_line_replies(server):
+    async def run():
+        reader, writer = await raw_client("alice")
+        writer.write(b"#g1|CREATE_GROUP:red\n#g2|CREATE_GROUP:blue\n#u|LIST_USERS\n#l|LIST_GROUPS\nLIST_USERS\n")
+        await writer.drain()
+        lines = [await read_line(reader) for _ in range(7)]
+        writer.close()
+        return lines
+
+    assert asyncio.run(run()) == [
+        "#g1|Group 'red' created. You are now a member.",
+        "#g2|Group 'blue' created. You are now a member.",
+        "#u|Connected users (1): alice",
+        "#l+Available groups (2):",
+        "#l+red (1 members: alice)",
+        "#l|blue (1 members: alice)",
+        "Connected users (1): alice",
+    ]
+
+
+def test_chat_text_that_looks_like_an_id_is_taken_as_one(server):
+    async def run():
+        alice_reader, alice_writer = await raw_client("alice")
+        bob_reader, bob_writer = await raw_client("bob")
+        await read_line(alice_reader)        # USER_CONNECTED:bob
+        bob_writer.write(b"CONNECT:alice\n")
+        await bob_writer.drain()
+        await read_line(bob_reader)
+        await read_line(alice_reader)        # bob connected to you
+
+        bob_writer.write(b"#abc|hello\n#1|#abc|hello\n")
+        await bob_writer.drain()
+        bob_lines = [await read_line(bob_reader) for _ in range(2)]
+        alice_lines = [await read_line(alice_reader) for _ in range(2)]
+        alice_writer.close()
+        bob_writer.close()
+        return bob_lines, alice_lines
+
+    bob_lines, alice_lines = asyncio.run(run())
+    assert bob_lines == ["#abc|Message delivered to alice", "#1|Message delivered to alice"]
+    assert alice_lines == ["[bob]: hello", "[bob]: #abc|hello"]
+
+
+def test_timed_out_request_leaves_no_state_behind(server):
+    async def run():
+        conn = client_async.PipelinedConnection(client_async.HOST, client_async.PORT)
+        await conn.connect("alice")
+        with pytest.raises(Exception, match="Timeout"):
+            await conn.request("LIST_GROUPS", timeout=0)
+        # The late reply is dropped, and the next request gets its own answer
+        reply = await conn.request("LIST_USERS")
+        state = (conn.in_flight, dict(conn._commands), dict(conn._partial))
+        await conn.close()
+        return reply, state
+
+    reply, state = asyncio.run(run())
+    assert reply == "Connected users (1): alice"
+    assert state == (0, {}, {})
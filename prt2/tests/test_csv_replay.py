@@ -0,0 +1,102 @@
+import asyncio
+import csv
+import socket
+import time
+
+import pytest
+
+import async_impl.client_async as client_async
+import async_impl.server_async as server_async
+
+ROWS = 25
+
+
+@pytest.fixture
+def traffic_csv(tmp_path):
+    path = tmp_path / "traffic.csv"
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["msg_id", "message", "src_app", "dst_app"])
+        for i in range(ROWS):
+            writer.writerow([i, "LIST_USERS", "client_browser", "web_server"])
+    return str(path)
+
+
+@pytest.mark.parametrize("window", [1, 5])
+def test_rate_limited_replies_count_as_failed(server, traffic_csv, window):
+    progress = []
+    summary = asyncio.run(client_async.send_messages_from_csv(
+        traffic_csv, delay=0, window=window, on_progress=progress.append))
+
+    assert summary['messages_sent'] + summary['messages_failed'] == ROWS
+    # Stop-and-wait registers with its first row, which the rate limit does not count
+    assert summary['messages_sent'] <= server_async.RATE_LIMIT_MSGS + (window == 1)
+    assert summary['messages_rate_limited'] == summary['messages_failed'] > 0
+    assert summary['rtt_ms']['count'] == summary['messages_sent']
+    last = progress[-1]
+    assert (last.acked, last.failed, last.rate_limited) == (
+        summary['messages_sent'], summary['messages_failed'], summary['messages_rate_limited'])
+
+
+@pytest.fixture
+def closed_port(monkeypatch):
+    """Point the client at a local port nothing listens on."""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    monkeypatch.setattr(client_async, 'HOST', '127.0.0.1')
+    monkeypatch.setattr(client_async, 'PORT', port)
+
+
+def test_sharded_replay_keeps_rows_with_the_same_key_in_order(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server_async, 'RATE_LIMIT_MSGS', float('inf'))
+    path = tmp_path / "keyed.csv"
+    keys = ["dns", "http", "ssh", "smtp", "ntp"]
+    rows = [(i, keys[i % 7 % len(keys)]) for i in range(60)]     # Keys interleaved unevenly
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["msg_id", "message", "app_protocol", "src_app", "dst_app"])
+        for i, key in rows:
+            writer.writerow([i, f"{key} {i}", key, "client_browser", "web_server"])
+
+    summary = asyncio.run(client_async.send_messages_sharded(
+        str(path), connections=3, key_column='app_protocol', window=4, name_prefix="shard"))
+    assert summary['messages_sent'] == 60
+
+    received = [entry for entry in server_async.message_log if entry['direction'] == 'received']
+    for key in keys:
+        entries = [entry for entry in received if entry['message'].startswith(f"{key} ")]
+        assert len({entry['client_name'] for entry in entries}) == 1
+        assert [entry['message'] for entry in entries] == [f"{key} {i}" for i, row_key in rows if row_key == key]
+
+
+def test_sharded_replay_reports_a_refused_connection(closed_port, traffic_csv):
+    summary = asyncio.run(client_async.send_messages_sharded(traffic_csv, connections=2))
+    assert summary == {'error': "Server is not responding"}
+
+
+def test_sharded_replay_closes_the_pool_when_a_name_is_taken(server, traffic_csv):
+    async def run():
+        holder = client_async.PipelinedConnection(client_async.HOST, client_async.PORT)
+        await holder.connect("taken_1")
+        summary = await client_async.send_messages_sharded(traffic_csv, connections=3, name_prefix="taken")
+        deadline = time.monotonic() + 2
+        while len(server_async.clients_by_name) > 1 and time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+        names = set(server_async.clients_by_name)
+        await holder.close()
+        return summary, names
+
+    summary, names = asyncio.run(run())
+    assert summary['error'].startswith("ERROR: Name registration failed")
+    assert names == {"taken_1"}
+
+
+def test_timed_replay_reports_a_refused_connection(closed_port, traffic_csv):
+    summary = asyncio.run(client_async.send_messages_timed(traffic_csv, speed=0))
+    assert summary == {'error': "Server is not responding"}
+
+
+def test_timed_replay_reports_a_missing_file(server, tmp_path):
+    summary = asyncio.run(client_async.send_messages_timed(str(tmp_path / "missing.csv"), speed=0))
+    assert summary == {'error': f"CSV file '{tmp_path / 'missing.csv'}' not found"}
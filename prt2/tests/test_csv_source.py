@@ -0,0 +1,84 @@
+import csv
+import os
+
+import pytest
+
+from utils.csv_source import CsvMessage, CsvSource, cache_path_for, select_filter
+
+FIELDS = ["msg_id", "message", "timestamp", "src_app", "dst_app", "app_protocol"]
+
+
+def write_csv(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(FIELDS)
+        writer.writerows(rows)
+
+
+@pytest.fixture
+def traffic_csv(tmp_path):
+    path = str(tmp_path / "traffic.csv")
+    write_csv(path, [
+        [1, "GET /index.html", "0.0", "client_browser", "web_server", "http"],
+        [1, "200 OK", "0.1", "web_server", "client_browser", "http"],
+        [2, "שלום, world", "0.5", "client_browser", "web_server", "dns"],
+        [3, "POST /form", "1.5", "client_browser", "web_server", "http"],
+    ])
+    return path
+
+
+def read_without_csv(source):
+    """Iterate `source` with CSV parsing disabled, so only the cache can answer."""
+    def fail():
+        raise AssertionError("the CSV was parsed although a valid cache exists")
+    source._iter_csv = fail
+    return list(source)
+
+
+def test_first_pass_writes_a_cache_that_later_passes_read(traffic_csv):
+    expected = [
+        CsvMessage(1, "GET /index.html", "0.0", "http"),
+        CsvMessage(2, "שלום, world", "0.5", "dns"),
+        CsvMessage(3, "POST /form", "1.5", "http"),
+    ]
+    assert list(CsvSource(traffic_csv, key_column="app_protocol")) == expected
+
+    cached = CsvSource(traffic_csv, key_column="app_protocol")
+    assert cached.cached_count() == 3
+    assert read_without_csv(cached) == expected
+
+
+def test_cache_lives_in_the_cache_directory(traffic_csv, csv_cache_directory):
+    list(CsvSource(traffic_csv))
+    assert not os.path.exists(f"{traffic_csv}.cache")
+    assert os.path.exists(cache_path_for(csv_cache_directory, traffic_csv))
+
+
+def test_cache_is_ignored_after_the_csv_or_the_settings_change(traffic_csv):
+    list(CsvSource(traffic_csv))
+    assert CsvSource(traffic_csv, key_column="app_protocol").cached_count() is None
+
+    write_csv(traffic_csv, [[7, "changed", "0.0", "client_browser", "web_server", "http"]])
+    source = CsvSource(traffic_csv)
+    assert source.cached_count() is None
+    assert [item.message for item in source] == ["changed"]
+
+
+def test_an_unfinished_pass_leaves_no_cache(traffic_csv):
+    source = CsvSource(traffic_csv)
+    next(iter(source))
+    assert source.cached_count() is None
+    assert source.count() == 3
+
+
+def test_predicates_bypass_the_cache(traffic_csv):
+    source = CsvSource(traffic_csv, predicates=[lambda row: row['app_protocol'] == "http"])
+    assert [item.msg_id for item in source] == [1, 3]
+    assert source.cached_count() is None
+
+
+def test_first_filter_whose_columns_exist_is_used():
+    filters = [{"src_app": "client_browser"}, {"src_port": "68", "dst_port": "67"}]
+    assert select_filter(["src_port", "dst_port"], filters) == {"src_port": "68", "dst_port": "67"}
+    assert select_filter(["src_app", "src_port"], filters) == {"src_app": "client_browser"}
+    assert select_filter(["message"], filters) == {}
@@ -0,0 +1,83 @@
+import asyncio
+
+import pytest
+
+import async_impl.server_async as server_async
+from benchmarks.fakes import register_fake_client, reset_server_state
+
+CHUNK_SIZE = 10
+TICK_BUDGET = 25
+
+
+@pytest.fixture
+def fanout(monkeypatch):
+    reset_server_state(server_async)
+    monkeypatch.setattr(server_async, 'FANOUT_CHUNK_SIZE', CHUNK_SIZE)
+    monkeypatch.setattr(server_async, 'FANOUT_TICK_BUDGET', TICK_BUDGET)
+    yield
+    reset_server_state(server_async)
+
+
+def make_group(name: str, size: int):
+    members = []
+    for i in range(size):
+        writer = register_fake_client(server_async, f"{name}-{i}")
+        writer.keep_output = True
+        members.append(writer)
+    server_async.groups[name] = set(members)
+    return members
+
+
+async def deliveries_per_iteration(writers, work):
+    """Run `work` and return how many writes happened in each event-loop iteration it spanned."""
+    task = asyncio.ensure_future(work)
+    counts, last = [], 0
+    while not task.done():
+        await asyncio.sleep(0)
+        total = sum(writer.writes for writer in writers)
+        counts.append(total - last)
+        last = total
+    await task
+    return [count for count in counts if count]
+
+
+def test_every_member_but_the_sender_gets_the_message_once(fanout):
+    sender, *members = make_group("team", 46)
+    away = members.pop()
+    server_async.connected_clients.discard(away)
+
+    async def run():
+        return await deliveries_per_iteration(
+            members, server_async._fanout_group_message("team", sender, "[team] x: hi\n"))
+
+    per_iteration = asyncio.run(run())
+    assert [bytes(writer.output) for writer in members] == [b"[team] x: hi\n"] * 44
+    assert sender.writes == away.writes == 0
+    assert all(server_async.client_info[writer]['messages_received'] == 1 for writer in members)
+    # The loop is released after every chunk
+    assert sum(per_iteration) == 44
+    assert max(per_iteration) <= CHUNK_SIZE
+
+    fanout_stats = server_async.get_statistics()['fanout']
+    assert fanout_stats['broadcasts'] == 1
+    assert fanout_stats['recipients'] == 44
+    assert fanout_stats['yields'] == 44 // CHUNK_SIZE
+    assert fanout_stats['max_duration_ms'] >= fanout_stats['max_loop_block_ms'] >= 0
+    assert fanout_stats['avg_duration_ms'] > 0
+
+
+def test_concurrent_broadcasts_share_one_budget_per_iteration(fanout, monkeypatch):
+    monkeypatch.setattr(server_async, 'FANOUT_CHUNK_SIZE', 1000)
+    groups = [make_group(f"g{i}", 20) for i in range(3)]
+    everyone = [writer for members in groups for writer in members]
+
+    async def run():
+        broadcasts = asyncio.gather(*(server_async._broadcast(members, "ping\n") for members in groups))
+        per_iteration = await deliveries_per_iteration(everyone, broadcasts)
+        return per_iteration, broadcasts.result()
+
+    per_iteration, sent = asyncio.run(run())
+    assert sent == [20, 20, 20]
+    assert all(writer.writes == 1 for writer in everyone)
+    assert max(per_iteration) <= TICK_BUDGET
+    assert server_async.get_statistics()['fanout']['broadcasts'] == 3
@@ -0,0 +1,105 @@
+import sqlite3
+
+import pytest
+
+from gui.history import ChatHistory, store_path_for
+
+
+@pytest.fixture(params=["fts5", "terms"])
+def store_path(request, tmp_path):
+    path = str(tmp_path / "history" / "alice.db")
+    if request.param == "terms":
+        # An existing term table keeps the store on the plain index even where SQLite has FTS5
+        (tmp_path / "history").mkdir()
+        with sqlite3.connect(path) as db:
+            db.execute("CREATE TABLE message_terms (term TEXT NOT NULL, id INTEGER NOT NULL, "
+                       "PRIMARY KEY (term, id)) WITHOUT ROWID")
+    return path
+
+
+@pytest.fixture
+def history(store_path):
+    history = ChatHistory(memory_limit=5, store_path=store_path)
+    yield history
+    history.close()
+
+
+def fill(history, chat, count, start=0):
+    return [history.append(chat, f"{chat} line {i}") for i in range(start, start + count)]
+
+
+def test_scrollback_pages_past_the_lines_kept_in_memory(history):
+    ids = fill(history, "bob", 12)
+    fill(history, "carol", 3)
+    assert history.count("bob") == 12
+    assert history.latest("bob", 3) == [(i, f"bob line {n}") for n, i in enumerate(ids) if n >= 9]
+
+    pages, cursor = [], None
+    while True:
+        page = history.before("bob", cursor, 4)
+        if not page:
+            break
+        pages.append(page)
+        cursor = page[0][0]
+    assert [line for page in reversed(pages) for _, line in page] == [f"bob line {n}" for n in range(12)]
+    assert history.after("bob", ids[2], 3) == [(ids[n], f"bob line {n}") for n in (3, 4, 5)]
+
+
+def test_lines_survive_reopening_and_ids_keep_growing(store_path):
+    history = ChatHistory(memory_limit=5, store_path=store_path)
+    ids = fill(history, "bob", 3)
+    history.close()
+
+    reopened = ChatHistory(memory_limit=5, store_path=store_path)
+    try:
+        assert reopened.latest("bob", 10) == [(i, f"bob line {n}") for n, i in enumerate(ids)]
+        assert reopened.append("bob", "again") > ids[-1]
+    finally:
+        reopened.close()
+
+
+def test_appends_are_written_in_one_scheduled_batch(store_path):
+    scheduled = []
+    history = ChatHistory(memory_limit=2, store_path=store_path, schedule_flush=scheduled.append)
+    try:
+        fill(history, "bob", 6)
+        assert len(scheduled) == 1
+        # Pending lines are already visible to scrollback and counts
+        assert history.count("bob") == 6
+        assert [line for _, line in history.before("bob", None, 10)] == [f"bob line {n}" for n in range(6)]
+        assert history.search("line") == []
+
+        scheduled.pop()()
+        assert history.count("bob") == 6
+        assert len(history.search("line")) == 6
+        fill(history, "bob", 1, start=6)
+        assert len(scheduled) == 1
+    finally:
+        history.close()
+
+
+def test_search_matches_every_word_across_conversations_newest_first(history):
+    history.append("bob", "deploy the server tonight")
+    history.append("carol", "server is down")
+    history.append("bob", "the Server deploy worked")
+    history.append("dave", "lunch?")
+
+    hits = history.search("server deploy")
+    assert [(hit.chat, hit.line) for hit in hits] == [("bob", "the Server deploy worked"),
+                                                      ("bob", "deploy the server tonight")]
+    assert [hit.chat for hit in history.search("server", limit=2)] == ["bob", "carol"]
+    assert [hit.chat for hit in history.search("server", before_id=hits[0].line_id)] == ["carol", "bob"]
+    assert history.search("!!!") == []
+
+
+def test_clear_removes_one_conversation_and_its_search_entries(history):
+    fill(history, "bob", 7)
+    fill(history, "carol", 2)
+    history.clear("bob")
+    assert history.count("bob") == 0
+    assert history.latest("bob", 10) == []
+    assert [hit.chat for hit in history.search("line")] == ["carol", "carol"]
+
+
+def test_store_path_quotes_the_user_name(tmp_path):
+    assert store_path_for(str(tmp_path), "a/b c") == str(tmp_path / "a%2Fb%20c.db")
@@ -0,0 +1,31 @@
+import asyncio
+
+import async_impl.client_async as client_async
+from async_impl.load_generator import LoadGenerator, LoadStats
+
+
+def test_sessions_complete_while_others_come_and_go(server):
+    generator = LoadGenerator(client_async.HOST, client_async.PORT, groups=2, think_time=0.05, timeout=5)
+    report = asyncio.run(generator.run_open_loop(rate=20, duration=1.0, requests_per_session=5))
+
+    assert report['sessions']['started'] > 0
+    assert report['sessions']['failed'] == 0
+    assert report['requests'].get('handshake') == report['sessions']['started']
+    assert report['latency_ms']['count'] == report['total_requests'] - report['requests']['handshake']
+    assert {op: summary['count'] for op, summary in report['latency_ms_by_op'].items()} == report['requests']
+
+
+def test_latency_report_uses_fixed_size_histograms():
+    stats = LoadStats()
+    for i in range(10000):
+        stats.record('handshake', 0.5)
+        stats.record('chat' if i % 2 else 'list_users', (i % 100 + 1) / 1000)
+    buckets = sum(len(histogram.counts) for histogram in stats.latencies.values())
+    stats.record('chat', 0.001)
+    assert sum(len(histogram.counts) for histogram in stats.latencies.values()) == buckets
+
+    report = stats.report({})
+    assert report['latency_ms']['count'] == 10001
+    assert report['latency_ms']['max'] == 100.0
+    assert report['latency_ms_by_op']['handshake']['p50'] == 500.0
+    assert report['latency_ms_by_op']['chat']['count'] == 5001
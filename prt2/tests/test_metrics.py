@@ -0,0 +1,99 @@
+import math
+import random
+
+import pytest
+
+from utils.metrics import LatencyHistogram, ThroughputCounter, TimeSeries, percentile_summary
+
+
+def test_histogram_percentiles_stay_within_one_bucket_of_the_exact_values():
+    rng = random.Random(7)
+    samples = [rng.lognormvariate(-5, 1) for _ in range(20000)]
+    histogram = LatencyHistogram()
+    for sample in samples:
+        histogram.record(sample)
+
+    exact = percentile_summary(samples)
+    summary = histogram.summary()
+    assert summary['count'] == exact['count'] == len(samples)
+    assert summary['max'] == exact['max']
+    assert summary['mean'] == pytest.approx(exact['mean'], abs=0.001)
+    for key in ('p50', 'p90', 'p99'):
+        # Reported as the bucket's upper bound: never below the exact value, at most 1/sub_buckets above
+        assert exact[key] <= summary[key] <= exact[key] * (1 + 1 / histogram.sub_buckets) + 0.001
+
+
+def test_histogram_memory_does_not_grow_with_samples():
+    histogram = LatencyHistogram()
+    buckets = len(histogram.counts)
+    for i in range(10000):
+        histogram.record(i * 1e-4)
+    assert len(histogram.counts) == buckets
+    assert histogram.count == 10000
+
+
+def test_histogram_clamps_out_of_range_samples():
+    histogram = LatencyHistogram(min_value=1e-3, max_value=1.0)
+    histogram.record(0.0)
+    histogram.record(500.0)
+    assert histogram.counts[0] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == 500.0
+
+
+def test_empty_and_reset_histograms_report_zeros():
+    histogram = LatencyHistogram()
+    assert histogram.summary() == percentile_summary([])
+    histogram.record(0.01)
+    histogram.reset()
+    assert histogram.summary() == percentile_summary([])
+    assert histogram.to_dict()['buckets'] == []
+
+
+def test_throughput_rate_counts_only_complete_seconds_in_the_window():
+    counter = ThroughputCounter(horizon_seconds=10)
+    for second in range(100, 105):
+        counter.record(second + 0.5, events=second - 99)     # 1..5 events
+    assert counter.rate(105.2, 5) == (1 + 2 + 3 + 4 + 5) / 5
+    assert counter.rate(105.2, 2) == (4 + 5) / 2
+    counter.record(105.1, events=100)                        # The current second is not complete yet
+    assert counter.rate(105.9, 2) == (4 + 5) / 2
+
+
+def test_throughput_forgets_seconds_older_than_the_horizon():
+    counter = ThroughputCounter(horizon_seconds=10)
+    counter.record(100.0, events=50)
+    counter.record(110.0, events=3)        # Same slot, ten seconds later
+    assert counter.rate(111.0, 9) == 3 / 9
+    assert counter.rate(125.0, 9) == 0.0
+
+
+def test_time_series_returns_points_oldest_first_before_filling():
+    series = TimeSeries(4)
+    assert series.points() == ([], [])
+    assert math.isnan(series.latest())
+    series.append(1.0, 10.0)
+    series.append(2.0, 20.0)
+    assert series.points() == ([1.0, 2.0], [10.0, 20.0])
+    assert series.latest() == 20.0
+
+
+@pytest.mark.parametrize("appended", [4, 5, 7, 8, 13])
+def test_time_series_wraps_around_keeping_the_newest_samples(appended):
+    series = TimeSeries(4)
+    for i in range(appended):
+        series.append(float(i), i * 10.0)
+    kept = range(appended - 4, appended)
+    assert series.count == 4
+    assert series.points() == ([float(i) for i in kept], [i * 10.0 for i in kept])
+    assert series.latest() == (appended - 1) * 10.0
+
+
+def test_time_series_reset_forgets_samples():
+    series = TimeSeries(3)
+    for i in range(5):
+        series.append(float(i), float(i))
+    series.reset()
+    assert series.points() == ([], [])
+    series.append(9.0, 1.0)
+    assert series.points() == ([9.0], [1.0])
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+import gui.notifications as notifications
+from gui.notifications import Notifier
+
+WINDOW = 0.2
+
+
+def wait_for(predicate, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+class FakePlayer:
+    """Records when each sound starts; a sound lasts until `release` is set."""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self):
+        self.started.append(time.monotonic())
+        self.release.wait(3)
+
+
+@pytest.fixture
+def player(monkeypatch):
+    fake = FakePlayer()
+    monkeypatch.setattr(notifications, 'load_player', lambda sound_file: fake)
+    return fake
+
+
+@pytest.fixture
+def notifier():
+    notifier = Notifier("unused.wav", window=WINDOW, chat_interval=10)
+    yield notifier
+    notifier.stop()
+
+
+def test_a_burst_across_chats_shares_one_sound_per_window(player, notifier):
+    player.release.clear()
+    assert notifier.notify("chat-0")
+    wait_for(lambda: len(player.started) == 1)
+
+    # Everything arriving while that sound plays is merged into one more sound
+    burst = [notifier.notify(f"chat-{i}") for i in range(1, 21)]
+    assert burst == [True] + [False] * 19
+    assert notifier.coalesced == 19
+    player.release.set()
+
+    wait_for(lambda: notifier.played == 2)
+    time.sleep(WINDOW * 1.5)
+    assert len(player.started) == 2
+    assert player.started[1] - player.started[0] >= WINDOW
+
+
+def test_a_chat_that_just_sounded_is_rate_limited(player):
+    notifier = Notifier("unused.wav", window=0.01, chat_interval=0.3)
+    try:
+        assert notifier.notify("bob")
+        wait_for(lambda: notifier.played == 1)
+        time.sleep(0.05)
+        assert not notifier.notify("bob")
+        assert notifier.notify("carol")
+        wait_for(lambda: notifier.played == 2)
+        time.sleep(0.3)
+        assert notifier.notify("bob")
+        wait_for(lambda: notifier.played == 3)
+    finally:
+        notifier.stop()
+    assert len(player.started) == 3
+
+
+def test_a_muted_chat_never_sounds(player, notifier):
+    notifier.set_muted("bob", True)
+    assert notifier.is_muted("bob")
+    assert not any(notifier.notify("bob") for _ in range(5))
+    time.sleep(WINDOW)
+    assert player.started == []
+    assert notifier._thread is None
+
+    notifier.set_muted("bob", False)
+    assert notifier.notify("bob")
+    wait_for(lambda: notifier.played == 1)
+
+
+def test_disabled_notifier_stays_silent(player, notifier):
+    notifier.enabled = False
+    assert not notifier.notify("bob")
+    assert notifier._thread is None
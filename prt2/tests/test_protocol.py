@@ -0,0 +1,71 @@
+import pytest
+
+from async_impl.protocol import (ChatClosed, ChatOpened, DirectMessage, Error, EventParser, GroupList,
+                                 GroupMessage, GroupUpdated, LineFramer, Notice, UserConnected, UserDisconnected,
+                                 UserList)
+
+
+def test_framer_joins_lines_split_across_reads():
+    framer = LineFramer()
+    assert framer.feed(b"USER_CONN") == []
+    assert framer.feed(b"ECTED:bob\r\nhel") == ["USER_CONNECTED:bob"]
+    assert framer.feed(b"lo\n\nlast") == ["hello", ""]
+    assert framer.flush() == "last"
+    assert framer.flush() is None
+
+
+def test_framer_keeps_multibyte_characters_split_across_reads():
+    data = "[דנה]: שלום\n".encode('utf-8')
+    framer = LineFramer()
+    lines = []
+    for i in range(len(data)):
+        lines += framer.feed(data[i:i + 1])
+    assert lines == ["[דנה]: שלום"]
+
+
+def test_framer_cuts_overlong_lines():
+    framer = LineFramer(max_line=4)
+    assert framer.feed(b"abcdefghij") == ["abcd", "efgh"]
+    assert framer.feed(b"k\n") == ["ijk"]
+
+
+@pytest.mark.parametrize("line, event", [
+    ("USER_CONNECTED:bob", UserConnected("bob")),
+    ("USER_DISCONNECTED:bob", UserDisconnected("bob")),
+    ("Connected users (2): alice, bob", UserList(["alice", "bob"])),
+    ("Connected users (0): ", UserList([])),
+    ("[bob]: hi: there", DirectMessage("bob", "hi: there")),
+    ("[team] bob: hello", GroupMessage("team", "bob", "hello")),
+    ("[System] bob has disconnected", ChatClosed("bob", 'disconnected')),
+    ("[System] bob ended the chat", ChatClosed("bob", 'ended')),
+    ("Chat disconnected successfully", ChatClosed(None, 'closed')),
+    ("Connected to bob. You can now send messages directly.", ChatOpened("bob")),
+    ("bob connected to you. You can now send messages directly.", ChatOpened("bob", True)),
+    ("Group 'team' created. You are now a member.", GroupUpdated("team", "me", 'created')),
+    ("GROUP_UPDATED: team was created by bob", GroupUpdated("team", "bob", 'created')),
+    ("GROUP_UPDATED: bob joined team", GroupUpdated("team", "bob", 'joined')),
+    ("Joined group 'team'", GroupUpdated("team", "me", 'joined')),
+    ("Left group 'team'", GroupUpdated("team", "me", 'left')),
+    ("You were added to group 'team' by bob", GroupUpdated("team", "me", 'added')),
+    ("bob joined group 'team'", GroupUpdated("team", "bob", 'joined')),
+    ("carol was added to group 'team' by bob", GroupUpdated("team", "carol", 'added')),
+    ("ERROR: Rate limit exceeded", Error("ERROR: Rate limit exceeded")),
+    ("Message delivered to bob", Notice("Message delivered to bob")),
+    ("No groups available", GroupList({})),
+    ("Anything else", Notice("Anything else")),
+])
+def test_parser_classifies_server_lines(line, event):
+    assert EventParser(own_name="me").feed(line) == event
+
+
+def test_parser_collects_the_multi_line_group_list():
+    parser = EventParser()
+    reply = "Available groups (2):\n  team (2 members: alice, bob)\n  empty (0 members: )\nUSER_CONNECTED:dave"
+    assert parser.parse_all(reply) == [GroupList({"team": ["alice", "bob"], "empty": []}),
+                                       UserConnected("dave")]
+    assert parser.feed("Available groups (0):") == GroupList({})
+
+
+def test_parser_tells_a_group_named_system_from_server_notices():
+    assert EventParser().feed("[System] maintenance soon") == Notice("maintenance soon")
+    assert EventParser(groups={"System"}).feed("[System] bob: hi") == GroupMessage("System", "bob", "hi")
@@ -0,0 +1,47 @@
+import asyncio
+
+import async_impl.client_async as client_async
+import async_impl.server_async as server_async
+
+
+async def read_frames(data: bytes, limit: int) -> list:
+    reader = asyncio.StreamReader(limit=limit)
+    reader.feed_data(data)
+    reader.feed_eof()
+    frames = []
+    while True:
+        frame = await server_async._read_frame(reader)
+        if not frame:
+            return frames
+        frames.append(frame)
+
+
+def test_frames_are_split_on_newlines_and_the_tail_is_kept():
+    assert asyncio.run(read_frames(b"LIST_USERS\nLIST_GROUPS\npartial", 64)) == [
+        b"LIST_USERS\n", b"LIST_GROUPS\n", b"partial"]
+
+
+def test_an_oversized_frame_is_read_as_one_piece_and_its_rest_dropped():
+    frames = asyncio.run(read_frames(b"a" * 150 + b"\nLIST_USERS\n" + b"b" * 300, 64))
+    assert len(frames) == 3
+    assert set(frames[0]) == {ord("a")} and len(frames[0]) >= 64
+    assert frames[1] == b"LIST_USERS\n"
+    assert set(frames[2]) == {ord("b")}
+
+
+def test_a_line_slightly_over_the_buffer_gets_one_size_error_and_runs_nothing(server):
+    async def run():
+        reader, writer = await asyncio.open_connection(client_async.HOST, client_async.PORT)
+        writer.write(b"alice\n" + b"#big|" + b"x" * (2 ** 16 + 500) + b"\n#next|LIST_USERS\n")
+        await writer.drain()
+        lines = []
+        while not lines or not lines[-1].startswith(b"#next|"):
+            lines.append(await asyncio.wait_for(reader.readline(), 3))
+        writer.close()
+        after_registration = lines[[line.startswith(b"Commands:") for line in lines].index(True) + 1:]
+        return [line.decode('utf-8') for line in after_registration]
+
+    replies = asyncio.run(run())
+    assert len(replies) == 2
+    assert replies[0].startswith("#big|ERROR: Message size validation failed")
+    assert replies[1] == "#next|Connected users (1): alice\n"
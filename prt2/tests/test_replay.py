@@ -0,0 +1,15 @@
+from async_impl.replay import diff_outbound
+
+
+def test_resume_tokens_are_not_reported_as_differences():
+    recorded = {1: bytearray(b"Name registered\nRESUME_TOKEN:aaaa\nConnected users (1): SESSION:a\n")}
+    replayed = {1: bytearray(b"Name registered\nRESUME_TOKEN:bbbb\nConnected users (1): SESSION:a\n")}
+    assert diff_outbound(recorded, replayed) == {}
+
+
+def test_other_changes_are_still_reported():
+    recorded = {1: bytearray(b"RESUME_TOKEN:aaaa\nJoined group 'x'\n")}
+    replayed = {1: bytearray(b"RESUME_TOKEN:bbbb\nERROR: Group 'x' does not exist\n")}
+    diff = diff_outbound(recorded, replayed)[1]
+    assert "-Joined group 'x'" in diff
+    assert not any("aaaa" in line or "bbbb" in line for line in diff)
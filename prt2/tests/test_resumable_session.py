@@ -0,0 +1,189 @@
+import asyncio
+import time
+
+import pytest
+
+import async_impl.client_async as client_async
+import async_impl.server_async as server_async
+from async_impl.server_async import ParkedWriter
+
+RECONNECT_DELAY = 0.3
+
+
+async def wait_until(predicate, timeout: float = 3.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        await asyncio.sleep(0.01)
+
+
+def parked(name: str) -> bool:
+    return any(session['name'] == name and isinstance(session['writer'], ParkedWriter)
+               for session in list(server_async.sessions.values()))
+
+
+async def open_raw(line: str):
+    """A bare connection that sent `line` as its name; returns (reader, writer, reply lines until the token)."""
+    reader, writer = await asyncio.open_connection(client_async.HOST, client_async.PORT)
+    await reader.readline()
+    await reader.readline()
+    writer.write(f"{line}\n".encode('utf-8'))
+    await writer.drain()
+    lines = []
+    while True:
+        reply = (await asyncio.wait_for(reader.readline(), 3)).decode('utf-8').rstrip('\n')
+        lines.append(reply)
+        if reply.startswith(("RESUME_TOKEN:", "Session resumed:", "ERROR")):
+            return reader, writer, lines
+
+
+async def read_until(reader, prefix: str) -> list:
+    lines = []
+    while not lines or not lines[-1].startswith(prefix):
+        lines.append((await asyncio.wait_for(reader.readline(), 3)).decode('utf-8').rstrip('\n'))
+    return lines
+
+
+@pytest.fixture
+def slow_backoff(monkeypatch):
+    """A fixed reconnect delay, long enough to act on the server while the client is away."""
+    monkeypatch.setattr(client_async, 'backoff_delay', lambda attempt, *args: RECONNECT_DELAY)
+
+
+def resumable(lines: list, states: list) -> client_async.ResumableConnection:
+    return client_async.ResumableConnection(client_async.HOST, client_async.PORT, on_unsolicited=lines.append,
+                                            on_state_change=states.append)
+
+
+def test_server_holds_a_dropped_session_and_replays_its_backlog(server, monkeypatch):
+    monkeypatch.setattr(server_async, 'RESUME_BACKLOG_LINES', 2)
+
+    async def run():
+        reader, writer, lines = await open_raw("SESSION:alice")
+        token = lines[-1][len("RESUME_TOKEN:"):]
+        writer.write(b"#7|CREATE_GROUP:team\n")
+        await writer.drain()
+        created = await read_until(reader, "#7|")
+        writer.transport.abort()
+        await wait_until(lambda: parked("alice"))
+
+        bob = client_async.PipelinedConnection(client_async.HOST, client_async.PORT)
+        await bob.connect("bob")
+        assert await bob.request("CONNECT:alice") == "Connected to alice. You can now send messages directly."
+        for i in range(3):
+            assert await bob.request(f"note {i}") == "Message delivered to alice"
+
+        # USER_CONNECTED:bob, the chat notice and the first note are dropped
+        reader, writer, lines = await open_raw(f"RESUME:{token}")
+        assert lines[-1] == "Session resumed: alice"
+        assert await read_until(reader, "[bob]: note 2") == [
+            "[System] 3 older messages were dropped while you were away", "[bob]: note 1", "[bob]: note 2"]
+
+        # A request resent after the resume is answered from the reply cache, not run again
+        writer.write(b"#7|CREATE_GROUP:team\n")
+        await writer.drain()
+        assert await read_until(reader, "#7|") == created
+        writer.write(b"END_SESSION\n")
+        await writer.drain()
+        await read_until(reader, "Session ended")
+        await wait_until(lambda: not server_async.sessions and "alice" not in server_async.clients_by_name)
+        await bob.close()
+
+    asyncio.run(run())
+
+
+def test_unknown_token_is_rejected(server):
+    async def run():
+        _, writer, lines = await open_raw("RESUME:no-such-token")
+        writer.close()
+        return lines
+
+    assert asyncio.run(run())[-1].startswith("ERROR: Resume failed")
+
+
+def test_client_resumes_and_answers_a_pending_request_once(server, slow_backoff):
+    lines, states = [], []
+
+    async def run():
+        alice = resumable(lines, states)
+        await alice.connect("alice")
+        bob = client_async.PipelinedConnection(client_async.HOST, client_async.PORT)
+        await bob.connect("bob")
+        await bob.request("CONNECT:alice")
+
+        pending = asyncio.create_task(alice.request("CREATE_GROUP:team"))
+        await asyncio.sleep(0)      # The request is written; the reader has not run since
+        assert alice.in_flight == 1
+        alice.writer.transport.abort()
+        await wait_until(lambda: parked("alice"))
+        assert await bob.request("while you were away") == "Message delivered to alice"
+
+        reply = await pending
+        await wait_until(lambda: "[bob]: while you were away" in lines)
+        assert await alice.request("LIST_GROUPS") == "Available groups (1):\nteam (1 members: alice)"
+        assert alice.in_flight == 0
+        assert not alice._written
+        await alice.close()
+        await bob.close()
+        return reply
+
+    assert asyncio.run(run()) == "Group 'team' created. You are now a member."
+    assert states == ['reconnecting', 'resumed']
+    assert not any("ERROR" in line for line in lines)
+
+
+def test_client_registers_again_after_the_grace_period(server, slow_backoff, monkeypatch):
+    monkeypatch.setattr(server_async, 'RESUME_GRACE_SECONDS', 0.05)
+    lines, states = [], []
+
+    async def run():
+        alice = resumable(lines, states)
+        await alice.connect("alice")
+        token = alice.token
+        alice.writer.transport.abort()
+        await wait_until(lambda: states == ['reconnecting', 'reregistered'])
+        assert alice.token != token
+        users = await alice.request("LIST_USERS")
+        await alice.close()
+        await wait_until(lambda: not server_async.sessions)
+        return users
+
+    assert asyncio.run(run()) == "Connected users (1): alice"
+
+
+def test_request_ids_are_forgotten_once_answered_or_timed_out(server):
+    async def run():
+        alice = resumable([], [])
+        await alice.connect("alice")
+        await asyncio.gather(*(alice.request("LIST_USERS") for _ in range(5)))
+        with pytest.raises(Exception, match="Timeout"):
+            await alice.request("LIST_GROUPS", timeout=0)
+        remaining = set(alice._written)
+        await alice.close()
+        return remaining
+
+    assert asyncio.run(run()) == set()
+
+
+def test_cancelled_reader_fails_requests_without_reconnecting(server):
+    async def run():
+        alice = resumable([], [])
+        await alice.connect("alice")
+        waiting = asyncio.get_running_loop().create_future()
+        alice._pending["99"] = waiting
+        await asyncio.sleep(0)      # Let the reader start
+        alice._read_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alice._read_task
+        assert alice._reconnect_task is None
+        with pytest.raises(ConnectionError):
+            waiting.result()
+        await alice.close()
+
+    asyncio.run(run())
+
+
+def test_backoff_delay_grows_and_is_capped():
+    for attempt in range(8):
+        for _ in range(50):
+            assert 0 <= client_async.backoff_delay(attempt, 0.1, 1.0) <= min(1.0, 0.1 * 2 ** attempt)
@@ -0,0 +1,64 @@
+import asyncio
+import time
+from datetime import datetime
+
+import pytest
+
+from async_impl.scheduler import ReplayScheduler, parse_offset
+
+
+def test_numeric_offsets_are_seconds():
+    assert parse_offset("1.5") == (1.5, None)
+    assert parse_offset(" 3 ") == (3.0, None)
+
+
+def test_iso_timestamps_are_relative_to_the_first_row():
+    offset, first = parse_offset("2024-05-01T12:00:00")
+    assert (offset, first) == (0.0, datetime(2024, 5, 1, 12, 0, 0))
+    assert parse_offset("2024-05-01T12:00:02.500000", first) == (2.5, first)
+
+
+def test_due_times_are_scaled_from_the_first_offset():
+    scheduler = ReplayScheduler(speed=10)
+    start = scheduler.due_time(5.0)
+    assert scheduler.due_time(7.0) - start == pytest.approx(0.2)
+    assert scheduler.due_time(5.0) == start
+
+
+def test_dispatches_follow_the_scaled_schedule_and_record_lag():
+    scheduler = ReplayScheduler(speed=10)
+
+    async def run():
+        started = time.monotonic()
+        dispatched = []
+        for offset in (0.0, 0.5, 1.0):
+            await scheduler.wait_until(offset)
+            dispatched.append(time.monotonic() - started)
+        return dispatched
+
+    dispatched = asyncio.run(run())
+    for actual, due in zip(dispatched, (0.0, 0.05, 0.1)):
+        assert actual >= due
+    assert len(scheduler.lag) == 3 and min(scheduler.lag) >= 0
+    assert scheduler.lag_summary()['count'] == 3
+
+
+def test_speed_zero_never_waits():
+    scheduler = ReplayScheduler(speed=0)
+
+    async def run():
+        started = time.monotonic()
+        lateness = [await scheduler.wait_until(offset) for offset in (0, 100, 10000)]
+        return lateness, time.monotonic() - started
+
+    lateness, elapsed = asyncio.run(run())
+    assert lateness == [0.0, 0.0, 0.0]
+    assert elapsed < 0.5
+    assert scheduler.lag_summary()['count'] == 0
+
+
+def test_lag_summary_is_in_milliseconds():
+    scheduler = ReplayScheduler()
+    scheduler.lag = [0.001, 0.002, 0.010]
+    summary = scheduler.lag_summary()
+    assert (summary['count'], summary['p50'], summary['max']) == (3, 2.0, 10.0)
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+import async_impl.client_async as client_async
+import async_impl.server_async as server_async
+
+
+def test_repeated_asyncio_run_calls_each_succeed(server):
+    for _ in range(3):
+        response = asyncio.run(client_async.send_single_message("LIST_USERS"))
+        assert "Connected users" in response
+
+
+def test_shared_connection_logs_out_when_its_loop_ends(server):
+    asyncio.run(client_async.send_single_message("LIST_USERS"))
+    deadline = time.monotonic() + 2.0
+    while server_async.client_info and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not server_async.client_info
+
+
+def test_calls_in_one_loop_share_a_connection(server):
+    async def three_calls():
+        responses = [await client_async.send_single_message("LIST_USERS") for _ in range(3)]
+        return responses, len(server_async.client_info)
+
+    responses, clients = asyncio.run(three_calls())
+    assert all("Connected users" in response for response in responses)
+    assert clients == 1
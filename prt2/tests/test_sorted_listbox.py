@@ -0,0 +1,115 @@
+import tkinter as tk
+
+from gui.sorted_listbox import SortedListbox
+
+
+class FakeListbox:
+    """The part of tk.Listbox that SortedListbox uses, without a display."""
+
+    def __init__(self):
+        self.rows = []
+        self.selection = set()
+        self.top = 0
+        self.edits = 0
+
+    def _index(self, index):
+        return len(self.rows) if index == tk.END else index
+
+    def insert(self, index, *items):
+        index = self._index(index)
+        self.rows[index:index] = items
+        self.selection = {i + len(items) if i >= index else i for i in self.selection}
+        self.edits += 1
+
+    def delete(self, first, last=None):
+        first = self._index(first)
+        last = first if last is None else min(self._index(last), len(self.rows) - 1)
+        count = last - first + 1
+        del self.rows[first:last + 1]
+        self.selection = {i - count if i > last else i for i in self.selection if not first <= i <= last}
+        self.edits += 1
+
+    def curselection(self):
+        return tuple(sorted(self.selection))
+
+    def selection_clear(self, first, last=None):
+        self.selection.clear()
+
+    def selection_set(self, index):
+        self.selection.add(index)
+
+    def see(self, index):
+        pass
+
+    def nearest(self, y):
+        return self.top
+
+    def yview(self, index):
+        self.top = index
+
+
+def make(items=None):
+    listbox = FakeListbox()
+    rows = SortedListbox(listbox)
+    if items is not None:
+        rows.sync(items)
+    return rows, listbox
+
+
+def test_sync_shows_rows_in_key_order():
+    rows, listbox = make({"carol": "carol (away)", "alice": "alice", "bob": "bob"})
+    assert listbox.rows == ["alice", "bob", "carol (away)"]
+    assert rows.keys == ["alice", "bob", "carol"]
+    assert rows.index("bob") == 1
+    assert rows.index("dave") is None
+    assert rows.key_at(5) is None
+
+
+def test_small_changes_are_applied_row_by_row():
+    users = {f"user{i:03d}": f"user{i:03d}" for i in range(100)}
+    rows, listbox = make(users)
+    listbox.edits = 0
+
+    users = dict(users)
+    del users["user010"]
+    users["user050a"] = "user050a"
+    users["user070"] = "user070 (typing)"
+    rows.sync(users)
+
+    assert listbox.edits == 4      # One delete, one insert, and a delete and insert for the changed row
+    assert listbox.rows == [users[key] for key in sorted(users)]
+    assert rows.keys == sorted(users)
+
+
+def test_large_changes_rebuild_the_list():
+    rows, listbox = make({"a": "a", "b": "b"})
+    listbox.edits = 0
+    rows.sync({"c": "c", "d": "d", "e": "e"})
+    assert listbox.edits == 2      # Clear everything, insert everything
+    assert listbox.rows == ["c", "d", "e"]
+
+
+def test_selection_and_scroll_position_follow_their_keys():
+    rows, listbox = make({key: key for key in "bdfhj"})
+    rows.select("f")
+    listbox.top = rows.index("h")
+
+    rows.sync({key: key for key in "abdfhj"})
+    assert rows.selected_key() == "f"
+    assert rows.key_at(listbox.top) == "h"
+
+    rows.sync({key: key for key in "abdhj"})
+    assert rows.selected_key() is None
+
+
+def test_placeholder_is_shown_while_empty_and_replaced_by_rows():
+    rows, listbox = make()
+    rows.sync({}, placeholder="No users online")
+    assert listbox.rows == ["No users online"]
+    assert rows.keys == []
+    assert rows.key_at(0) is None
+
+    rows.sync({"bob": "bob"}, placeholder="No users online")
+    assert listbox.rows == ["bob"]
+    rows.clear()
+    assert listbox.rows == []
@@ -16,7 +16,43 @@ DEFAULT_CONFIG = {
         "read_timeout": 30.0,
         "max_name_length": 50,
         "rate_limit_messages_per_second": 10,
-        "rate_limit_window_seconds": 1.0
+        "rate_limit_window_seconds": 1.0,
+        "max_message_log": 100000
+    },
+    "fanout": {
+        "chunk_size": 64,
+        "tick_budget": 256
+    },
+    "resume": {
+        "grace_seconds": 30.0,
+        "backlog_lines": 200,
+        "reply_cache": 64
+    },
+    "reconnect": {
+        "base_delay": 0.5,
+        "max_delay": 30.0,
+        "max_attempts": 10
+    },
+    "presence": {
+        "mode": "push",
+        "poll_interval_ms": 5000
+    },
+    "csv": {
+        "filters": [
+            {"src_app": "client_browser", "dst_app": "web_server"}
+        ],
+        "columns": {"msg_id": "msg_id", "message": "message", "timestamp": "timestamp"},
+        "use_cache": True,
+        "cache_directory": "~/.tcp_chat_cache"
+    },
+    "history": {
+        "directory": "~/.tcp_chat_history",
+        "memory_lines": 500,
+        "flush_interval": 0.25
+    },
+    "charts": {
+        "history_seconds": 300,
+        "interval_ms": 1000
     },
     "logging": {
         "level": "INFO",
@@ -93,6 +129,63 @@ def get_rate_limit() -> tuple:
     return (config["rate_limit_messages_per_second"], config["rate_limit_window_seconds"])
 
 
+def get_max_message_log() -> int:
+    return get_config()["limits"].get("max_message_log", DEFAULT_CONFIG["limits"]["max_message_log"])
+
+
+def get_fanout_limits() -> tuple:
+    fanout = get_config().get("fanout", DEFAULT_CONFIG["fanout"])
+    return (fanout.get("chunk_size", DEFAULT_CONFIG["fanout"]["chunk_size"]),
+            fanout.get("tick_budget", DEFAULT_CONFIG["fanout"]["tick_budget"]))
+
+
+def get_resume_settings() -> tuple:
+    """Return (grace_seconds, backlog_lines, reply_cache) for resumable sessions."""
+    resume = get_config().get("resume", DEFAULT_CONFIG["resume"])
+    return (resume.get("grace_seconds", DEFAULT_CONFIG["resume"]["grace_seconds"]),
+            resume.get("backlog_lines", DEFAULT_CONFIG["resume"]["backlog_lines"]),
+            resume.get("reply_cache", DEFAULT_CONFIG["resume"]["reply_cache"]))
+
+
+def get_reconnect_settings() -> tuple:
+    """Return (base_delay, max_delay, max_attempts) for client reconnect backoff."""
+    reconnect = get_config().get("reconnect", DEFAULT_CONFIG["reconnect"])
+    return (reconnect.get("base_delay", DEFAULT_CONFIG["reconnect"]["base_delay"]),
+            reconnect.get("max_delay", DEFAULT_CONFIG["reconnect"]["max_delay"]),
+            reconnect.get("max_attempts", DEFAULT_CONFIG["reconnect"]["max_attempts"]))
+
+
+def get_presence_settings() -> tuple:
+    """Return (mode, poll_interval_ms) for client user/group lists; mode is "push" or "poll"."""
+    presence = get_config().get("presence", DEFAULT_CONFIG["presence"])
+    return (presence.get("mode", DEFAULT_CONFIG["presence"]["mode"]),
+            presence.get("poll_interval_ms", DEFAULT_CONFIG["presence"]["poll_interval_ms"]))
+
+
+def get_csv_settings() -> tuple:
+    """Return (filters, columns, use_cache, cache_directory) for reading traffic CSV files."""
+    csv_config = get_config().get("csv", DEFAULT_CONFIG["csv"])
+    return (csv_config.get("filters", DEFAULT_CONFIG["csv"]["filters"]),
+            csv_config.get("columns", DEFAULT_CONFIG["csv"]["columns"]),
+            csv_config.get("use_cache", DEFAULT_CONFIG["csv"]["use_cache"]),
+            csv_config.get("cache_directory", DEFAULT_CONFIG["csv"]["cache_directory"]))
+
+
+def get_history_settings() -> tuple:
+    """Return (directory, memory_lines, flush_interval) for the client's on-disk chat history."""
+    history = get_config().get("history", DEFAULT_CONFIG["history"])
+    return (history.get("directory", DEFAULT_CONFIG["history"]["directory"]),
+            history.get("memory_lines", DEFAULT_CONFIG["history"]["memory_lines"]),
+            history.get("flush_interval", DEFAULT_CONFIG["history"]["flush_interval"]))
+
+
+def get_chart_settings() -> tuple:
+    """Return (history_seconds, interval_ms) for the GUIs' live charts."""
+    charts = get_config().get("charts", DEFAULT_CONFIG["charts"])
+    return (charts.get("history_seconds", DEFAULT_CONFIG["charts"]["history_seconds"]),
+            charts.get("interval_ms", DEFAULT_CONFIG["charts"]["interval_ms"]))
+
+
 def get_log_level() -> str:
     return get_config()["logging"]["level"]
 
@@ -0,0 +1,184 @@
+import csv
+import json
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config
+
+CsvMessage = namedtuple("CsvMessage", ["msg_id", "message", "timestamp", "key"])
+
+CACHE_MAGIC = b"TCSV"
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct("<4sBQqI")     # magic, version, source size, source mtime_ns, settings fingerprint
+CACHE_RECORD = struct.Struct("<qHHI")       # msg_id, timestamp length, key length, message length
+CACHE_FOOTER = struct.Struct("<Q")          # record count
+
+
+def column_equals(column: str, value: str) -> Callable[[dict], bool]:
+    """Predicate that keeps rows whose `column` equals `value`."""
+    return lambda row: row.get(column) == value
+
+
+def cache_path_for(directory: str, path: str) -> str:
+    """The cache file of the CSV at `path` inside `directory`; CSVs with the same name get different files."""
+    source = os.path.abspath(path)
+    digest = zlib.crc32(source.encode('utf-8'))
+    return os.path.join(os.path.expanduser(directory), f"{os.path.basename(source)}.{digest:08x}.cache")
+
+
+def select_filter(fieldnames: Iterable[str], filters: List[Dict[str, str]]) -> Dict[str, str]:
+    """Pick the first configured filter whose columns all exist in the CSV header."""
+    available = set(fieldnames or ())
+    for candidate in filters:
+        if set(candidate) <= available:
+            return candidate
+    return {}
+
+
+class CsvSource:
+    """Streams the client-to-server messages of a traffic CSV.
+
+    Rows are read one at a time, kept when they match the filter and the extra
+    predicates, and mapped to CsvMessage through `columns`. The first complete
+    pass also writes the encoded fields to a binary cache in the configured
+    cache directory; later passes read the cache instead of parsing the CSV
+    as long as the file and the settings are unchanged.
+    """
+
+    def __init__(self, path: str, filters: Optional[List[Dict[str, str]]] = None,
+                 columns: Optional[Dict[str, str]] = None, key_column: Optional[str] = None,
+                 predicates: Iterable[Callable[[dict], bool]] = (), use_cache: Optional[bool] = None,
+                 cache_path: Optional[str] = None):
+        """
+        Args:
+            path: CSV file
+            filters: Alternative {column: value} filters; the first one whose
+                columns exist in the file is applied (default: from config)
+            columns: Maps msg_id/message/timestamp to CSV column names (default: from config)
+            key_column: Column copied into CsvMessage.key, e.g. for sharding
+            predicates: Extra row -> bool checks; rows must pass all of them.
+                Sources with predicates are never cached
+            use_cache: Read/write the binary cache (default: from config)
+            cache_path: Cache file (default: one per CSV in the configured cache directory)
+        """
+        default_filters, default_columns, default_use_cache, cache_directory = config.get_csv_settings()
+        self.path = path
+        self.filters = default_filters if filters is None else filters
+        self.columns = dict(default_columns, **(columns or {}))
+        self.key_column = key_column
+        self.predicates = list(predicates)
+        self.use_cache = (default_use_cache if use_cache is None else use_cache) and not self.predicates
+        self.cache_path = cache_path or cache_path_for(cache_directory, path)
+
+    def _fingerprint(self) -> int:
+        settings = json.dumps([self.filters, self.columns, self.key_column], sort_keys=True)
+        return zlib.crc32(settings.encode('utf-8'))
+
+    def _source_stat(self):
+        stat = os.stat(self.path)
+        return stat.st_size, stat.st_mtime_ns
+
+    def _open_valid_cache(self) -> Optional[BinaryIO]:
+        if not self.use_cache or not os.path.exists(self.cache_path):
+            return None
+        try:
+            f = open(self.cache_path, 'rb')
+        except OSError:
+            return None
+        header = f.read(CACHE_HEADER.size)
+        if len(header) == CACHE_HEADER.size:
+            magic, version, size, mtime_ns, fingerprint = CACHE_HEADER.unpack(header)
+            if (magic, version, fingerprint) == (CACHE_MAGIC, CACHE_VERSION, self._fingerprint()) \
+                    and (size, mtime_ns) == self._source_stat():
+                return f
+        f.close()
+        return None
+
+    def _iter_csv(self) -> Iterator[CsvMessage]:
+        msg_id_col = self.columns['msg_id']
+        message_col = self.columns['message']
+        timestamp_col = self.columns.get('timestamp')
+        with open(self.path, 'r', encoding='utf-8', newline='') as file:
+            reader = csv.DictReader(file)
+            row_filter = select_filter(reader.fieldnames, self.filters)
+            for row in reader:
+                if any(row.get(column) != value for column, value in row_filter.items()):
+                    continue
+                if not all(predicate(row) for predicate in self.predicates):
+                    continue
+                yield CsvMessage(int(row[msg_id_col]), row[message_col],
+                                 row.get(timestamp_col, '') if timestamp_col else '',
+                                 row.get(self.key_column, '') if self.key_column else '')
+
+    def _iter_cache(self, f: BinaryIO) -> Iterator[CsvMessage]:
+        with f:
+            f.seek(-CACHE_FOOTER.size, os.SEEK_END)
+            count, = CACHE_FOOTER.unpack(f.read(CACHE_FOOTER.size))
+            f.seek(CACHE_HEADER.size)
+            for _ in range(count):
+                msg_id, ts_len, key_len, msg_len = CACHE_RECORD.unpack(f.read(CACHE_RECORD.size))
+                timestamp = f.read(ts_len).decode('utf-8')
+                key = f.read(key_len).decode('utf-8')
+                message = f.read(msg_len).decode('utf-8')
+                yield CsvMessage(msg_id, message, timestamp, key)
+
+    def _iter_and_cache(self) -> Iterator[CsvMessage]:
+        size, mtime_ns = self._source_stat()
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            os.makedirs(os.path.dirname(tmp_path) or '.', exist_ok=True)
+            out = open(tmp_path, 'wb')
+        except OSError:
+            yield from self._iter_csv()
+            return
+        count = 0
+        try:
+            with out:
+                out.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, size, mtime_ns, self._fingerprint()))
+                for item in self._iter_csv():
+                    count += 1
+                    ts, key, message = (item.timestamp.encode('utf-8'), item.key.encode('utf-8'),
+                                        item.message.encode('utf-8'))
+                    out.write(CACHE_RECORD.pack(item.msg_id, len(ts), len(key), len(message)))
+                    out.write(ts)
+                    out.write(key)
+                    out.write(message)
+                    yield item
+                out.write(CACHE_FOOTER.pack(count))
+            # Only a complete pass replaces the cache
+            os.replace(tmp_path, self.cache_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def __iter__(self) -> Iterator[CsvMessage]:
+        cached = self._open_valid_cache()
+        if cached is not None:
+            return self._iter_cache(cached)
+        if self.use_cache:
+            return self._iter_and_cache()
+        return self._iter_csv()
+
+    def cached_count(self) -> Optional[int]:
+        """Number of messages from the cache footer, or None when there is no valid cache (never reads the CSV)."""
+        cached = self._open_valid_cache()
+        if cached is None:
+            return None
+        with cached:
+            cached.seek(-CACHE_FOOTER.size, os.SEEK_END)
+            return CACHE_FOOTER.unpack(cached.read(CACHE_FOOTER.size))[0]
+
+    def count(self) -> int:
+        """Number of messages the source yields, read from the cache footer when possible."""
+        cached = self.cached_count()
+        if cached is not None:
+            return cached
+        count = 0
+        for _ in self:
+            count += 1
+        return count
@@ -0,0 +1,176 @@
+import math
+from array import array
+from typing import Dict, Iterable, List, Tuple
+
+
+def percentile(sorted_samples: list, pct: float) -> float:
+    """Return the nearest-rank percentile of an already sorted list."""
+    if not sorted_samples:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_samples)))
+    return sorted_samples[min(rank, len(sorted_samples)) - 1]
+
+
+def percentile_summary(samples: Iterable[float], scale: float = 1000.0) -> Dict[str, float]:
+    """Summarize latency samples (in seconds) as count/mean/p50/p90/p99/max.
+
+    Args:
+        samples: Latency samples in seconds
+        scale: Multiplier applied to the reported values (default: milliseconds)
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+    return {
+        'count': len(ordered),
+        'mean': round(sum(ordered) / len(ordered) * scale, 3),
+        'p50': round(percentile(ordered, 50) * scale, 3),
+        'p90': round(percentile(ordered, 90) * scale, 3),
+        'p99': round(percentile(ordered, 99) * scale, 3),
+        'max': round(ordered[-1] * scale, 3),
+    }
+
+
+class LatencyHistogram:
+    """Fixed-size log-linear latency histogram.
+
+    Each power-of-two range from `min_value` up is split into `sub_buckets`
+    linear buckets, so percentiles are accurate to about 1/sub_buckets of the
+    value while memory stays constant no matter how many samples are recorded.
+    """
+
+    def __init__(self, min_value: float = 1e-6, max_value: float = 120.0, sub_buckets: int = 16):
+        self.min_value = min_value
+        self.sub_buckets = sub_buckets
+        self.octaves = max(1, math.ceil(math.log2(max_value / min_value)))
+        self.counts = [0] * (self.octaves * sub_buckets + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _index(self, value: float) -> int:
+        if value < self.min_value:
+            return 0
+        mantissa, exponent = math.frexp(value / self.min_value)     # value/min = mantissa * 2**exponent, 0.5 <= m < 1
+        index = (exponent - 1) * self.sub_buckets + int((mantissa * 2 - 1) * self.sub_buckets)
+        return min(index, len(self.counts) - 1)
+
+    def _bucket_upper(self, index: int) -> float:
+        octave, sub = divmod(index, self.sub_buckets)
+        return self.min_value * (2 ** octave) * (1 + (sub + 1) / self.sub_buckets)
+
+    def record(self, value: float):
+        """Add one sample (seconds)."""
+        self.counts[self._index(value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the nearest-rank percentile (seconds)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100.0 * self.count))
+        seen = 0
+        for index, bucket in enumerate(self.counts):
+            seen += bucket
+            if seen >= rank:
+                if index == len(self.counts) - 1:
+                    return self.max     # The last bucket also holds everything above max_value
+                return min(self._bucket_upper(index), self.max)
+        return self.max
+
+    def summary(self, scale: float = 1000.0) -> Dict[str, float]:
+        """Same shape as percentile_summary(), in milliseconds by default."""
+        if not self.count:
+            return {'count': 0, 'mean': 0.0, 'p50': 0.0, 'p90': 0.0, 'p99': 0.0, 'max': 0.0}
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count * scale, 3),
+            'p50': round(self.percentile(50) * scale, 3),
+            'p90': round(self.percentile(90) * scale, 3),
+            'p99': round(self.percentile(99) * scale, 3),
+            'max': round(self.max * scale, 3),
+        }
+
+    def to_dict(self, scale: float = 1000.0) -> dict:
+        """Non-empty buckets as [upper bound, count] pairs plus the summary, for export."""
+        return {
+            'unit': 'ms' if scale == 1000.0 else f"x{scale}",
+            'summary': self.summary(scale),
+            'buckets': [[round(self._bucket_upper(i) * scale, 6), c] for i, c in enumerate(self.counts) if c],
+        }
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+class ThroughputCounter:
+    """Per-second event counts over a fixed trailing horizon."""
+
+    def __init__(self, horizon_seconds: int = 300):
+        self.horizon = horizon_seconds
+        self.buckets = [0] * horizon_seconds
+        self.bucket_seconds = [0] * horizon_seconds
+
+    def record(self, now: float, events: int = 1):
+        second = int(now)
+        slot = second % self.horizon
+        if self.bucket_seconds[slot] != second:
+            self.bucket_seconds[slot] = second
+            self.buckets[slot] = 0
+        self.buckets[slot] += events
+
+    def rate(self, now: float, window_seconds: int) -> float:
+        """Average events per second over the last `window_seconds` complete seconds."""
+        window_seconds = max(1, min(window_seconds, self.horizon - 1))
+        current = int(now)
+        total = sum(self.buckets[s % self.horizon] for s in range(current - window_seconds, current)
+                    if self.bucket_seconds[s % self.horizon] == s)
+        return total / window_seconds
+
+    def reset(self):
+        self.buckets = [0] * self.horizon
+        self.bucket_seconds = [0] * self.horizon
+
+
+class TimeSeries:
+    """The last `capacity` (time, value) samples in a fixed-size ring buffer.
+
+    Appending never allocates, so a chart can sample every tick for as long
+    as the GUI runs; samples past the capacity overwrite the oldest ones.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array('d', [0.0] * capacity)
+        self.values = array('d', [0.0] * capacity)
+        self.count = 0      # Samples held, up to capacity
+        self._next = 0      # Slot the next sample goes to
+
+    def append(self, t: float, value: float):
+        self.times[self._next] = t
+        self.values[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def latest(self) -> float:
+        return self.values[self._next - 1] if self.count else math.nan
+
+    def points(self) -> Tuple[List[float], List[float]]:
+        """(times, values), oldest first."""
+        start = (self._next - self.count) % self.capacity
+        if start + self.count <= self.capacity:
+            end = start + self.count
+            return self.times[start:end].tolist(), self.values[start:end].tolist()
+        return ((self.times[start:] + self.times[:self._next]).tolist(),
+                (self.values[start:] + self.values[:self._next]).tolist())
+
+    def reset(self):
+        self.count = 0
+        self._next = 0